@@ -0,0 +1,12 @@
+"""Modules shared by the miner and the validator components."""
+
+import os
+
+# Files shared by the validator processes live in the `validator` directory. The
+# components install this package from the checkout in develop mode, next to it.
+VALIDATOR_DIR = os.path.join(
+    os.path.dirname(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ),
+    "validator",
+)
@@ -0,0 +1,365 @@
+"""Pooled, timeout-bounded client for the task API."""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout in seconds applied to every request unless overridden.
+DEFAULT_TIMEOUT = (5.0, 30.0)
+
+# Status codes that are worth retrying; everything else is returned to the caller.
+RETRYABLE_STATUS_CODES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Status codes telling the request wasn't processed, so that even a request that
+# isn't idempotent can be sent again.
+UNPROCESSED_STATUS_CODES = frozenset({408, 425, 429, 503})
+
+# Upper bounds (in seconds) of the latency histogram buckets.
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    math.inf,
+)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+def _not_sent(error: requests.RequestException) -> bool:
+    """Whether a request failed before reaching the server (connection refused, ...)."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, cheap enough to update on every request."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+            self.count += 1
+            self.total += seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile from the bucket counts.
+
+        Args:
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            float: Upper bound of the bucket containing the quantile, 0.0 if empty.
+        """
+        with self._lock:
+            if self.count == 0:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for bound, count in zip(self.buckets, self.counts):
+                seen += count
+                if seen >= rank:
+                    return bound
+            return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count = self.count
+            buckets = {
+                str(bound): count
+                for bound, count in zip(self.buckets, self.counts)
+            }
+            mean = self.total / count if count else 0.0
+            errors = self.errors
+        return {
+            "count": count,
+            "errors": errors,
+            "mean": mean,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+class TaskApiClient:
+    """
+    Client for the task API with connection pooling, keep-alive, per-call timeouts
+    and jittered exponential backoff.
+
+    Args:
+        base_url (str): API base URL, defaults to the API_URL environment variable.
+        timeout: Default (connect, read) timeout for each request.
+        max_retries (int): Retries after the first attempt for transient failures.
+        backoff_base (float): Base delay in seconds for the exponential backoff.
+        backoff_max (float): Maximum delay in seconds between two attempts.
+        pool_size (int): Number of keep-alive connections kept in the pool.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        timeout: Timeout = DEFAULT_TIMEOUT,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        pool_size: int = 10,
+    ):
+        self.base_url = (base_url or os.getenv("API_URL") or "").rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.latencies: Dict[str, LatencyHistogram] = {}
+        self._latencies_lock = threading.Lock()
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given (0-based) attempt."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+
+    def _histogram(self, path: str) -> LatencyHistogram:
+        histogram = self.latencies.get(path)
+        if histogram is None:
+            with self._latencies_lock:
+                histogram = self.latencies.setdefault(path, LatencyHistogram())
+        return histogram
+
+    def post(
+        self,
+        path: str,
+        payload: dict,
+        timeout: Optional[Timeout] = None,
+        max_retries: Optional[int] = None,
+        idempotent: bool = True,
+    ) -> requests.Response:
+        """
+        POST a JSON payload, retrying transient failures.
+
+        An idempotent request is retried on connection errors, timeouts and retryable
+        statuses. Any other request may have been processed when it failed that way,
+        so it is only retried when it never reached the server or the server answered
+        that it didn't process it (`UNPROCESSED_STATUS_CODES`).
+
+        Args:
+            path (str): Endpoint path, e.g. "/subnets/get-task/".
+            payload (dict): JSON body.
+            timeout: Override of the default timeout.
+            max_retries (int): Override of the default retry count.
+            idempotent (bool): Whether sending the request twice is harmless.
+
+        Returns:
+            requests.Response: The last response received.
+
+        Raises:
+            requests.RequestException: If every attempt failed without a response.
+        """
+        url = f"{self.base_url}{path}"
+        timeout = self.timeout if timeout is None else timeout
+        max_retries = self.max_retries if max_retries is None else max_retries
+        retryable_statuses = (
+            RETRYABLE_STATUS_CODES if idempotent else UNPROCESSED_STATUS_CODES
+        )
+        histogram = self._histogram(path)
+
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    url, json=payload, timeout=timeout
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                histogram.observe(time.perf_counter() - start, error=True)
+                if attempt >= max_retries or not (idempotent or _not_sent(e)):
+                    raise
+                delay = self.backoff_delay(attempt)
+                logger.warning(
+                    f"Request to {path} failed ({e}), retrying in {delay:.1f} seconds"
+                )
+            else:
+                retryable = response.status_code in retryable_statuses
+                histogram.observe(
+                    time.perf_counter() - start,
+                    error=response.status_code >= 500,
+                )
+                if not retryable or attempt >= max_retries:
+                    return response
+                delay = self.backoff_delay(attempt)
+                logger.warning(
+                    f"Request to {path} returned {response.status_code}, retrying in {delay:.1f} seconds"
+                )
+            time.sleep(delay)
+            attempt += 1
+
+    def get_task(self, hotkey: str, message: str, signature: str, **kwargs):
+        return self.post(
+            "/subnets/get-task/",
+            {"hotkey": hotkey, "message": message, "signature": signature},
+            idempotent=False,
+            **kwargs,
+        )
+
+    def finish_task(
+        self, hotkey: str, message: str, signature: str, hf_repo: str, **kwargs
+    ):
+        return self.post(
+            "/subnets/finish-task/",
+            {
+                "hotkey": hotkey,
+                "message": message,
+                "signature": signature,
+                "hf_repo": hf_repo,
+            },
+            idempotent=False,
+            **kwargs,
+        )
+
+    def check_task(self, uid: int, **kwargs):
+        return self.post("/subnets/check-task/", {"uid": int(uid)}, **kwargs)
+
+    def report_score(
+        self, hotkey: str, task_id, score: float, signature: str, **kwargs
+    ):
+        return self.post(
+            "/subnets/report-score/",
+            {
+                "hotkey": hotkey,
+                "task_id": task_id,
+                "score": score,
+                "signature": signature,
+            },
+            idempotent=False,
+            **kwargs,
+        )
+
+    def report_scores(self, hotkey: str, reports: List[dict], **kwargs):
+        """
+        Report several scores in one request.
+
+        Args:
+            hotkey (str): Validator hotkey.
+            reports (list): Dicts with "task_id", "score" and "signature".
+        """
+        return self.post(
+            "/subnets/report-scores/",
+            {"hotkey": hotkey, "reports": reports},
+            idempotent=False,
+            **kwargs,
+        )
+
+    def latency_stats(self) -> Dict[str, dict]:
+        """Latency histogram snapshot for every endpoint called so far."""
+        return {
+            path: hist.snapshot()
+            for path, hist in list(self.latencies.items())
+        }
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncTaskApiClient:
+    """
+    asyncio variant of TaskApiClient.
+
+    Requests run on worker threads that share the pooled session of the wrapped
+    client, so awaiting a slow API call never blocks the event loop.
+    """
+
+    def __init__(self, client: Optional[TaskApiClient] = None, **kwargs):
+        self.client = client or TaskApiClient(**kwargs)
+
+    async def post(
+        self, path: str, payload: dict, **kwargs
+    ) -> requests.Response:
+        return await asyncio.to_thread(
+            self.client.post, path, payload, **kwargs
+        )
+
+    async def get_task(self, *args, **kwargs):
+        return await asyncio.to_thread(self.client.get_task, *args, **kwargs)
+
+    async def finish_task(self, *args, **kwargs):
+        return await asyncio.to_thread(
+            self.client.finish_task, *args, **kwargs
+        )
+
+    async def check_task(self, *args, **kwargs):
+        return await asyncio.to_thread(self.client.check_task, *args, **kwargs)
+
+    async def report_score(self, *args, **kwargs):
+        return await asyncio.to_thread(
+            self.client.report_score, *args, **kwargs
+        )
+
+    async def report_scores(self, *args, **kwargs):
+        return await asyncio.to_thread(
+            self.client.report_scores, *args, **kwargs
+        )
+
+    def latency_stats(self) -> Dict[str, dict]:
+        return self.client.latency_stats()
+
+    def close(self):
+        self.client.close()
+
+
+_default_client: Optional[TaskApiClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> TaskApiClient:
+    """Return the process-wide client, creating it on first use so API_URL is read after load_dotenv()."""
+    global _default_client  # pylint: disable=global-statement
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = TaskApiClient()
+    return _default_client
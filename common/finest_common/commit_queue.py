@@ -0,0 +1,580 @@
+"""Coalescing priority queue of miner commits, stored in Redis.
+
+fetch_commit pushes commits and process_commit pops them.
+
+Only the newest pending commit of a UID is kept: pushing a commit for a UID that is
+already queued replaces the payload (a "coalesced" commit) but keeps its place in the
+queue. Commits are handed out in order of
+
+    priority = enqueued_at - boost
+
+where `boost` (in seconds, capped at `max_boost`) rewards fresh commits, staked
+miners and miners that haven't been evaluated for a while. Because the boost is
+capped, a commit is never overtaken by one enqueued more than `max_boost` seconds
+after it, so no UID is starved.
+
+Workers take commits under a lease with a visibility timeout and ack them when done.
+A commit whose lease expires (the worker crashed or hung) goes back to the front of
+the queue, and after `max_deliveries` attempts it is moved to a dead-letter list.
+Several workers, on one or more hosts, can drain the queue in parallel.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+# Blocks after which a commit gets no freshness boost (~1 day).
+AGE_HORIZON = 7200
+# Seconds without evaluation after which a UID gets the full idle boost.
+IDLE_HORIZON = 24 * 3600
+# Number of queue heads inspected when looking for a UID that is not under lease.
+LEASE_SCAN = 64
+
+
+class CommitQueue:
+    """
+    Args:
+        redis_queue (redis.Redis): Redis connection.
+        name (str): Prefix of the Redis keys.
+        age_weight (float): Boost in seconds for a commit made at the current block.
+        stake_weight (float): Boost in seconds for the highest-staked UID.
+        idle_weight (float): Boost in seconds for a UID not evaluated for a day.
+        max_boost (float): Upper bound of the total boost in seconds.
+        max_deliveries (int): Leases after which a commit is dead-lettered.
+    """
+
+    def __init__(
+        self,
+        redis_queue: redis.Redis,
+        name: str = "commit_queue",
+        age_weight: float = 3600.0,
+        stake_weight: float = 3600.0,
+        idle_weight: float = 7200.0,
+        max_boost: float = 6 * 3600.0,
+        max_deliveries: int = 3,
+    ):
+        self.redis_queue = redis_queue
+        self.name = name
+        self.age_weight = age_weight
+        self.stake_weight = stake_weight
+        self.idle_weight = idle_weight
+        self.max_boost = max_boost
+        self.max_deliveries = max_deliveries
+
+        self.pending_key = f"{name}:pending"
+        self.priority_key = f"{name}:priority"
+        self.enqueued_key = f"{name}:enqueued_at"
+        self.evaluated_key = f"{name}:last_evaluated"
+        self.stats_key = f"{name}:stats"
+        self.leases_key = f"{name}:leases"
+        self.leased_key = f"{name}:leased"
+        self.dead_key = f"{name}:dead"
+
+    @property
+    def watch_keys(self) -> List[str]:
+        """Keys to WATCH when staging a push inside another transaction."""
+        return [self.enqueued_key, self.evaluated_key]
+
+    def boost(
+        self,
+        commit_block: int,
+        current_block: int,
+        stake: float = 0.0,
+        last_evaluated: Optional[float] = None,
+        now: Optional[float] = None,
+    ) -> float:
+        """
+        Seconds a commit is moved ahead in the queue.
+
+        Args:
+            commit_block (int): Block the commit was made at.
+            current_block (int): Current block.
+            stake (float): Stake of the UID relative to the highest stake, in [0, 1].
+            last_evaluated (float): Timestamp of the UID's last evaluation, if any.
+            now (float): Current timestamp.
+        """
+        now = time.time() if now is None else now
+        freshness = max(
+            0.0, 1.0 - (current_block - commit_block) / AGE_HORIZON
+        )
+        if last_evaluated is None:
+            idle = 1.0
+        else:
+            idle = min(max(now - last_evaluated, 0.0) / IDLE_HORIZON, 1.0)
+        boost = (
+            self.age_weight * freshness
+            + self.stake_weight * min(max(stake, 0.0), 1.0)
+            + self.idle_weight * idle
+        )
+        return min(boost, self.max_boost)
+
+    def read_state(self, pipe) -> None:
+        """Queue the reads `stage_push` needs (enqueued_at, last_evaluated) on `pipe`."""
+        pipe.hgetall(self.enqueued_key)
+        pipe.hgetall(self.evaluated_key)
+
+    def stage_push(
+        self,
+        transaction,
+        items: List[dict],
+        current_block: int,
+        enqueued_at: Dict,
+        last_evaluated: Dict,
+        stakes: Optional[Dict[int, float]] = None,
+        now: Optional[float] = None,
+    ) -> int:
+        """
+        Queue the commands pushing `items` on a MULTI transaction.
+
+        Args:
+            transaction: Redis pipeline in MULTI mode.
+            items (list): Commit payloads, each with "uid" and "commit_block".
+            current_block (int): Current block.
+            enqueued_at (dict): Raw `enqueued_at` hash, as read by `read_state`.
+            last_evaluated (dict): Raw `last_evaluated` hash, as read by `read_state`.
+            stakes (dict): uid -> relative stake in [0, 1].
+            now (float): Current timestamp.
+
+        Returns:
+            int: Number of items replacing a pending commit of the same UID.
+        """
+        if not items:
+            return 0
+        now = time.time() if now is None else now
+        stakes = stakes or {}
+        enqueued_at = {int(uid): float(ts) for uid, ts in enqueued_at.items()}
+        last_evaluated = {
+            int(uid): float(ts) for uid, ts in last_evaluated.items()
+        }
+
+        payloads, priorities, new_entries = {}, {}, {}
+        coalesced = 0
+        for item in items:
+            uid = int(item["uid"])
+            if uid in enqueued_at:
+                coalesced += 1
+            else:
+                enqueued_at[uid] = new_entries[uid] = now
+            boost = self.boost(
+                item["commit_block"],
+                current_block,
+                stakes.get(uid, 0.0),
+                last_evaluated.get(uid),
+                now,
+            )
+            payloads[uid] = json.dumps(item)
+            priorities[uid] = enqueued_at[uid] - boost
+
+        transaction.hset(self.pending_key, mapping=payloads)
+        if new_entries:
+            transaction.hset(self.enqueued_key, mapping=new_entries)
+        transaction.zadd(self.priority_key, priorities)
+        transaction.hincrby(self.stats_key, "enqueued", len(items))
+        if coalesced:
+            transaction.hincrby(self.stats_key, "coalesced", coalesced)
+        return coalesced
+
+    def push(
+        self,
+        items: List[dict],
+        current_block: int,
+        stakes: Optional[Dict[int, float]] = None,
+        max_attempts: int = 5,
+    ) -> int:
+        """Push commits in their own transaction. Returns the number coalesced."""
+        with self.redis_queue.pipeline() as transaction:
+            for _ in range(max_attempts):
+                try:
+                    transaction.watch(*self.watch_keys)
+                    reads = self.redis_queue.pipeline(transaction=False)
+                    self.read_state(reads)
+                    enqueued_at, last_evaluated = reads.execute()
+                    transaction.multi()
+                    coalesced = self.stage_push(
+                        transaction,
+                        items,
+                        current_block,
+                        enqueued_at,
+                        last_evaluated,
+                        stakes,
+                    )
+                    transaction.execute()
+                    return coalesced
+                except redis.WatchError:
+                    continue
+        raise RuntimeError(
+            f"Commit queue kept changing, gave up after {max_attempts} attempts"
+        )
+
+    def lease(
+        self,
+        worker: str,
+        visibility_timeout: float = 600.0,
+        max_attempts: int = 5,
+    ) -> Optional[dict]:
+        """
+        Lease the highest-priority pending commit to `worker`.
+
+        The commit stays invisible to other workers until it is acked or the lease
+        expires without being extended; an expired lease is put back in the queue by
+        `requeue_expired`. UIDs with a commit under lease are skipped, so one UID is
+        never evaluated by two workers at once. Leasing a commit records the UID's
+        evaluation time.
+
+        Args:
+            worker (str): Identifier of the worker taking the lease.
+            visibility_timeout (float): Seconds before an unextended lease expires.
+
+        Returns:
+            dict: The commit payload with its "deliveries" count, or None if no
+                commit is available.
+        """
+        with self.redis_queue.pipeline() as transaction:
+            for _ in range(max_attempts):
+                try:
+                    transaction.watch(
+                        self.priority_key, self.leases_key, self.pending_key
+                    )
+                    head = transaction.zrange(
+                        self.priority_key, 0, LEASE_SCAN - 1
+                    )
+                    leased = set(transaction.zrange(self.leases_key, 0, -1))
+                    uid = next(
+                        (uid for uid in head if uid not in leased), None
+                    )
+                    if uid is None:
+                        transaction.unwatch()
+                        return None
+                    payload = transaction.hget(self.pending_key, uid)
+                    now = time.time()
+
+                    transaction.multi()
+                    transaction.zrem(self.priority_key, uid)
+                    transaction.hdel(self.pending_key, uid)
+                    transaction.hdel(self.enqueued_key, uid)
+                    if payload is None:
+                        transaction.execute()
+                        logger.warning(
+                            f"Dropping queue entry {uid!r} without payload"
+                        )
+                        continue
+                    item = json.loads(payload)
+                    item["deliveries"] = item.get("deliveries", 0) + 1
+                    transaction.zadd(
+                        self.leases_key, {uid: now + visibility_timeout}
+                    )
+                    transaction.hset(
+                        self.leased_key,
+                        uid,
+                        json.dumps({"worker": worker, "item": item}),
+                    )
+                    transaction.hset(self.evaluated_key, uid, now)
+                    transaction.hincrby(self.stats_key, "leased", 1)
+                    transaction.execute()
+                    return item
+                except redis.WatchError:
+                    continue
+        return None
+
+    def _owned_lease(self, transaction, uid, worker: str) -> Optional[dict]:
+        entry = transaction.hget(self.leased_key, uid)
+        if entry is None:
+            return None
+        entry = json.loads(entry)
+        return entry if entry["worker"] == worker else None
+
+    def extend(
+        self, uid, worker: str, visibility_timeout: float = 600.0
+    ) -> bool:
+        """
+        Push back the expiry of a lease held by `worker`.
+
+        Returns:
+            bool: False if the lease expired and was given to another worker.
+        """
+        with self.redis_queue.pipeline() as transaction:
+            try:
+                transaction.watch(self.leased_key)
+                if self._owned_lease(transaction, uid, worker) is None:
+                    transaction.unwatch()
+                    return False
+                transaction.multi()
+                transaction.zadd(
+                    self.leases_key, {uid: time.time() + visibility_timeout}
+                )
+                transaction.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+    def ack(self, uid, worker: str) -> bool:
+        """
+        Mark a leased commit as done and drop it from the queue.
+
+        Returns:
+            bool: False if the lease was no longer held by `worker`.
+        """
+        with self.redis_queue.pipeline() as transaction:
+            for _ in range(3):
+                try:
+                    transaction.watch(self.leased_key)
+                    if self._owned_lease(transaction, uid, worker) is None:
+                        transaction.unwatch()
+                        logger.warning(
+                            f"Lease on UID {uid} was lost before it was acked"
+                        )
+                        return False
+                    transaction.multi()
+                    transaction.zrem(self.leases_key, uid)
+                    transaction.hdel(self.leased_key, uid)
+                    transaction.hincrby(self.stats_key, "acked", 1)
+                    transaction.execute()
+                    return True
+                except redis.WatchError:
+                    continue
+        return False
+
+    def nack(self, uid, worker: str, reason: str = "") -> bool:
+        """Give a leased commit back to the queue right away, e.g. after a failure."""
+        with self.redis_queue.pipeline() as transaction:
+            try:
+                transaction.watch(self.leased_key)
+                if self._owned_lease(transaction, uid, worker) is None:
+                    transaction.unwatch()
+                    return False
+                transaction.multi()
+                transaction.zadd(self.leases_key, {uid: 0})
+                transaction.execute()
+            except redis.WatchError:
+                return False
+        self.requeue_expired(reason=reason or "nack")
+        return True
+
+    def release_worker(self, worker: str) -> int:
+        """
+        Expire every lease held by `worker` and requeue the commits. Called when a
+        worker restarts, so the commits it was evaluating are resumed right away
+        instead of after the visibility timeout.
+        """
+        expired = 0
+        with self.redis_queue.pipeline() as pipe:
+            for uid, entry in self.redis_queue.hgetall(
+                self.leased_key
+            ).items():
+                if json.loads(entry)["worker"] == worker:
+                    pipe.zadd(self.leases_key, {uid: 0}, xx=True)
+                    expired += 1
+            pipe.execute()
+        if expired:
+            self.requeue_expired(reason="worker restarted")
+        return expired
+
+    def requeue_expired(
+        self, reason: str = "lease expired", max_attempts: int = 5
+    ) -> int:
+        """
+        Put commits whose lease expired back at the front of the queue.
+
+        A commit delivered `max_deliveries` times is moved to the dead-letter list
+        instead, and one superseded by a newer pending commit of the same UID is
+        dropped.
+
+        Returns:
+            int: Number of expired leases handled.
+        """
+        with self.redis_queue.pipeline() as transaction:
+            for _ in range(max_attempts):
+                try:
+                    transaction.watch(self.leases_key, self.pending_key)
+                    now = time.time()
+                    expired = transaction.zrangebyscore(
+                        self.leases_key, "-inf", now
+                    )
+                    if not expired:
+                        transaction.unwatch()
+                        return 0
+                    entries = transaction.hmget(self.leased_key, expired)
+                    pending = transaction.hmget(self.pending_key, expired)
+
+                    transaction.multi()
+                    for uid, entry, newer in zip(expired, entries, pending):
+                        transaction.zrem(self.leases_key, uid)
+                        transaction.hdel(self.leased_key, uid)
+                        if entry is None:
+                            continue
+                        entry = json.loads(entry)
+                        item = entry["item"]
+                        if item["deliveries"] >= self.max_deliveries:
+                            logger.error(
+                                f"Commit for UID {item['uid']} failed {item['deliveries']} "
+                                f"times, moving it to the dead-letter list"
+                            )
+                            transaction.rpush(
+                                self.dead_key,
+                                json.dumps(
+                                    {
+                                        "item": item,
+                                        "worker": entry["worker"],
+                                        "reason": reason,
+                                        "failed_at": now,
+                                    }
+                                ),
+                            )
+                            transaction.hincrby(
+                                self.stats_key, "dead_lettered", 1
+                            )
+                        elif newer is not None:
+                            transaction.hincrby(self.stats_key, "coalesced", 1)
+                        else:
+                            transaction.hset(
+                                self.pending_key, uid, json.dumps(item)
+                            )
+                            transaction.hset(self.enqueued_key, uid, now)
+                            transaction.zadd(
+                                self.priority_key, {uid: now - self.max_boost}
+                            )
+                            transaction.hincrby(self.stats_key, "requeued", 1)
+                    transaction.execute()
+                    return len(expired)
+                except redis.WatchError:
+                    continue
+        return 0
+
+    def dead_letters(self) -> List[dict]:
+        """Commits that exhausted their deliveries, oldest first."""
+        return [
+            json.loads(entry)
+            for entry in self.redis_queue.lrange(self.dead_key, 0, -1)
+        ]
+
+    def depth(self) -> int:
+        """Number of UIDs with a pending commit."""
+        return self.redis_queue.zcard(self.priority_key)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth, age of the oldest pending commit, commits in flight and the
+        lifetime counters."""
+        reads = self.redis_queue.pipeline(transaction=False)
+        reads.zcard(self.priority_key)
+        reads.hgetall(self.enqueued_key)
+        reads.zcard(self.leases_key)
+        reads.llen(self.dead_key)
+        reads.hgetall(self.stats_key)
+        depth, enqueued_at, in_flight, dead, counters = reads.execute()
+        oldest = min((float(ts) for ts in enqueued_at.values()), default=None)
+        stats = {
+            "depth": depth,
+            "age": int(time.time() - oldest) if oldest is not None else 0,
+            "in_flight": in_flight,
+            "dead": dead,
+            "enqueued": 0,
+            "coalesced": 0,
+            "leased": 0,
+            "acked": 0,
+            "requeued": 0,
+            "dead_lettered": 0,
+        }
+        stats.update(
+            {key.decode(): int(value) for key, value in counters.items()}
+        )
+        return stats
+
+    def register_metrics(self, registry) -> None:
+        """Exports `stats()` to a `metrics.Registry`, read when the metrics are collected."""
+        depth = registry.gauge(
+            "validator_commit_queue_depth", "Pending commits in the queue"
+        )
+        age = registry.gauge(
+            "validator_commit_queue_age_seconds",
+            "Age of the oldest pending commit",
+        )
+        in_flight = registry.gauge(
+            "validator_commit_queue_in_flight", "Commits leased to a worker"
+        )
+        dead = registry.gauge(
+            "validator_commit_queue_dead", "Commits in the dead-letter list"
+        )
+        events = registry.counter(
+            "validator_commit_queue_events_total",
+            "Lifetime commit queue events, by event",
+        )
+
+        def collect():
+            stats = self.stats()
+            depth.set(stats.pop("depth"))
+            age.set(stats.pop("age"))
+            in_flight.set(stats.pop("in_flight"))
+            dead.set(stats.pop("dead"))
+            for event, total in stats.items():
+                events.set_total(total, event=event)
+
+        registry.add_collector(collect)
+
+    def clear(self) -> None:
+        """Drop every pending and leased commit and reset the counters."""
+        self.redis_queue.delete(
+            self.pending_key,
+            self.priority_key,
+            self.enqueued_key,
+            self.leases_key,
+            self.leased_key,
+            self.stats_key,
+        )
+
+
+class LeaseKeeper:
+    """
+    Extends a lease from a background thread while the commit is being evaluated.
+
+    Training runs for far longer than the visibility timeout; the lease only expires
+    if the worker dies or hangs, because then it stops being extended.
+
+    Args:
+        commit_queue (CommitQueue): Queue the lease was taken from.
+        uid: UID of the leased commit.
+        worker (str): Worker holding the lease.
+        visibility_timeout (float): Seconds each extension pushes the expiry back.
+    """
+
+    def __init__(
+        self,
+        commit_queue: CommitQueue,
+        uid,
+        worker: str,
+        visibility_timeout: float,
+    ):
+        self.commit_queue = commit_queue
+        self.uid = uid
+        self.worker = worker
+        self.visibility_timeout = visibility_timeout
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.visibility_timeout / 3):
+            try:
+                if not self.commit_queue.extend(
+                    self.uid, self.worker, self.visibility_timeout
+                ):
+                    self.lost = True
+                    logger.warning(f"Lease on UID {self.uid} was lost")
+                    return
+            except Exception as e:
+                logger.warning(
+                    f"Failed to extend the lease on UID {self.uid}: {e}"
+                )
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,82 @@
+"""Liveness heartbeats of the validator processes.
+
+Each component periodically writes what it's doing to a hash of the state backend
+that expires after the time budget of that activity. The supervisor
+(`validator/main.py`) restarts a process whose heartbeat has expired, i.e. one that
+is alive but stuck.
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+import redis
+
+logger = logging.getLogger(__name__)
+
+
+def heartbeat_key(component: str) -> str:
+    return f"heartbeat:{component}"
+
+
+class Heartbeat:
+    """
+    Args:
+        redis_queue (redis.Redis): Redis connection or other state backend.
+        component (str): Name of the component, which the supervisor knows it by.
+        timeout (float): Default seconds an activity may take before the process
+            is considered stuck.
+        min_interval (float): Seconds during which an unchanged activity is not
+            written again.
+    """
+
+    def __init__(
+        self,
+        redis_queue: redis.Redis,
+        component: str,
+        timeout: float = 300.0,
+        min_interval: float = 10.0,
+    ):
+        self.redis_queue = redis_queue
+        self.key = heartbeat_key(component)
+        self.timeout = timeout
+        self.min_interval = min_interval
+        self.activity: Optional[str] = None
+        self.activity_since = time.time()
+        self.written_at = 0.0
+
+    def beat(self, activity: str, timeout: Optional[float] = None):
+        """
+        Reports the current activity.
+
+        Args:
+            activity (str): What the process is doing, shown on the status endpoint.
+            timeout (float): Seconds this activity may take; defaults to `timeout`.
+        """
+        now = time.time()
+        if activity != self.activity:
+            self.activity = activity
+            self.activity_since = now
+        elif now - self.written_at < self.min_interval:
+            return
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            with self.redis_queue.pipeline() as transaction:
+                transaction.hset(
+                    self.key,
+                    mapping={
+                        "activity": activity,
+                        "activity_since": self.activity_since,
+                        "updated_at": now,
+                        "pid": os.getpid(),
+                        "host": socket.gethostname(),
+                    },
+                )
+                transaction.expire(self.key, max(1, int(timeout)))
+                transaction.execute()
+            self.written_at = now
+        except Exception as e:
+            # A heartbeat must never take the process down.
+            logger.debug(f"Unable to write heartbeat {self.key}: {e}")
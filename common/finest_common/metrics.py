@@ -0,0 +1,523 @@
+"""Prometheus metrics of the validator processes.
+
+Every process registers its counters, gauges and histograms in the module-level
+`REGISTRY`. Updating a metric is a lock and a few additions, cheap enough for the hot
+loops; values that cost a round trip to read (queue depth, ...) are refreshed by
+collectors that only run when the metrics are published. A `MetricsPublisher`
+writes the registry to the `metrics` hash of the state backend, and the supervisor
+(`validator/main.py`) serves the metrics of every process, including workers on
+other hosts, in the Prometheus text format on `/metrics`.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Name of the state backend hash the processes publish their metrics to.
+METRICS_KEY = "metrics"
+
+# Upper bounds (in seconds) of the default histogram buckets.
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    math.inf,
+)
+# Buckets for state backend commands, which mostly take well under a millisecond.
+BACKEND_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    math.inf,
+)
+# Buckets for the phases of a commit evaluation, from seconds to hours.
+PHASE_BUCKETS = (
+    1.0,
+    5.0,
+    15.0,
+    30.0,
+    60.0,
+    300.0,
+    600.0,
+    1800.0,
+    3600.0,
+    7200.0,
+    14400.0,
+    21600.0,
+    math.inf,
+)
+# Buckets for scores, which are in [0, 1].
+SCORE_BUCKETS = (
+    0.0,
+    0.1,
+    0.2,
+    0.3,
+    0.4,
+    0.5,
+    0.6,
+    0.7,
+    0.8,
+    0.9,
+    1.0,
+    math.inf,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    """
+    Base of the metric types; one value (or histogram) per label set.
+
+    Args:
+        name (str): Metric name, e.g. "validator_fetch_cycle_seconds".
+        documentation (str): Description shown by Prometheus.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.help = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[Labels, float] = {}
+
+    def samples(self) -> List[list]:
+        with self._lock:
+            return [
+                ["", dict(labels), value]
+                for labels, value in self._values.items()
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def family(self) -> dict:
+        return {
+            "name": self.name,
+            "type": self.type,
+            "help": self.help,
+            "samples": self.samples(),
+        }
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirrors a counter kept elsewhere, e.g. in the state backend."""
+        with self._lock:
+            self._values[_labels(labels)] = float(value)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0.0)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_labels(labels)] = float(value)
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_labels(labels), 0.0)
+
+
+class Histogram(Metric):
+    """
+    Cumulative histogram in the Prometheus layout (`_bucket`, `_sum`, `_count`).
+
+    Args:
+        buckets (tuple): Increasing upper bounds, ending with `math.inf`.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != math.inf:
+            self.buckets += (math.inf,)
+        self._histograms: Dict[Labels, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Bucket counts, then the sum and the count.
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [
+                    0.0,
+                    0,
+                ]
+            histogram[bisect_left(self.buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the `with` block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[list]:
+        with self._lock:
+            histograms = [
+                (labels, list(values))
+                for labels, values in self._histograms.items()
+            ]
+        return histogram_samples(self.buckets, histograms)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def histogram_samples(buckets, histograms) -> List[list]:
+    """
+    Prometheus samples of histograms kept as per-bucket (non-cumulative) counts.
+
+    Args:
+        buckets (tuple): Upper bounds of the buckets.
+        histograms (list): (labels, [bucket counts..., sum, count]) pairs.
+    """
+    samples = []
+    for labels, values in histograms:
+        labels = dict(labels)
+        cumulative = 0
+        for bound, count in zip(buckets, values):
+            cumulative += count
+            samples.append(
+                ["_bucket", {**labels, "le": format_value(bound)}, cumulative]
+            )
+        samples.append(["_sum", labels, values[-2]])
+        samples.append(["_count", labels, values[-1]])
+    return samples
+
+
+def latency_family(
+    name: str, documentation: str, label: str, histograms: dict
+) -> dict:
+    """
+    Histogram family of `api_client.LatencyHistogram`s, e.g. the per-endpoint
+    latencies of the task API client.
+
+    Args:
+        label (str): Label holding the keys of `histograms`.
+        histograms (dict): Histograms by label value.
+    """
+    buckets = None
+    values = []
+    for key, histogram in list(histograms.items()):
+        buckets = histogram.buckets
+        values.append(
+            (
+                {label: key},
+                list(histogram.counts) + [histogram.total, histogram.count],
+            )
+        )
+    samples = histogram_samples(buckets, values) if buckets else []
+    return {
+        "name": name,
+        "type": "histogram",
+        "help": documentation,
+        "samples": samples,
+    }
+
+
+class Registry:
+    """Metrics of one process, plus collectors refreshing them before each collection."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Optional[List[dict]]]] = []
+
+    def _register(
+        self, cls, name: str, documentation: str, **kwargs
+    ) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    name, documentation, **kwargs
+                )
+            elif not isinstance(metric, cls):
+                raise ValueError(
+                    f"Metric {name} is already registered as a {metric.type}"
+                )
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge, name, documentation)
+
+    def histogram(
+        self, name: str, documentation: str, buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram, name, documentation, buckets=buckets)
+
+    def add_collector(self, collector: Callable[[], Optional[List[dict]]]):
+        """
+        Registers a function called on every collection. It may update metrics of the
+        registry and may return extra metric families; errors are logged and skipped.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> List[dict]:
+        families = []
+        for collector in list(self._collectors):
+            try:
+                families.extend(collector() or [])
+            except Exception as e:
+                logger.debug(f"Metrics collector {collector!r} failed: {e}")
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [metric.family() for metric in metrics] + families
+
+
+REGISTRY = Registry()
+
+
+def render(families: List[dict]) -> str:
+    """Renders metric families in the Prometheus text exposition format."""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for suffix, labels, value in family["samples"]:
+            if labels:
+                label_text = ",".join(
+                    f'{key}="{_escape(value)}"'
+                    for key, value in sorted(labels.items())
+                )
+                lines.append(
+                    f"{family['name']}{suffix}{{{label_text}}} {format_value(value)}"
+                )
+            else:
+                lines.append(f"{family['name']}{suffix} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def merge(published: Dict[str, List[dict]]) -> List[dict]:
+    """
+    Merges the families published by several processes into one list, adding a
+    `component` label to every sample.
+
+    Args:
+        published (dict): Families of each component, by component name.
+    """
+    merged: Dict[str, dict] = {}
+    for component, families in published.items():
+        for family in families:
+            target = merged.setdefault(
+                family["name"], {**family, "samples": []}
+            )
+            target["samples"].extend(
+                [suffix, {**labels, "component": component}, value]
+                for suffix, labels, value in family["samples"]
+            )
+    return list(merged.values())
+
+
+def instrument_backend(store, registry: Registry = REGISTRY):
+    """
+    Times every command sent to a state backend connection (see `state_backend`) in
+    `validator_backend_seconds`, by command; pipelines and transactions are timed as
+    a whole when executed.
+
+    Returns:
+        The same connection, instrumented.
+    """
+    histogram = registry.histogram(
+        "validator_backend_seconds",
+        "Latency of the state backend commands",
+        buckets=BACKEND_BUCKETS,
+    )
+    errors = registry.counter(
+        "validator_backend_errors_total", "State backend commands that raised"
+    )
+    execute_command = store.execute_command
+    pipeline = store.pipeline
+
+    def timed_execute_command(*args, **kwargs):
+        command = str(args[0]).split(" ", 1)[0].upper() if args else "UNKNOWN"
+        start = time.perf_counter()
+        try:
+            return execute_command(*args, **kwargs)
+        except Exception:
+            errors.inc(command=command)
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start, command=command)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+        transaction = kwargs.get("transaction", args[0] if args else True)
+        command = "MULTI/EXEC" if transaction else "PIPELINE"
+
+        def timed_execute(*execute_args, **execute_kwargs):
+            start = time.perf_counter()
+            try:
+                return execute(*execute_args, **execute_kwargs)
+            except Exception:
+                errors.inc(command=command)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, command=command)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    store.execute_command = timed_execute_command
+    store.pipeline = timed_pipeline
+    return store
+
+
+class MetricsPublisher:
+    """
+    Background thread writing the registry to the `metrics` hash of the state backend,
+    where the supervisor reads it.
+
+    Args:
+        store: State backend connection.
+        component (str): Name of the process, added to its metrics as a label.
+        interval (float): Seconds between two publications.
+        registry (Registry): Metrics to publish.
+    """
+
+    def __init__(
+        self,
+        store,
+        component: str,
+        interval: float = 15.0,
+        registry: Registry = REGISTRY,
+    ):
+        self.store = store
+        self.component = component
+        self.interval = interval
+        self.registry = registry
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"metrics-{component}", daemon=True
+        )
+
+    def publish(self):
+        payload = json.dumps(
+            {"updated_at": time.time(), "families": self.registry.collect()}
+        )
+        self.store.hset(METRICS_KEY, self.component, payload)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                # Metrics must never take the process down.
+                logger.debug(
+                    f"Unable to publish the metrics of {self.component}: {e}"
+                )
+
+    def start(self) -> "MetricsPublisher":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+
+def publish_metrics(
+    store, component: str, interval: float = 15.0
+) -> Optional[MetricsPublisher]:
+    """
+    Times the commands sent to `store` and publishes the registry to it every
+    `interval` seconds; an interval of 0 disables both.
+    """
+    if interval <= 0:
+        return None
+    instrument_backend(store)
+    return MetricsPublisher(store, component, interval).start()
+
+
+def read_published(store, max_age: float = 300.0) -> Dict[str, List[dict]]:
+    """Families published by every process, skipping those not updated for `max_age` seconds."""
+    published = {}
+    now = time.time()
+    for component, raw in store.hgetall(METRICS_KEY).items():
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        if now - data.get("updated_at", 0) <= max_age:
+            component = (
+                component.decode()
+                if isinstance(component, bytes)
+                else component
+            )
+            published[component] = data["families"]
+    return published
@@ -0,0 +1,147 @@
+"""Local, persistent store of miner scores.
+
+Every score change is appended to a log in a SQLite database (WAL mode, so the
+validator processes can write to it concurrently). The log is periodically folded
+into a per-UID snapshot table, so loading the current scores reads at most one
+snapshot plus a short tail of the log.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Optional
+
+from finest_common import VALIDATOR_DIR
+
+logger = logging.getLogger(__name__)
+
+# Score store shared by fetch_commit and process_commit.
+DEFAULT_SCORE_DB = os.path.join(VALIDATOR_DIR, "scores.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS score_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid INTEGER NOT NULL,
+    score REAL NOT NULL,
+    source TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS score_snapshot (
+    uid INTEGER PRIMARY KEY,
+    score REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class ScoreStore:
+    """
+    Args:
+        path (str): SQLite database file.
+        snapshot_every (int): Log entries after which the log is folded into the
+            snapshot.
+    """
+
+    def __init__(self, path: str, snapshot_every: int = 1000):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, value),
+        )
+
+    def _snapshot_seq(self) -> int:
+        return int(self.get_meta("snapshot_seq") or 0)
+
+    def record(self, scores: Dict[int, float], source: str = ""):
+        """
+        Appends score changes to the log.
+
+        Args:
+            scores (dict): uid -> new score.
+            source (str): Component that changed the scores, kept for auditing.
+        """
+        if not scores:
+            return
+        now = time.time()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.executemany(
+                "INSERT INTO score_log (uid, score, source, recorded_at) VALUES (?, ?, ?, ?)",
+                [
+                    (int(uid), float(score), source, now)
+                    for uid, score in scores.items()
+                ],
+            )
+            last_seq = self.connection.execute(
+                "SELECT MAX(seq) FROM score_log"
+            ).fetchone()[0]
+        if last_seq - self._snapshot_seq() >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self):
+        """Folds the log into the snapshot table and drops the folded entries."""
+        start = time.perf_counter()
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            last_seq = self.connection.execute(
+                "SELECT MAX(seq) FROM score_log"
+            ).fetchone()[0]
+            if last_seq is None:
+                return
+            # The latest entry of each UID wins.
+            self.connection.execute(
+                """
+                INSERT OR REPLACE INTO score_snapshot (uid, score)
+                SELECT uid, score FROM score_log
+                WHERE seq IN (SELECT MAX(seq) FROM score_log WHERE seq <= ? GROUP BY uid)
+                """,
+                (last_seq,),
+            )
+            self.connection.execute(
+                "DELETE FROM score_log WHERE seq <= ?", (last_seq,)
+            )
+            self.set_meta("snapshot_seq", str(last_seq))
+        logger.info(
+            f"Score snapshot taken up to entry {last_seq} in {time.perf_counter() - start:.3f}s"
+        )
+
+    def load(self) -> Dict[int, float]:
+        """Returns the current score of every UID: the snapshot plus the log tail."""
+        # One read transaction, so a snapshot taken by another process
+        # between the two reads can't move log entries out of sight.
+        with self.connection:
+            self.connection.execute("BEGIN")
+            scores = dict(
+                self.connection.execute(
+                    "SELECT uid, score FROM score_snapshot"
+                )
+            )
+            scores.update(
+                (uid, score)
+                for uid, score in self.connection.execute(
+                    "SELECT uid, score FROM score_log ORDER BY seq"
+                )
+            )
+        return scores
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,981 @@
+"""Queue and state backends of the validator.
+
+The validator processes share the commit queue, the report queue, the scores, the
+previous commits and their heartbeats through a handful of Redis commands. The store
+behind those commands is chosen with a URL:
+
+    redis://localhost:6379/0       Redis over TCP (the default)
+    unix:///run/redis.sock?db=0    Redis over a unix socket
+    sqlite:///path/to/state.db     Embedded SQLite database in WAL mode, shared by
+                                   the processes of a single host
+    memory://[name]                In-process store, for tests, benchmarks and
+                                   components running in one process
+
+The embedded stores implement the subset of the redis-py client the validator uses,
+WATCH/MULTI/EXEC transactions included, and raise the same exceptions, so the code
+on top of them runs unchanged on every backend.
+"""
+
+import contextlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import redis
+
+DEFAULT_URL = "redis://localhost:6379/0"
+
+# Seconds between two reads of an empty list by a blocking pop on SQLite.
+SQLITE_POLL_INTERVAL = 0.05
+
+# Commands modifying their key, which invalidates a WATCH on it.
+WRITE_COMMANDS = {
+    "set",
+    "expire",
+    "hset",
+    "hdel",
+    "hincrby",
+    "zadd",
+    "zrem",
+    "lpush",
+    "rpush",
+    "lpop",
+    "ltrim",
+}
+# Commands that can empty their key; an empty key no longer exists, nor does its TTL.
+REMOVE_COMMANDS = {"hdel", "zrem", "lpop", "ltrim"}
+# Commands taking a list of keys instead of a single one.
+MULTI_KEY_COMMANDS = {"delete", "exists"}
+
+_memory_stores: Dict[str, "MemoryStore"] = {}
+_memory_stores_lock = threading.Lock()
+
+
+def connect(url: str = DEFAULT_URL):
+    """
+    Opens the backend designated by `url`.
+
+    Returns:
+        A `redis.Redis` client, or an embedded store with the same interface.
+    """
+    scheme, _, location = url.partition("://")
+    if scheme in ("redis", "rediss", "unix"):
+        return redis.Redis.from_url(url)
+    if scheme == "sqlite":
+        if not location:
+            raise ValueError(f"No database file in backend URL {url!r}")
+        return SQLiteStore(location)
+    if scheme == "memory":
+        # Every connection to the same name shares one store, like clients of a server.
+        with _memory_stores_lock:
+            return _memory_stores.setdefault(location, MemoryStore())
+    raise ValueError(
+        f"Unsupported backend URL {url!r}, expected redis://, unix://, sqlite:// or memory://"
+    )
+
+
+def _encode(value) -> bytes:
+    """Encodes keys and values the way redis-py does."""
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, str):
+        return value.encode()
+    if isinstance(value, bool):
+        raise redis.DataError(
+            "Invalid input of type: 'bool'. Convert to a bytes, string, int or float first."
+        )
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    raise redis.DataError(f"Invalid input of type: {type(value).__name__!r}")
+
+
+def _score(value) -> float:
+    if isinstance(value, bytes):
+        value = value.decode()
+    return float(value)
+
+
+def _bounds(start: int, stop: int, length: int) -> Optional[Tuple[int, int]]:
+    """Resolves Redis start/stop indexes (inclusive, negative from the end)."""
+    if start < 0:
+        start = max(length + start, 0)
+    if stop < 0:
+        stop = length + stop
+    stop = min(stop, length - 1)
+    if start > stop:
+        return None
+    return start, stop
+
+
+class Commands(ABC):
+    """The Redis commands used by the validator, shared by stores and pipelines."""
+
+    # The arguments keep redis-py's names, so they can be passed by keyword.
+    # pylint: disable=redefined-builtin,redefined-outer-name
+
+    @abstractmethod
+    def execute_command(self, command: str, *args):
+        ...
+
+    def ping(self):
+        return self.execute_command("ping")
+
+    def get(self, name):
+        return self.execute_command("get", _encode(name))
+
+    def set(self, name, value, ex=None, nx: bool = False):
+        return self.execute_command(
+            "set", _encode(name), _encode(value), ex, nx
+        )
+
+    def delete(self, *names):
+        return self.execute_command(
+            "delete", [_encode(name) for name in names]
+        )
+
+    def exists(self, *names):
+        return self.execute_command(
+            "exists", [_encode(name) for name in names]
+        )
+
+    def expire(self, name, time):
+        return self.execute_command("expire", _encode(name), float(time))
+
+    def hget(self, name, key):
+        return self.execute_command("hget", _encode(name), _encode(key))
+
+    def hgetall(self, name):
+        return self.execute_command("hgetall", _encode(name))
+
+    def hmget(self, name, keys, *args):
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        return self.execute_command(
+            "hmget", _encode(name), [_encode(key) for key in keys + list(args)]
+        )
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = {}
+        if key is not None:
+            items[_encode(key)] = _encode(value)
+        for field, field_value in (mapping or {}).items():
+            items[_encode(field)] = _encode(field_value)
+        if not items:
+            raise redis.DataError("'hset' with no key value pairs")
+        return self.execute_command("hset", _encode(name), items)
+
+    def hdel(self, name, *keys):
+        return self.execute_command(
+            "hdel", _encode(name), [_encode(key) for key in keys]
+        )
+
+    def hincrby(self, name, key, amount: int = 1):
+        return self.execute_command(
+            "hincrby", _encode(name), _encode(key), int(amount)
+        )
+
+    def zadd(self, name, mapping, xx: bool = False, nx: bool = False):
+        return self.execute_command(
+            "zadd",
+            _encode(name),
+            {
+                _encode(member): float(score)
+                for member, score in mapping.items()
+            },
+            xx,
+            nx,
+        )
+
+    def zrem(self, name, *values):
+        return self.execute_command(
+            "zrem", _encode(name), [_encode(value) for value in values]
+        )
+
+    def zrange(self, name, start: int, end: int):
+        return self.execute_command(
+            "zrange", _encode(name), int(start), int(end)
+        )
+
+    def zrangebyscore(self, name, min, max):
+        return self.execute_command(
+            "zrangebyscore", _encode(name), _score(min), _score(max)
+        )
+
+    def zcard(self, name):
+        return self.execute_command("zcard", _encode(name))
+
+    def lpush(self, name, *values):
+        return self.execute_command(
+            "lpush", _encode(name), [_encode(value) for value in values]
+        )
+
+    def rpush(self, name, *values):
+        return self.execute_command(
+            "rpush", _encode(name), [_encode(value) for value in values]
+        )
+
+    def lpop(self, name):
+        return self.execute_command("lpop", _encode(name))
+
+    def lrange(self, name, start: int, end: int):
+        return self.execute_command(
+            "lrange", _encode(name), int(start), int(end)
+        )
+
+    def ltrim(self, name, start: int, end: int):
+        return self.execute_command(
+            "ltrim", _encode(name), int(start), int(end)
+        )
+
+    def llen(self, name):
+        return self.execute_command("llen", _encode(name))
+
+
+class Pipeline(Commands):
+    """
+    Pipeline of an embedded store, with redis-py's semantics: commands are buffered
+    until `execute`, except between `watch` and `multi`, where they run right away.
+    `execute` raises `redis.WatchError` if a watched key was modified since `watch`.
+    """
+
+    # pylint: disable=protected-access
+
+    def __init__(self, store: "LocalStore"):
+        self.store = store
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def __len__(self):
+        return len(self.commands)
+
+    def reset(self):
+        self.commands: List[tuple] = []
+        self.watched: Dict[bytes, int] = {}
+        self.watching = False
+
+    def execute_command(self, command: str, *args):
+        if self.watching:
+            return self.store.execute_command(command, *args)
+        self.commands.append((command, args))
+        return self
+
+    def watch(self, *names):
+        with self.store._atomic():
+            for name in names:
+                key = _encode(name)
+                self.store._expire_due(key)
+                self.watched[key] = self.store._version(key)
+        self.watching = True
+        return True
+
+    def unwatch(self):
+        self.watched = {}
+        self.watching = False
+        return True
+
+    def multi(self):
+        self.watching = False
+
+    def execute(self):
+        commands, watched = self.commands, self.watched
+        self.reset()
+        with self.store._atomic():
+            for key, version in watched.items():
+                self.store._expire_due(key)
+                if self.store._version(key) != version:
+                    raise redis.WatchError("Watched variable changed.")
+            return [
+                self.store._run(command, args) for command, args in commands
+            ]
+
+
+class LocalStore(Commands):
+    """
+    Base of the embedded stores. Runs each command, or each pipeline, atomically and
+    keeps a version per key for WATCH. Subclasses provide the storage.
+    """
+
+    # Pipelines are always transactions.
+    # pylint: disable-next=unused-argument
+    def pipeline(self, transaction: bool = True) -> Pipeline:
+        return Pipeline(self)
+
+    def execute_command(self, command: str, *args):
+        with self._atomic():
+            return self._run(command, args)
+
+    def close(self):
+        pass
+
+    def blpop(self, keys, timeout: float = 0):
+        """Pops the first element of the first non-empty list, waiting up to `timeout`
+        seconds (forever if 0) for one."""
+        keys = [keys] if isinstance(keys, (str, bytes)) else list(keys)
+        keys = [_encode(key) for key in keys]
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            with self._atomic():
+                for key in keys:
+                    value = self._run("lpop", (key,))
+                    if value is not None:
+                        return key, value
+                token = self._push_token()
+            remaining = (
+                None if deadline is None else deadline - time.monotonic()
+            )
+            if remaining is not None and remaining <= 0:
+                return None
+            self._wait_for_push(token, remaining)
+
+    def _run(self, command: str, args: tuple):
+        if command == "ping":
+            return True
+        keys = args[0] if command in MULTI_KEY_COMMANDS else [args[0]]
+        for key in keys:
+            self._expire_due(key)
+        result = getattr(self, f"_cmd_{command}")(*args)
+        # An empty list polled by a blocking pop is left untouched.
+        if command in WRITE_COMMANDS and not (
+            command == "lpop" and result is None
+        ):
+            for key in keys:
+                self._bump(key)
+        if command in REMOVE_COMMANDS and not self._exists_key(args[0]):
+            self._set_expiry(args[0], None)
+        return result
+
+    def _expire_due(self, key: bytes):
+        expires_at = self._expires_at(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._delete_key(key)
+            self._bump(key)
+
+    def _cmd_set(self, key: bytes, value: bytes, ex, nx: bool):
+        if nx and self._exists_key(key):
+            return None
+        self._delete_key(key)
+        self._set_string(key, value)
+        if ex is not None:
+            self._set_expiry(key, time.time() + float(ex))
+        return True
+
+    def _cmd_delete(self, keys: List[bytes]) -> int:
+        deleted = 0
+        for key in keys:
+            if self._delete_key(key):
+                self._bump(key)
+                deleted += 1
+        return deleted
+
+    def _cmd_exists(self, keys: List[bytes]) -> int:
+        return sum(1 for key in keys if self._exists_key(key))
+
+    def _cmd_expire(self, key: bytes, seconds: float) -> bool:
+        if not self._exists_key(key):
+            return False
+        self._set_expiry(key, time.time() + seconds)
+        return True
+
+    def _cmd_hmget(self, key: bytes, fields: List[bytes]) -> list:
+        return [self._cmd_hget(key, field) for field in fields]
+
+    def _cmd_hincrby(self, key: bytes, field: bytes, amount: int) -> int:
+        value = int(self._cmd_hget(key, field) or 0) + amount
+        self._cmd_hset(key, {field: _encode(value)})
+        return value
+
+    # Storage, implemented by the subclasses and always called inside `_atomic`.
+
+    @abstractmethod
+    def _atomic(self):
+        ...
+
+    @abstractmethod
+    def _push_token(self):
+        ...
+
+    @abstractmethod
+    def _wait_for_push(self, token, timeout: Optional[float]):
+        ...
+
+    @abstractmethod
+    def _version(self, key: bytes) -> int:
+        ...
+
+    @abstractmethod
+    def _bump(self, key: bytes):
+        ...
+
+    @abstractmethod
+    def _expires_at(self, key: bytes) -> Optional[float]:
+        ...
+
+    @abstractmethod
+    def _set_expiry(self, key: bytes, at: Optional[float]):
+        ...
+
+    @abstractmethod
+    def _exists_key(self, key: bytes) -> bool:
+        ...
+
+    @abstractmethod
+    def _delete_key(self, key: bytes) -> bool:
+        ...
+
+    @abstractmethod
+    def _set_string(self, key: bytes, value: bytes):
+        ...
+
+    # Commands depending on the storage layout.
+
+    @abstractmethod
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_hget(self, key: bytes, field: bytes) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_hgetall(self, key: bytes) -> Dict[bytes, bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_hset(self, key: bytes, items: Dict[bytes, bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_hdel(self, key: bytes, fields: List[bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_zadd(
+        self, key: bytes, mapping: Dict[bytes, float], xx: bool, nx: bool
+    ) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_zrem(self, key: bytes, members: List[bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_zrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_zrangebyscore(
+        self, key: bytes, low: float, high: float
+    ) -> List[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_zcard(self, key: bytes) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_lpush(self, key: bytes, values: List[bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_rpush(self, key: bytes, values: List[bytes]) -> int:
+        ...
+
+    @abstractmethod
+    def _cmd_lpop(self, key: bytes) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_lrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        ...
+
+    @abstractmethod
+    def _cmd_ltrim(self, key: bytes, start: int, stop: int) -> bool:
+        ...
+
+    @abstractmethod
+    def _cmd_llen(self, key: bytes) -> int:
+        ...
+
+
+class MemoryStore(LocalStore):
+    """Store kept in the memory of the process; shared by its threads."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._pushed = threading.Condition(self._lock)
+        self._pushes = 0
+        self._strings: Dict[bytes, bytes] = {}
+        self._hashes: Dict[bytes, Dict[bytes, bytes]] = {}
+        self._zsets: Dict[bytes, Dict[bytes, float]] = {}
+        self._lists: Dict[bytes, List[bytes]] = {}
+        self._expiry: Dict[bytes, float] = {}
+        self._versions: Dict[bytes, int] = defaultdict(int)
+
+    def _atomic(self):
+        return self._lock
+
+    def _push_token(self):
+        return self._pushes
+
+    def _wait_for_push(self, token, timeout: Optional[float]):
+        with self._pushed:
+            self._pushed.wait_for(lambda: self._pushes != token, timeout)
+
+    def _version(self, key: bytes) -> int:
+        return self._versions[key]
+
+    def _bump(self, key: bytes):
+        self._versions[key] += 1
+
+    def _expires_at(self, key: bytes) -> Optional[float]:
+        return self._expiry.get(key)
+
+    def _set_expiry(self, key: bytes, at: Optional[float]):
+        if at is None:
+            self._expiry.pop(key, None)
+        else:
+            self._expiry[key] = at
+
+    def _exists_key(self, key: bytes) -> bool:
+        return any(
+            key in table
+            for table in (
+                self._strings,
+                self._hashes,
+                self._zsets,
+                self._lists,
+            )
+        )
+
+    def _delete_key(self, key: bytes) -> bool:
+        self._expiry.pop(key, None)
+        existed = False
+        for table in (self._strings, self._hashes, self._zsets, self._lists):
+            existed = table.pop(key, None) is not None or existed
+        return existed
+
+    def _set_string(self, key: bytes, value: bytes):
+        self._strings[key] = value
+
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        return self._strings.get(key)
+
+    def _cmd_hget(self, key: bytes, field: bytes) -> Optional[bytes]:
+        return self._hashes.get(key, {}).get(field)
+
+    def _cmd_hgetall(self, key: bytes) -> Dict[bytes, bytes]:
+        return dict(self._hashes.get(key, {}))
+
+    def _cmd_hset(self, key: bytes, items: Dict[bytes, bytes]) -> int:
+        table = self._hashes.setdefault(key, {})
+        added = sum(1 for field in items if field not in table)
+        table.update(items)
+        return added
+
+    def _cmd_hdel(self, key: bytes, fields: List[bytes]) -> int:
+        table = self._hashes.get(key, {})
+        deleted = sum(
+            1 for field in fields if table.pop(field, None) is not None
+        )
+        if key in self._hashes and not table:
+            del self._hashes[key]
+        return deleted
+
+    def _cmd_zadd(
+        self, key: bytes, mapping: Dict[bytes, float], xx: bool, nx: bool
+    ) -> int:
+        table = self._zsets.setdefault(key, {})
+        added = 0
+        for member, score in mapping.items():
+            exists = member in table
+            if (xx and not exists) or (nx and exists):
+                continue
+            added += not exists
+            table[member] = score
+        if not table:
+            del self._zsets[key]
+        return added
+
+    def _cmd_zrem(self, key: bytes, members: List[bytes]) -> int:
+        table = self._zsets.get(key, {})
+        removed = sum(
+            1 for member in members if table.pop(member, None) is not None
+        )
+        if key in self._zsets and not table:
+            del self._zsets[key]
+        return removed
+
+    def _sorted(self, key: bytes) -> List[Tuple[bytes, float]]:
+        return sorted(
+            self._zsets.get(key, {}).items(),
+            key=lambda entry: (entry[1], entry[0]),
+        )
+
+    def _cmd_zrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        entries = self._sorted(key)
+        bounds = _bounds(start, stop, len(entries))
+        if bounds is None:
+            return []
+        return [member for member, _ in entries[bounds[0] : bounds[1] + 1]]
+
+    def _cmd_zrangebyscore(
+        self, key: bytes, low: float, high: float
+    ) -> List[bytes]:
+        return [
+            member
+            for member, score in self._sorted(key)
+            if low <= score <= high
+        ]
+
+    def _cmd_zcard(self, key: bytes) -> int:
+        return len(self._zsets.get(key, {}))
+
+    def _push(self, key: bytes, values: List[bytes], left: bool) -> int:
+        table = self._lists.setdefault(key, [])
+        if left:
+            table[:0] = reversed(values)
+        else:
+            table.extend(values)
+        self._pushes += 1
+        self._pushed.notify_all()
+        return len(table)
+
+    def _cmd_lpush(self, key: bytes, values: List[bytes]) -> int:
+        return self._push(key, values, left=True)
+
+    def _cmd_rpush(self, key: bytes, values: List[bytes]) -> int:
+        return self._push(key, values, left=False)
+
+    def _cmd_lpop(self, key: bytes) -> Optional[bytes]:
+        table = self._lists.get(key)
+        if not table:
+            return None
+        value = table.pop(0)
+        if not table:
+            del self._lists[key]
+        return value
+
+    def _cmd_lrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        table = self._lists.get(key, [])
+        bounds = _bounds(start, stop, len(table))
+        return [] if bounds is None else table[bounds[0] : bounds[1] + 1]
+
+    def _cmd_ltrim(self, key: bytes, start: int, stop: int) -> bool:
+        table = self._lists.get(key, [])
+        bounds = _bounds(start, stop, len(table))
+        table[:] = [] if bounds is None else table[bounds[0] : bounds[1] + 1]
+        if key in self._lists and not table:
+            del self._lists[key]
+        return True
+
+    def _cmd_llen(self, key: bytes) -> int:
+        return len(self._lists.get(key, []))
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    key BLOB NOT NULL,
+    field BLOB NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (key, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS zsets (
+    key BLOB NOT NULL,
+    member BLOB NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (key, member)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS zsets_by_score ON zsets (key, score, member);
+CREATE TABLE IF NOT EXISTS lists (
+    key BLOB NOT NULL,
+    position INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (key, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS expiry (
+    key BLOB PRIMARY KEY,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS versions (
+    key BLOB PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Tables holding the data of a key, one per Redis type.
+SQLITE_TABLES = ("strings", "hashes", "zsets", "lists")
+
+
+class SQLiteStore(LocalStore):
+    """
+    Store in a SQLite database (WAL mode) that the processes of one host share.
+
+    Every command, and every pipeline, runs in its own write transaction, and the key
+    versions WATCH compares are kept in the database, so transactions are atomic
+    across processes as they are on Redis.
+
+    Args:
+        path (str): Database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SQLITE_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @contextlib.contextmanager
+    def _atomic(self):
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield
+                finally:
+                    self._depth -= 1
+                return
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            else:
+                self.connection.execute("COMMIT")
+            finally:
+                self._depth = 0
+
+    def _push_token(self):
+        # Other processes push too, the lists are polled instead.
+        return None
+
+    def _wait_for_push(self, token, timeout: Optional[float]):
+        time.sleep(
+            SQLITE_POLL_INTERVAL
+            if timeout is None
+            else min(SQLITE_POLL_INTERVAL, timeout)
+        )
+
+    def _one(self, query: str, params: tuple):
+        row = self.connection.execute(query, params).fetchone()
+        return row[0] if row else None
+
+    def _version(self, key: bytes) -> int:
+        return (
+            self._one("SELECT version FROM versions WHERE key = ?", (key,))
+            or 0
+        )
+
+    def _bump(self, key: bytes):
+        self.connection.execute(
+            "INSERT INTO versions (key, version) VALUES (?, 1) "
+            "ON CONFLICT (key) DO UPDATE SET version = version + 1",
+            (key,),
+        )
+
+    def _expires_at(self, key: bytes) -> Optional[float]:
+        return self._one("SELECT at FROM expiry WHERE key = ?", (key,))
+
+    def _set_expiry(self, key: bytes, at: Optional[float]):
+        if at is None:
+            self.connection.execute("DELETE FROM expiry WHERE key = ?", (key,))
+        else:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO expiry (key, at) VALUES (?, ?)",
+                (key, at),
+            )
+
+    def _exists_key(self, key: bytes) -> bool:
+        return any(
+            self._one(f"SELECT 1 FROM {table} WHERE key = ? LIMIT 1", (key,))
+            for table in SQLITE_TABLES
+        )
+
+    def _delete_key(self, key: bytes) -> bool:
+        self.connection.execute("DELETE FROM expiry WHERE key = ?", (key,))
+        deleted = 0
+        for table in SQLITE_TABLES:
+            deleted += self.connection.execute(
+                f"DELETE FROM {table} WHERE key = ?", (key,)
+            ).rowcount
+        return deleted > 0
+
+    def _set_string(self, key: bytes, value: bytes):
+        self.connection.execute(
+            "INSERT INTO strings (key, value) VALUES (?, ?)", (key, value)
+        )
+
+    def _cmd_get(self, key: bytes) -> Optional[bytes]:
+        return self._one("SELECT value FROM strings WHERE key = ?", (key,))
+
+    def _cmd_hget(self, key: bytes, field: bytes) -> Optional[bytes]:
+        return self._one(
+            "SELECT value FROM hashes WHERE key = ? AND field = ?",
+            (key, field),
+        )
+
+    def _cmd_hgetall(self, key: bytes) -> Dict[bytes, bytes]:
+        return dict(
+            self.connection.execute(
+                "SELECT field, value FROM hashes WHERE key = ?", (key,)
+            )
+        )
+
+    def _cmd_hset(self, key: bytes, items: Dict[bytes, bytes]) -> int:
+        existing = self._one(
+            f"SELECT COUNT(*) FROM hashes WHERE key = ? AND field IN ({','.join('?' * len(items))})",
+            (key, *items),
+        )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO hashes (key, field, value) VALUES (?, ?, ?)",
+            [(key, field, value) for field, value in items.items()],
+        )
+        return len(items) - existing
+
+    def _cmd_hdel(self, key: bytes, fields: List[bytes]) -> int:
+        return self.connection.execute(
+            f"DELETE FROM hashes WHERE key = ? AND field IN ({','.join('?' * len(fields))})",
+            (key, *fields),
+        ).rowcount
+
+    def _cmd_zadd(
+        self, key: bytes, mapping: Dict[bytes, float], xx: bool, nx: bool
+    ) -> int:
+        added = 0
+        for member, score in mapping.items():
+            exists = self._one(
+                "SELECT 1 FROM zsets WHERE key = ? AND member = ?",
+                (key, member),
+            )
+            if (xx and not exists) or (nx and exists):
+                continue
+            added += not exists
+            self.connection.execute(
+                "INSERT OR REPLACE INTO zsets (key, member, score) VALUES (?, ?, ?)",
+                (key, member, score),
+            )
+        return added
+
+    def _cmd_zrem(self, key: bytes, members: List[bytes]) -> int:
+        return self.connection.execute(
+            f"DELETE FROM zsets WHERE key = ? AND member IN ({','.join('?' * len(members))})",
+            (key, *members),
+        ).rowcount
+
+    def _cmd_zrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        bounds = _bounds(start, stop, self._cmd_zcard(key))
+        if bounds is None:
+            return []
+        return [
+            member
+            for (member,) in self.connection.execute(
+                "SELECT member FROM zsets WHERE key = ? ORDER BY score, member LIMIT ? OFFSET ?",
+                (key, bounds[1] - bounds[0] + 1, bounds[0]),
+            )
+        ]
+
+    def _cmd_zrangebyscore(
+        self, key: bytes, low: float, high: float
+    ) -> List[bytes]:
+        return [
+            member
+            for (member,) in self.connection.execute(
+                "SELECT member FROM zsets WHERE key = ? AND score BETWEEN ? AND ? "
+                "ORDER BY score, member",
+                (key, low, high),
+            )
+        ]
+
+    def _cmd_zcard(self, key: bytes) -> int:
+        return self._one("SELECT COUNT(*) FROM zsets WHERE key = ?", (key,))
+
+    def _push(self, key: bytes, values: List[bytes], left: bool) -> int:
+        if left:
+            first = self._one(
+                "SELECT MIN(position) FROM lists WHERE key = ?", (key,)
+            )
+            first = 0 if first is None else first
+            rows = [
+                (key, first - i - 1, value) for i, value in enumerate(values)
+            ]
+        else:
+            last = self._one(
+                "SELECT MAX(position) FROM lists WHERE key = ?", (key,)
+            )
+            last = 0 if last is None else last
+            rows = [
+                (key, last + i + 1, value) for i, value in enumerate(values)
+            ]
+        self.connection.executemany(
+            "INSERT INTO lists (key, position, value) VALUES (?, ?, ?)", rows
+        )
+        return self._cmd_llen(key)
+
+    def _cmd_lpush(self, key: bytes, values: List[bytes]) -> int:
+        return self._push(key, values, left=True)
+
+    def _cmd_rpush(self, key: bytes, values: List[bytes]) -> int:
+        return self._push(key, values, left=False)
+
+    def _cmd_lpop(self, key: bytes) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT position, value FROM lists WHERE key = ? ORDER BY position LIMIT 1",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "DELETE FROM lists WHERE key = ? AND position = ?", (key, row[0])
+        )
+        return row[1]
+
+    def _cmd_lrange(self, key: bytes, start: int, stop: int) -> List[bytes]:
+        bounds = _bounds(start, stop, self._cmd_llen(key))
+        if bounds is None:
+            return []
+        return [
+            value
+            for (value,) in self.connection.execute(
+                "SELECT value FROM lists WHERE key = ? ORDER BY position LIMIT ? OFFSET ?",
+                (key, bounds[1] - bounds[0] + 1, bounds[0]),
+            )
+        ]
+
+    def _cmd_ltrim(self, key: bytes, start: int, stop: int) -> bool:
+        bounds = _bounds(start, stop, self._cmd_llen(key))
+        if bounds is None:
+            self.connection.execute("DELETE FROM lists WHERE key = ?", (key,))
+            return True
+        position = "SELECT position FROM lists WHERE key = ? ORDER BY position LIMIT 1 OFFSET ?"
+        first = self._one(position, (key, bounds[0]))
+        last = self._one(position, (key, bounds[1]))
+        self.connection.execute(
+            "DELETE FROM lists WHERE key = ? AND (position < ? OR position > ?)",
+            (key, first, last),
+        )
+        return True
+
+    def _cmd_llen(self, key: bytes) -> int:
+        return self._one("SELECT COUNT(*) FROM lists WHERE key = ?", (key,))
@@ -0,0 +1,518 @@
+"""Tracing of a commit through the validator components.
+
+A trace is started when fetch_commits enqueues a commit, and its context (trace id,
+id of the root span and start time) travels with the commit payload through the
+commit queue, process_commits and the `report_score` queue. Every component records
+spans for what it does to the commit, and report_score closes the root `commit`
+span once the score is acknowledged:
+
+    commit
+    ├── fetch_commits.enqueue
+    ├── commit_queue.wait
+    ├── process_commits.evaluate
+    │   ├── check_task, sampling, warc_download, similarity
+    │   └── training, evaluation
+    ├── report_score.queue_wait
+    └── report_score.submit
+
+Spans are appended to a JSON lines file in the OTLP/JSON layout (one
+`ExportTraceServiceRequest` per line, like the OpenTelemetry collector's file
+exporter), so they can be loaded into any OTLP-compatible backend. Running this
+module from a validator component prints the critical path of a commit:
+
+    python -m finest_common.tracing <trace id | UID | commit> [--file traces.jsonl]
+
+Processes share the trace file. It is rotated under a lock file (`<path>.lock`), so
+only one of the processes finding it too large rotates it.
+"""
+
+import argparse
+import contextvars
+import fcntl
+import json
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from finest_common import VALIDATOR_DIR
+
+# Spans held in locals are named `span` or `child`, like the helpers below.
+# pylint: disable=redefined-outer-name
+
+logger = logging.getLogger(__name__)
+
+# Trace file shared by the validator components.
+DEFAULT_TRACE_FILE = os.path.join(VALIDATOR_DIR, "traces.jsonl")
+# Size after which the trace file is rotated to `<path>.1`.
+MAX_BYTES = 64 * 1024 * 1024
+SCOPE = "finest-data-subnet.validator"
+
+
+def new_trace(started_at: Optional[float] = None) -> dict:
+    """
+    Context of a new trace, to be stored in the payload of a commit when it is
+    enqueued.
+
+    Args:
+        started_at (float): Unix time the trace starts at, e.g. the start of the fetch
+            cycle which found the commit; defaults to now.
+    """
+    now = time.time()
+    return {
+        "trace_id": secrets.token_hex(16),
+        "span_id": secrets.token_hex(8),
+        "started_at": now if started_at is None else started_at,
+        "enqueued_at": now,
+    }
+
+
+class Span:
+    """
+    One timed operation of a trace.
+
+    Args:
+        name (str): Name of the operation.
+        trace_id (str): Id of the trace, 32 hex digits.
+        parent_id (str): Id of the parent span, None for the root span.
+        span_id (str): Id of the span, generated if not given.
+        start (float): Unix time the operation started at, defaults to now.
+        attributes (dict): Attributes of the span.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        span_id: Optional[str] = None,
+        start: Optional[float] = None,
+        attributes: Optional[dict] = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.span_id = span_id or secrets.token_hex(8)
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.error: Optional[str] = None
+
+    def finish(
+        self, end: Optional[float] = None, error: Optional[str] = None
+    ) -> "Span":
+        self.end = time.time() if end is None else end
+        if error is not None:
+            self.error = error
+        return self
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(self.start * 1e9)),
+            "endTimeUnixNano": str(int((self.end or self.start) * 1e9)),
+            "attributes": [
+                _attribute(key, value)
+                for key, value in self.attributes.items()
+            ],
+            "status": {"code": 2, "message": self.error}
+            if self.error
+            else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _attribute_value(value: dict):
+    for kind, raw in value.items():
+        if kind == "intValue":
+            return int(raw)
+        return raw
+    return None
+
+
+class Tracer:
+    """
+    Appends finished spans to a trace file.
+
+    Args:
+        path (str): Trace file, None to drop the spans.
+        service (str): Name of the process, exported as `service.name`.
+        max_bytes (int): Size after which the file is rotated to `<path>.1`.
+    """
+
+    def __init__(
+        self, path: Optional[str], service: str, max_bytes: int = MAX_BYTES
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.resource = {
+            "attributes": [
+                _attribute("service.name", service),
+                _attribute("host.name", socket.gethostname()),
+                _attribute("process.pid", os.getpid()),
+            ]
+        }
+        self._lock = threading.Lock()
+
+    def export(self, *spans: Span):
+        """Writes the spans as one OTLP request line; errors are logged and dropped."""
+        if not self.path or not spans:
+            return
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": self.resource,
+                        "scopeSpans": [
+                            {
+                                "scope": {"name": SCOPE},
+                                "spans": [span.to_otlp() for span in spans],
+                            }
+                        ],
+                    }
+                ]
+            },
+            separators=(",", ":"),
+        )
+        try:
+            with self._lock:
+                if self._too_large():
+                    self._rotate()
+                # One append per line, so processes sharing the file don't interleave.
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(line + "\n")
+        except OSError as e:
+            # Tracing must never take the process down.
+            logger.debug(f"Unable to export spans to {self.path}: {e}")
+
+    def _too_large(self) -> bool:
+        return (
+            os.path.exists(self.path)
+            and os.path.getsize(self.path) > self.max_bytes
+        )
+
+    def _rotate(self):
+        """Moves the file to `<path>.1`, in one process only when several find it too large."""
+        with open(f"{self.path}.lock", "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Another process may have rotated the file while this one was waiting.
+            if self._too_large():
+                os.replace(self.path, f"{self.path}.1")
+
+
+_tracer = Tracer(None, "validator")
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def configure(path: Optional[str], service: str):
+    """Sets the file the spans of this process are exported to; None or "" disables it."""
+    global _tracer  # pylint: disable=global-statement
+    _tracer = Tracer(path or None, service)
+
+
+def export(*spans: Span):
+    _tracer.export(*spans)
+
+
+def child(
+    name: str, trace: dict, start: Optional[float] = None, **attributes
+) -> Span:
+    """Unfinished span, a child of the root span of `trace`."""
+    return Span(
+        name,
+        trace["trace_id"],
+        trace["span_id"],
+        start=start,
+        attributes=attributes,
+    )
+
+
+def record(
+    name: str,
+    trace: Optional[dict],
+    start: float,
+    end: Optional[float] = None,
+    error: Optional[str] = None,
+    **attributes,
+) -> Optional[Span]:
+    """
+    Exports a span whose start and end are already known, as a child of the root span
+    of `trace`. Does nothing for a payload without trace context.
+    """
+    if not trace:
+        return None
+    span = child(name, trace, start, **attributes).finish(end, error)
+    export(span)
+    return span
+
+
+def finish_trace(
+    trace: Optional[dict], error: Optional[str] = None, **attributes
+):
+    """Exports the root span of `trace`, from the start of the trace to now."""
+    if not trace:
+        return
+    root = Span(
+        "commit",
+        trace["trace_id"],
+        span_id=trace["span_id"],
+        start=trace["started_at"],
+        attributes=attributes,
+    )
+    export(root.finish(error=error))
+
+
+@contextmanager
+def span(
+    name: str, trace: Optional[dict] = None, **attributes
+) -> Iterator[Optional[Span]]:
+    """
+    Times the `with` block as a span, a child of the root span of `trace` or else of
+    the enclosing span. Outside of a trace the block is not traced.
+    """
+    parent = _current.get()
+    if trace:
+        trace_id, parent_id = trace["trace_id"], trace["span_id"]
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        yield None
+        return
+    current = Span(name, trace_id, parent_id, attributes=attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = repr(e)
+        raise
+    finally:
+        _current.reset(token)
+        export(current.finish())
+
+
+def load_spans(paths: List[str]) -> Dict[str, List[dict]]:
+    """Spans of the trace files, by trace id."""
+    traces: Dict[str, List[dict]] = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    continue
+                for resource_spans in request.get("resourceSpans", []):
+                    resource = {
+                        item["key"]: _attribute_value(item["value"])
+                        for item in resource_spans.get("resource", {}).get(
+                            "attributes", []
+                        )
+                    }
+                    for scope_spans in resource_spans.get("scopeSpans", []):
+                        for raw in scope_spans.get("spans", []):
+                            traces.setdefault(raw["traceId"], []).append(
+                                {
+                                    "name": raw["name"],
+                                    "span_id": raw["spanId"],
+                                    "parent_id": raw.get("parentSpanId"),
+                                    "start": int(raw["startTimeUnixNano"])
+                                    / 1e9,
+                                    "end": int(raw["endTimeUnixNano"]) / 1e9,
+                                    "service": resource.get("service.name"),
+                                    "error": raw.get("status", {}).get(
+                                        "message"
+                                    ),
+                                    "attributes": {
+                                        item["key"]: _attribute_value(
+                                            item["value"]
+                                        )
+                                        for item in raw.get("attributes", [])
+                                    },
+                                }
+                            )
+    return traces
+
+
+def find_trace(traces: Dict[str, List[dict]], query: str) -> Optional[str]:
+    """Trace id matching `query` (a trace id prefix, UID or commit), the latest if several."""
+    matches = []
+    for trace_id, spans in traces.items():
+        if trace_id.startswith(query) or any(
+            str(span["attributes"].get("uid")) == query
+            or span["attributes"].get("commit") == query
+            for span in spans
+        ):
+            matches.append((min(span["start"] for span in spans), trace_id))
+    return max(matches)[1] if matches else None
+
+
+def build_tree(spans: List[dict]):
+    """
+    Returns the root span and the children of each span. A root span missing from
+    the file (the commit is still in flight) is stood in for by the trace's extent,
+    and spans whose parent is missing are attached to the root.
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    roots = [span for span in spans if not span["parent_id"]]
+    if roots:
+        root = roots[0]
+    else:
+        root = {
+            "name": "commit (in flight)",
+            "span_id": None,
+            "parent_id": None,
+            "start": min(span["start"] for span in spans),
+            "end": max(span["end"] for span in spans),
+            "service": None,
+            "error": None,
+            "attributes": {},
+        }
+    children: Dict[Optional[str], List[dict]] = {}
+    for span in spans:
+        if span is root:
+            continue
+        parent = (
+            span["parent_id"]
+            if span["parent_id"] in by_id
+            else root["span_id"]
+        )
+        children.setdefault(parent, []).append(span)
+    return root, children
+
+
+def critical_path(
+    span: dict,
+    children: Dict[Optional[str], List[dict]],
+    cursor: Optional[float] = None,
+) -> List[tuple]:
+    """
+    Segments (span, start, end) of the critical path below `span`, in order.
+
+    Walks back from the end of the span: the child that finished last before the
+    cursor is on the critical path, the cursor moves to its start, and the time not
+    covered by any child is the span's own.
+    """
+    cursor = span["end"] if cursor is None else min(cursor, span["end"])
+    segments = []
+    latest_first = sorted(
+        children.get(span["span_id"], []),
+        key=lambda child: child["end"],
+        reverse=True,
+    )
+    for child in latest_first:
+        if child["start"] >= cursor:
+            continue
+        if child["end"] < cursor:
+            segments.append((span, child["end"], cursor))
+        segments.extend(reversed(critical_path(child, children, cursor)))
+        cursor = max(child["start"], span["start"])
+    if cursor > span["start"]:
+        segments.append((span, span["start"], cursor))
+    return list(reversed(segments))
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1e3:.0f}ms"
+    if seconds < 120:
+        return f"{seconds:.1f}s"
+    if seconds < 7200:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
+
+
+def print_trace(trace_id: str, spans: List[dict]):
+    root, children = build_tree(spans)
+    attributes = {}
+    for span in sorted(spans, key=lambda span: span["start"]):
+        attributes.update(span["attributes"])
+    print(
+        f"Trace {trace_id}: UID {attributes.get('uid', '?')}, "
+        f"commit {attributes.get('commit', '?')}, "
+        f"{format_duration(root['end'] - root['start'])} in total"
+    )
+
+    print("\nSpans:")
+
+    def print_span(span, depth):
+        status = f"  ❌ {span['error']}" if span["error"] else ""
+        print(
+            f"  {'+' + format_duration(span['start'] - root['start']):>9}  "
+            f"{format_duration(span['end'] - span['start']):>8}  "
+            f"{'  ' * depth}{span['name']}{status}"
+        )
+        for child in sorted(
+            children.get(span["span_id"], []), key=lambda child: child["start"]
+        ):
+            print_span(child, depth + 1)
+
+    print_span(root, 0)
+
+    print("\nCritical path:")
+    merged = []
+    for span, start, end in critical_path(root, children):
+        if (
+            merged
+            and merged[-1][0] is span
+            and abs(merged[-1][2] - start) < 1e-6
+        ):
+            merged[-1][2] = end
+        else:
+            merged.append([span, start, end])
+    total = root["end"] - root["start"] or 1.0
+    for span, start, end in merged:
+        if end - start < 1e-3:
+            continue
+        name = span["name"] if span is not root else f"{span['name']} (gaps)"
+        print(
+            f"  {format_duration(end - start):>8}  {(end - start) / total:>6.1%}  {name}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the critical path of a commit."
+    )
+    parser.add_argument(
+        "query", type=str, help="Trace id (or a prefix), UID or commit"
+    )
+    parser.add_argument(
+        "--file",
+        type=str,
+        default=DEFAULT_TRACE_FILE,
+        help="Trace file written by the validator",
+    )
+    args = parser.parse_args()
+
+    traces = load_spans([f"{args.file}.1", args.file])
+    trace_id = find_trace(traces, args.query)
+    if trace_id is None:
+        print(f"No trace found for {args.query} in {args.file}")
+        raise SystemExit(1)
+    print_trace(trace_id, traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import uuid
+
+import pytest
+
+from finest_common import state_backend
+
+
+@pytest.fixture(name="backend", params=["memory", "sqlite", "redis"])
+def fixture_backend(request, tmp_path):
+    """Factory of clients of one store, on every backend."""
+    if request.param == "memory":
+        url = f"memory://{uuid.uuid4().hex}"
+        yield lambda: state_backend.connect(url)
+        return
+    if request.param == "sqlite":
+        url = f"sqlite://{tmp_path / 'state.db'}"
+        clients = []
+
+        def connect():
+            clients.append(state_backend.connect(url))
+            return clients[-1]
+
+        yield connect
+        for client in clients:
+            client.close()
+        return
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    yield lambda: fakeredis.FakeRedis(server=server)
+
+
+@pytest.fixture(name="store")
+def fixture_store(backend):
+    return backend()
@@ -0,0 +1,132 @@
+import math
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from finest_common.api_client import LatencyHistogram, TaskApiClient
+
+
+class ScriptedServer:
+    """HTTP server answering each request with the next status of a script,
+    or closing the connection without an answer for a None."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                server.requests += 1
+                status = server.script.pop(0) if server.script else 200
+                if status is None:
+                    self.close_connection = True
+                    self.connection.shutdown(socket.SHUT_RDWR)
+                    return
+                self.send_response(status)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, kwargs={"poll_interval": 0.01}
+        )
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+
+@pytest.fixture(name="serve")
+def fixture_serve():
+    servers = []
+
+    def start(*script):
+        servers.append(ScriptedServer(script))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def client(url):
+    return TaskApiClient(url, timeout=(1, 2), max_retries=2, backoff_base=0)
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def test_idempotent_request_retries_server_errors(serve):
+    server = serve(500, 502)
+    response = client(server.url).post("/check/", {})
+    assert response.status_code == 200
+    assert server.requests == 3
+
+
+def test_retries_are_bounded(serve):
+    server = serve(500, 500, 500, 500)
+    response = client(server.url).post("/check/", {})
+    assert response.status_code == 500
+    assert server.requests == 3
+
+
+def test_other_request_is_not_retried_after_a_server_error(serve):
+    server = serve(500)
+    response = client(server.url).post("/report/", {}, idempotent=False)
+    assert response.status_code == 500
+    assert server.requests == 1
+
+
+def test_other_request_is_retried_when_unprocessed(serve):
+    server = serve(503, 429)
+    response = client(server.url).post("/report/", {}, idempotent=False)
+    assert response.status_code == 200
+    assert server.requests == 3
+
+
+def test_dropped_connection(serve):
+    server = serve(None, None)
+    with pytest.raises(requests.ConnectionError):
+        client(server.url).post("/report/", {}, idempotent=False)
+    assert server.requests == 1
+    assert client(server.url).post("/check/", {}).status_code == 200
+    assert server.requests == 3
+
+
+def test_refused_connection_is_retried():
+    api = client(closed_port_url())
+    with pytest.raises(requests.ConnectionError):
+        api.post("/report/", {}, idempotent=False)
+    stats = api.latency_stats()["/report/"]
+    assert stats["count"] == 3
+    assert stats["errors"] == 3
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0, math.inf))
+    assert histogram.quantile(0.5) == 0.0
+    for seconds in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(seconds)
+    histogram.observe(20.0, error=True)
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["errors"] == 1
+    assert snapshot["mean"] == pytest.approx(5.12)
+    assert snapshot["p50"] == 1.0
+    assert snapshot["p95"] == math.inf
+    assert snapshot["buckets"] == {"0.1": 2, "1.0": 1, "inf": 2}
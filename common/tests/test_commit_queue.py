@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from finest_common.commit_queue import AGE_HORIZON, CommitQueue, LeaseKeeper
+
+
+@pytest.fixture(name="queue")
+def fixture_queue(store):
+    return CommitQueue(store)
+
+
+def commit(uid, block=100, **payload):
+    return {"uid": uid, "commit_block": block, **payload}
+
+
+def test_boost():
+    queue = CommitQueue(None)
+    now = 1_000_000.0
+    fresh = queue.boost(100, 100, stake=1.0, last_evaluated=None, now=now)
+    assert fresh == queue.age_weight + queue.stake_weight + queue.idle_weight
+    capped = CommitQueue(None, max_boost=60.0)
+    assert capped.boost(100, 100, stake=1.0, now=now) == 60.0
+    stale = queue.boost(0, AGE_HORIZON, stake=0.0, last_evaluated=now, now=now)
+    assert stale == 0
+    half_idle = queue.boost(
+        0, AGE_HORIZON, last_evaluated=now - 12 * 3600, now=now
+    )
+    assert half_idle == pytest.approx(queue.idle_weight / 2)
+
+
+def test_push_coalesces_commits_of_a_uid(queue, store):
+    assert queue.push([commit(1, hash="a"), commit(2)], 100) == 0
+    assert queue.push([commit(1, hash="b")], 100) == 1
+    assert queue.depth() == 2
+    stats = queue.stats()
+    assert stats["enqueued"] == 3
+    assert stats["coalesced"] == 1
+    payloads = [store.hget(queue.pending_key, uid) for uid in (1, 2)]
+    assert b'"hash": "b"' in payloads[0]
+
+
+def test_priority_follows_the_boost(queue):
+    # UID 2 is staked and committed at the current block.
+    queue.push([commit(1, block=0)], AGE_HORIZON, stakes={1: 0.0})
+    queue.push([commit(2, block=AGE_HORIZON)], AGE_HORIZON, stakes={2: 1.0})
+    assert queue.lease("worker")["uid"] == 2
+    assert queue.lease("worker")["uid"] == 1
+
+
+def test_lease_and_ack(queue):
+    queue.push([commit(1)], 100)
+    item = queue.lease("worker-a")
+    assert item["uid"] == 1
+    assert item["deliveries"] == 1
+    assert queue.lease("worker-b") is None
+    assert queue.stats()["in_flight"] == 1
+    assert not queue.ack(1, "worker-b")
+    assert queue.ack(1, "worker-a")
+    stats = queue.stats()
+    assert stats["in_flight"] == 0
+    assert stats["acked"] == 1
+    assert queue.depth() == 0
+
+
+def test_uid_under_lease_is_skipped(queue):
+    queue.push([commit(1)], 100)
+    queue.lease("worker-a")
+    queue.push([commit(1, hash="newer"), commit(2)], 100)
+    assert queue.lease("worker-b")["uid"] == 2
+    assert queue.lease("worker-b") is None
+
+
+def test_extend(queue):
+    queue.push([commit(1)], 100)
+    queue.lease("worker-a", visibility_timeout=0)
+    assert queue.extend(1, "worker-a", visibility_timeout=600)
+    assert queue.requeue_expired() == 0
+    assert not queue.extend(1, "worker-b")
+
+
+def test_nack_requeues_at_the_front(queue):
+    queue.push([commit(1), commit(2)], 100)
+    first = queue.lease("worker")["uid"]
+    assert queue.nack(first, "worker")
+    item = queue.lease("worker")
+    assert item["uid"] == first
+    assert item["deliveries"] == 2
+    assert queue.stats()["requeued"] == 1
+
+
+def test_expired_lease_is_requeued(queue):
+    queue.push([commit(1)], 100)
+    queue.lease("worker-a", visibility_timeout=0)
+    assert queue.requeue_expired() == 1
+    assert not queue.ack(1, "worker-a")
+    assert queue.lease("worker-b")["deliveries"] == 2
+
+
+def test_dead_letter_after_max_deliveries(store):
+    queue = CommitQueue(store, max_deliveries=2)
+    queue.push([commit(1)], 100)
+    for _ in range(2):
+        queue.lease("worker")
+        queue.nack(1, "worker", reason="training failed")
+    assert queue.lease("worker") is None
+    [dead] = queue.dead_letters()
+    assert dead["item"]["uid"] == 1
+    assert dead["item"]["deliveries"] == 2
+    assert dead["reason"] == "training failed"
+    stats = queue.stats()
+    assert stats["dead"] == 1
+    assert stats["dead_lettered"] == 1
+
+
+def test_requeue_drops_a_superseded_commit(queue):
+    queue.push([commit(1, hash="old")], 100)
+    queue.lease("worker")
+    queue.push([commit(1, hash="new")], 100)
+    queue.nack(1, "worker")
+    item = queue.lease("worker")
+    assert item["hash"] == "new"
+    assert item["deliveries"] == 1
+
+
+def test_release_worker(queue):
+    queue.push([commit(1), commit(2), commit(3)], 100)
+    queue.lease("worker-a")
+    queue.lease("worker-a")
+    queue.lease("worker-b")
+    assert queue.release_worker("worker-a") == 2
+    assert queue.stats()["in_flight"] == 1
+    assert queue.depth() == 2
+
+
+def test_lease_keeper_extends_the_lease(queue):
+    queue.push([commit(1)], 100)
+    queue.lease("worker", visibility_timeout=0.3)
+    with LeaseKeeper(queue, 1, "worker", visibility_timeout=0.3) as keeper:
+        time.sleep(0.6)
+        assert queue.requeue_expired() == 0
+    assert not keeper.lost
+    assert queue.ack(1, "worker")
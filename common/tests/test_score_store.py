@@ -0,0 +1,124 @@
+import os
+import sqlite3
+
+import pytest
+
+from finest_common import tracing
+from finest_common.score_store import DEFAULT_SCORE_DB, ScoreStore
+
+
+@pytest.fixture(name="path")
+def fixture_path(tmp_path):
+    return str(tmp_path / "scores.db")
+
+
+def log_length(path):
+    connection = sqlite3.connect(path)
+    try:
+        (count,) = connection.execute(
+            "SELECT COUNT(*) FROM score_log"
+        ).fetchone()
+        return count
+    finally:
+        connection.close()
+
+
+def test_load_returns_the_latest_scores(path):
+    store = ScoreStore(path)
+    assert store.load() == {}
+    store.record({1: 0.5, 2: 0.25}, source="test")
+    store.record({1: 0.75})
+    store.record({})
+    assert store.load() == {1: 0.75, 2: 0.25}
+    store.close()
+
+
+def test_snapshot_folds_the_log(path):
+    store = ScoreStore(path)
+    store.record({1: 0.5, 2: 0.25})
+    store.record({1: 0.75})
+    store.snapshot()
+    assert log_length(path) == 0
+    assert store.get_meta("snapshot_seq") == "3"
+    store.record({2: 0.125})
+    assert store.load() == {1: 0.75, 2: 0.125}
+    store.snapshot()
+    store.snapshot()
+    assert store.load() == {1: 0.75, 2: 0.125}
+    store.close()
+
+
+def test_snapshot_taken_every_n_entries(path):
+    store = ScoreStore(path, snapshot_every=3)
+    store.record({1: 0.1, 2: 0.2})
+    assert log_length(path) == 2
+    store.record({3: 0.3})
+    assert log_length(path) == 0
+    store.record({1: 0.4})
+    assert log_length(path) == 1
+    assert store.load() == {1: 0.4, 2: 0.2, 3: 0.3}
+    store.close()
+
+
+def test_scores_are_shared_by_processes(path):
+    writer, reader = ScoreStore(path), ScoreStore(path)
+    writer.record({1: 0.5})
+    assert reader.load() == {1: 0.5}
+    reader.snapshot()
+    writer.record({1: 0.6})
+    assert reader.load() == {1: 0.6}
+    writer.close()
+    reader.close()
+
+
+class SnapshotAfterRead:
+    """Connection taking a snapshot from another store after reading one."""
+
+    def __init__(self, connection, other):
+        self.connection = connection
+        self.other = other
+
+    def __enter__(self):
+        return self.connection.__enter__()
+
+    def __exit__(self, *exc):
+        return self.connection.__exit__(*exc)
+
+    def execute(self, sql, *args):
+        cursor = self.connection.execute(sql, *args)
+        if "FROM score_snapshot" not in sql:
+            return cursor
+        rows = cursor.fetchall()
+        self.other.snapshot()
+        return rows
+
+
+def test_load_sees_entries_snapshotted_during_the_read(path):
+    writer, reader = ScoreStore(path), ScoreStore(path)
+    writer.record({1: 0.5, 2: 0.25})
+    reader.connection = SnapshotAfterRead(reader.connection, writer)
+    assert reader.load() == {1: 0.5, 2: 0.25}
+    assert log_length(path) == 0
+    reader.connection = reader.connection.connection
+    writer.close()
+    reader.close()
+
+
+def test_meta(path):
+    store = ScoreStore(path)
+    assert store.get_meta("missing") is None
+    store.set_meta("key", "value")
+    store.set_meta("key", "other")
+    assert store.get_meta("key") == "other"
+    store.close()
+
+
+def test_default_paths_are_in_the_validator_directory():
+    validator_dir = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "validator",
+    )
+    assert DEFAULT_SCORE_DB == os.path.join(validator_dir, "scores.db")
+    assert tracing.DEFAULT_TRACE_FILE == os.path.join(
+        validator_dir, "traces.jsonl"
+    )
@@ -0,0 +1,169 @@
+import threading
+import time
+
+import pytest
+import redis
+
+from finest_common import state_backend
+
+
+def test_connect_urls(tmp_path):
+    assert state_backend.connect("memory://a") is state_backend.connect(
+        "memory://a"
+    )
+    assert state_backend.connect("memory://a") is not state_backend.connect(
+        "memory://b"
+    )
+    store = state_backend.connect(f"sqlite://{tmp_path / 'state.db'}")
+    assert isinstance(store, state_backend.SQLiteStore)
+    store.close()
+    with pytest.raises(ValueError):
+        state_backend.connect("sqlite://")
+    with pytest.raises(ValueError):
+        state_backend.connect("postgres://localhost/db")
+
+
+def test_strings(store):
+    assert store.get("key") is None
+    assert store.set("key", "value")
+    assert store.get("key") == b"value"
+    assert store.set("key", "other", nx=True) is None
+    assert store.get("key") == b"value"
+    assert store.set("number", 3)
+    assert store.get("number") == b"3"
+    assert store.exists("key", "number", "missing") == 2
+    assert store.delete("key", "missing") == 1
+    assert store.get("key") is None
+
+
+def test_invalid_values(store):
+    with pytest.raises(redis.DataError):
+        store.set("key", True)
+    with pytest.raises(redis.DataError):
+        store.hset("hash")
+
+
+def test_expiry(store):
+    store.set("short", "value", ex=1)
+    store.set("long", "value", ex=60)
+    store.hset("hash", "field", "value")
+    assert store.expire("hash", 1)
+    assert not store.expire("missing", 1)
+    time.sleep(1.1)
+    assert store.get("short") is None
+    assert store.get("long") == b"value"
+    assert store.hgetall("hash") == {}
+
+
+def test_hashes(store):
+    assert store.hset("hash", "a", 1) == 1
+    assert store.hset("hash", mapping={"a": 2, "b": "x"}) == 1
+    assert store.hget("hash", "a") == b"2"
+    assert store.hgetall("hash") == {b"a": b"2", b"b": b"x"}
+    assert store.hmget("hash", ["a", "missing", "b"]) == [b"2", None, b"x"]
+    assert store.hincrby("hash", "count", 5) == 5
+    assert store.hincrby("hash", "count", -2) == 3
+    assert store.hdel("hash", "a", "missing") == 1
+    assert store.hget("hash", "a") is None
+
+
+def test_sorted_sets(store):
+    assert store.zadd("zset", {"a": 3, "b": 1, "c": 2}) == 3
+    assert store.zrange("zset", 0, -1) == [b"b", b"c", b"a"]
+    assert store.zrange("zset", -2, -1) == [b"c", b"a"]
+    assert store.zrange("zset", 5, 10) == []
+    assert store.zadd("zset", {"a": 0, "d": 4}, xx=True) == 0
+    assert store.zadd("zset", {"b": 9, "e": 5}, nx=True) == 1
+    assert store.zrange("zset", 0, -1) == [b"a", b"b", b"c", b"e"]
+    assert store.zrangebyscore("zset", "-inf", 2) == [b"a", b"b", b"c"]
+    assert store.zrangebyscore("zset", 2, "+inf") == [b"c", b"e"]
+    assert store.zrem("zset", "a", "missing") == 1
+    assert store.zcard("zset") == 3
+
+
+def test_lists(store):
+    assert store.rpush("list", "b", "c") == 2
+    assert store.lpush("list", "a0", "a1") == 4
+    assert store.lrange("list", 0, -1) == [b"a1", b"a0", b"b", b"c"]
+    assert store.lrange("list", 1, 2) == [b"a0", b"b"]
+    assert store.lpop("list") == b"a1"
+    assert store.ltrim("list", 0, 1)
+    assert store.lrange("list", 0, -1) == [b"a0", b"b"]
+    assert store.llen("list") == 2
+    assert store.lpop("list") == b"a0"
+    assert store.lpop("list") == b"b"
+    assert store.lpop("list") is None
+    assert store.exists("list") == 0
+
+
+def test_blpop(backend):
+    store = backend()
+    assert store.blpop(["list"], timeout=0.2) is None
+    store.rpush("other", "first")
+    assert store.blpop(["list", "other"], timeout=1) == (b"other", b"first")
+
+    pusher = backend()
+    thread = threading.Timer(0.2, lambda: pusher.rpush("list", "pushed"))
+    thread.start()
+    try:
+        assert store.blpop(["list"], timeout=5) == (b"list", b"pushed")
+    finally:
+        thread.join()
+
+
+def test_pipeline_buffers_commands(store):
+    with store.pipeline() as pipe:
+        pipe.set("a", 1)
+        pipe.hset("hash", "field", "value")
+        pipe.get("a")
+        assert store.get("a") is None
+        assert pipe.execute() == [True, 1, b"1"]
+    assert store.get("a") == b"1"
+
+
+def test_watch_fails_on_concurrent_write(backend):
+    store, other = backend(), backend()
+    store.set("counter", 1)
+    with store.pipeline() as transaction:
+        transaction.watch("counter")
+        value = int(transaction.get("counter"))
+        other.set("counter", 10)
+        transaction.multi()
+        transaction.set("counter", value + 1)
+        with pytest.raises(redis.WatchError):
+            transaction.execute()
+    assert store.get("counter") == b"10"
+
+
+def test_watch_succeeds_without_write(backend):
+    store, other = backend(), backend()
+    store.set("counter", 1)
+    with store.pipeline() as transaction:
+        transaction.watch("counter")
+        value = int(transaction.get("counter"))
+        other.set("unrelated", 1)
+        transaction.multi()
+        transaction.set("counter", value + 1)
+        transaction.execute()
+    assert store.get("counter") == b"2"
+
+
+def test_sqlite_store_is_shared_by_connections(tmp_path):
+    path = tmp_path / "state.db"
+    writer = state_backend.SQLiteStore(str(path))
+    writer.rpush("list", "a")
+    writer.close()
+    reader = state_backend.SQLiteStore(str(path))
+    assert reader.lrange("list", 0, -1) == [b"a"]
+    reader.close()
+
+
+def test_incomplete_store_fails_on_creation():
+    class StringStore(state_backend.LocalStore):
+        # pylint: disable=abstract-method
+
+        def _cmd_get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="_cmd_lpop"):
+        StringStore()  # pylint: disable=abstract-class-instantiated
@@ -0,0 +1,95 @@
+import json
+import multiprocessing
+
+from finest_common import tracing
+
+
+def spans_of(path):
+    return [
+        span for spans in tracing.load_spans([path]).values() for span in spans
+    ]
+
+
+def test_spans_are_exported_and_loaded(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    tracing.configure(path, "test")
+    try:
+        trace = tracing.new_trace(started_at=100.0)
+        with tracing.span("evaluate", trace, uid=7, commit="abc"):
+            with tracing.span("sampling"):
+                pass
+        tracing.record("report", trace, 101.0, 102.0, error="timeout")
+        tracing.finish_trace(trace)
+    finally:
+        tracing.configure(None, "test")
+
+    traces = tracing.load_spans([path])
+    assert tracing.find_trace(traces, "7") == trace["trace_id"]
+    assert tracing.find_trace(traces, "abc") == trace["trace_id"]
+    spans = {span["name"]: span for span in traces[trace["trace_id"]]}
+    assert set(spans) == {"evaluate", "sampling", "report", "commit"}
+    assert spans["sampling"]["parent_id"] == spans["evaluate"]["span_id"]
+    assert spans["evaluate"]["parent_id"] == trace["span_id"]
+    assert spans["commit"]["parent_id"] is None
+    assert spans["evaluate"]["attributes"] == {"uid": 7, "commit": "abc"}
+    assert spans["report"]["error"] == "timeout"
+    assert spans["evaluate"]["service"] == "test"
+
+
+def test_critical_path():
+    spans = [
+        {
+            "name": "root",
+            "span_id": "r",
+            "parent_id": None,
+            "start": 0,
+            "end": 10,
+        },
+        {"name": "a", "span_id": "a", "parent_id": "r", "start": 1, "end": 4},
+        {"name": "b", "span_id": "b", "parent_id": "r", "start": 2, "end": 8},
+    ]
+    root, children = tracing.build_tree(spans)
+    path = [
+        (span["name"], start, end)
+        for span, start, end in tracing.critical_path(root, children)
+    ]
+    # b finishes last, a only covers the time before b started.
+    assert path == [
+        ("root", 0, 1),
+        ("a", 1, 2),
+        ("b", 2, 8),
+        ("root", 8, 10),
+    ]
+
+
+def test_rotation(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    tracer = tracing.Tracer(path, "test", max_bytes=1000)
+    for _ in range(20):
+        tracer.export(tracing.Span("step", "0" * 32).finish())
+    with open(f"{path}.1", encoding="utf-8") as rotated:
+        assert sum(1 for _ in rotated) > 1
+    assert len(spans_of(path)) + len(spans_of(f"{path}.1")) < 20
+
+
+def export_spans(path, count):
+    tracer = tracing.Tracer(path, "test", max_bytes=2000)
+    for _ in range(count):
+        tracer.export(tracing.Span("step", "0" * 32).finish())
+
+
+def test_processes_rotating_the_file_keep_whole_lines(tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    processes = [
+        multiprocessing.Process(target=export_spans, args=(path, 200))
+        for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    for name in (path, f"{path}.1"):
+        with open(name, encoding="utf-8") as file:
+            for line in file:
+                json.loads(line)
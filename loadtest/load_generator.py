@@ -0,0 +1,275 @@
+"""Load generator for the task API client.
+
+Drives simulated miners (get-task -> finish-task) and validators
+(check-task -> report-score) through `TaskApiClient` against a task API, by default
+an in-process stand-in server, and reports client-side throughput and tail latency.
+
+Usage:
+    python loadtest/load_generator.py --miners 64 --validators 16 --duration 30 \\
+        --latency 0.05 --jitter 0.05 --error-rate 0.02
+
+    # Against an already running server:
+    python loadtest/load_generator.py --api-url http://127.0.0.1:8000 --duration 30
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "common"))
+
+from finest_common.api_client import TaskApiClient  # noqa: E402
+from task_server import (
+    add_server_args,
+    server_config_from_args,
+    start_server,
+)  # noqa: E402
+
+
+class Recorder:
+    """Collects exact per-endpoint latencies and outcomes from all workers."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds, outcome):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.outcomes[endpoint][outcome] += 1
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1)))
+    )
+    return sorted_values[index]
+
+
+def timed_call(recorder, endpoint, call):
+    start = time.perf_counter()
+    try:
+        response = call()
+        outcome = str(response.status_code)
+    except requests.RequestException as e:
+        response = None
+        outcome = type(e).__name__
+    recorder.record(endpoint, time.perf_counter() - start, outcome)
+    return response
+
+
+def run_miner(index, client, recorder, deadline, think_time):
+    hotkey = f"miner-{index}"
+    while time.time() < deadline:
+        timed_call(
+            recorder,
+            "get-task",
+            lambda: client.get_task(hotkey, "message", "signature"),
+        )
+        timed_call(
+            recorder,
+            "finish-task",
+            lambda: client.finish_task(
+                hotkey, "message", "signature", f"{hotkey}/dataset"
+            ),
+        )
+        if think_time:
+            time.sleep(think_time)
+
+
+def run_validator(index, client, recorder, deadline, think_time, uids):
+    hotkey = f"validator-{index}"
+    uid = index % uids
+    while time.time() < deadline:
+        response = timed_call(
+            recorder, "check-task", lambda: client.check_task(uid)
+        )
+        task_id = 0
+        if response is not None and response.status_code == 200:
+            task_id = response.json().get("task_id", 0)
+        timed_call(
+            recorder,
+            "report-score",
+            lambda: client.report_score(hotkey, task_id, 0.5, "signature"),
+        )
+        uid = (uid + 1) % uids
+        if think_time:
+            time.sleep(think_time)
+
+
+def build_report(recorder, elapsed):
+    report = {"elapsed_seconds": elapsed, "endpoints": {}}
+    total = 0
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        total += len(values)
+        report["endpoints"][endpoint] = {
+            "requests": len(values),
+            "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": values[-1] * 1000 if values else 0.0,
+            "outcomes": dict(recorder.outcomes[endpoint]),
+        }
+    report["requests"] = total
+    report["throughput_rps"] = total / elapsed if elapsed else 0.0
+    return report
+
+
+def print_report(report):
+    print(
+        f"{report['requests']} requests in {report['elapsed_seconds']:.1f}s "
+        f"({report['throughput_rps']:.1f} req/s)"
+    )
+    header = f"{'endpoint':<14}{'reqs':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}  outcomes"
+    print(header)
+    for endpoint, stats in report["endpoints"].items():
+        outcomes = ", ".join(
+            f"{k}={v}" for k, v in sorted(stats["outcomes"].items())
+        )
+        print(
+            f"{endpoint:<14}{stats['requests']:>8}{stats['throughput_rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+            f"{stats['max_ms']:>9.1f}  {outcomes}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test the task API client."
+    )
+    parser.add_argument(
+        "--api-url",
+        type=str,
+        default="",
+        help="Existing server to target; starts a local stand-in if empty",
+    )
+    parser.add_argument(
+        "--miners", type=int, default=32, help="Number of simulated miners"
+    )
+    parser.add_argument(
+        "--validators",
+        type=int,
+        default=8,
+        help="Number of simulated validators",
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Test duration in seconds"
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=0.0,
+        help="Pause between iterations of each worker",
+    )
+    parser.add_argument(
+        "--uids",
+        type=int,
+        default=256,
+        help="Number of UIDs validators cycle through",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=5.0,
+        help="Client read timeout in seconds",
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=3, help="Client retries per request"
+    )
+    parser.add_argument(
+        "--backoff-base",
+        type=float,
+        default=0.05,
+        help="Client backoff base in seconds",
+    )
+    parser.add_argument(
+        "--shared-client",
+        action="store_true",
+        help="Share one pooled client between all workers",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print the report as JSON"
+    )
+    add_server_args(parser)
+    args = parser.parse_args()
+
+    # Retries are expected under error injection; keep the report readable.
+    logging.getLogger("finest_common.api_client").setLevel(logging.ERROR)
+
+    server = None
+    api_url = args.api_url
+    if not api_url:
+        server = start_server(config=server_config_from_args(args))
+        api_url = f"http://127.0.0.1:{server.server_port}"
+
+    workers = args.miners + args.validators
+
+    def make_client():
+        return TaskApiClient(
+            base_url=api_url,
+            timeout=(5.0, args.timeout),
+            max_retries=args.max_retries,
+            backoff_base=args.backoff_base,
+            pool_size=workers if args.shared_client else 1,
+        )
+
+    shared = make_client() if args.shared_client else None
+    recorder = Recorder()
+    deadline = time.time() + args.duration
+    threads = []
+    for i in range(args.miners):
+        client = shared or make_client()
+        threads.append(
+            threading.Thread(
+                target=run_miner,
+                args=(i, client, recorder, deadline, args.think_time),
+            )
+        )
+    for i in range(args.validators):
+        client = shared or make_client()
+        threads.append(
+            threading.Thread(
+                target=run_validator,
+                args=(
+                    i,
+                    client,
+                    recorder,
+                    deadline,
+                    args.think_time,
+                    args.uids,
+                ),
+            )
+        )
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    report = build_report(recorder, elapsed)
+    if server is not None:
+        report["server_counts"] = server.stats()
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Local stand-in for the task API.
+
+Implements the endpoints used by miners and validators with configurable latency
+and error injection, so the clients can be exercised without the real service.
+
+Usage:
+    python loadtest/task_server.py --port 8000 --latency 0.05 --jitter 0.02 --error-rate 0.01
+
+Then point the components at it with `API_URL=http://127.0.0.1:8000`.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ENDPOINTS = (
+    "/subnets/get-task/",
+    "/subnets/finish-task/",
+    "/subnets/check-task/",
+    "/subnets/report-score/",
+    "/subnets/report-scores/",
+)
+
+SAMPLE_WARC_PATHS = [
+    "crawl-data/CC-MAIN-2024-42/segments/1727944253654.26/warc/CC-MAIN-20241009211335-20241010001335-00661.warc.gz",
+    "crawl-data/CC-MAIN-2024-42/segments/1727944253824.62/warc/CC-MAIN-20241011164904-20241011194904-00184.warc.gz",
+]
+
+
+class ServerConfig:
+    """
+    Behaviour of the stand-in server.
+
+    Args:
+        latency (float): Base response latency in seconds.
+        jitter (float): Maximum extra latency in seconds, drawn uniformly per request.
+        error_rate (float): Probability of answering with `error_status`.
+        error_status (int): Status code used for injected errors.
+        not_found_rate (float): Probability of answering 404 (no task found).
+        hang_rate (float): Probability of sleeping `hang_seconds` before answering,
+            to exercise client timeouts.
+        hang_seconds (float): Duration of an injected hang.
+        seed (int): Optional random seed for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=503,
+        not_found_rate=0.0,
+        hang_rate=0.0,
+        hang_seconds=60.0,
+        seed=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.not_found_rate = not_found_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+    def draw(self):
+        with self.random_lock:
+            return (
+                self.random.random(),
+                self.random.random(),
+                self.random.random(),
+                self.random.uniform(0, self.jitter) if self.jitter else 0.0,
+            )
+
+
+class TaskServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config: ServerConfig):
+        super().__init__(address, TaskRequestHandler)
+        self.config = config
+        self.task_ids = itertools.count(1)
+        self.block = 4_000_000
+        self.counts = {endpoint: {} for endpoint in ENDPOINTS}
+        self.counts_lock = threading.Lock()
+
+    def record(self, endpoint, status):
+        with self.counts_lock:
+            by_status = self.counts.setdefault(endpoint, {})
+            by_status[status] = by_status.get(status, 0) + 1
+
+    def stats(self):
+        with self.counts_lock:
+            return {
+                endpoint: {
+                    str(status): count for status, count in by_status.items()
+                }
+                for endpoint, by_status in self.counts.items()
+            }
+
+    def handle_endpoint(self, endpoint, payload):
+        """Build the (status, body) answer for a well-formed request."""
+        if endpoint == "/subnets/get-task/":
+            return 200, {"warc_paths": SAMPLE_WARC_PATHS}
+        if endpoint == "/subnets/finish-task/":
+            return 200, {
+                "message": f"Task finished for {payload.get('hotkey')}"
+            }
+        if endpoint == "/subnets/check-task/":
+            return 200, {
+                "task_id": next(self.task_ids),
+                "warc_files": SAMPLE_WARC_PATHS,
+                "request_block": self.block,
+            }
+        if endpoint == "/subnets/report-score/":
+            return 200, {
+                "message": f"Score received for task {payload.get('task_id')}"
+            }
+        if endpoint == "/subnets/report-scores/":
+            return 200, {
+                "results": [
+                    {"task_id": report.get("task_id"), "status": 200}
+                    for report in payload.get("reports", [])
+                ]
+            }
+        return 404, {"message": "Unknown endpoint"}
+
+
+class TaskRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send(200, self.server.stats())
+        else:
+            self._send(404, {"message": "Not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        endpoint = self.path.split("?", 1)[0]
+        if not endpoint.endswith("/"):
+            endpoint += "/"
+
+        config = self.server.config
+        error_draw, not_found_draw, hang_draw, extra_latency = config.draw()
+        delay = config.latency + extra_latency
+        if hang_draw < config.hang_rate:
+            delay += config.hang_seconds
+        if delay:
+            time.sleep(delay)
+
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            status, body = 400, {"message": "Invalid JSON"}
+        else:
+            if endpoint not in ENDPOINTS:
+                status, body = 404, {"message": "Unknown endpoint"}
+            elif error_draw < config.error_rate:
+                status, body = config.error_status, {
+                    "message": "Injected error"
+                }
+            elif not_found_draw < config.not_found_rate:
+                status, body = 404, {"message": "No task found"}
+            else:
+                status, body = self.server.handle_endpoint(endpoint, payload)
+
+        self.server.record(endpoint, status)
+        try:
+            self._send(status, body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(host="127.0.0.1", port=0, config=None):
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+        TaskServer: The running server; its URL is `http://{host}:{server.server_port}`.
+    """
+    server = TaskServer((host, port), config or ServerConfig())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def add_server_args(parser: argparse.ArgumentParser):
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Base latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Max extra latency in seconds",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Probability of an injected error",
+    )
+    parser.add_argument(
+        "--error-status",
+        type=int,
+        default=503,
+        help="Status code of injected errors",
+    )
+    parser.add_argument(
+        "--not-found-rate",
+        type=float,
+        default=0.0,
+        help="Probability of a 404 answer",
+    )
+    parser.add_argument(
+        "--hang-rate",
+        type=float,
+        default=0.0,
+        help="Probability of a hanging request",
+    )
+    parser.add_argument(
+        "--hang-seconds",
+        type=float,
+        default=60.0,
+        help="Duration of a hanging request",
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+
+def server_config_from_args(args) -> ServerConfig:
+    return ServerConfig(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        not_found_rate=args.not_found_rate,
+        hang_rate=args.hang_rate,
+        hang_seconds=args.hang_seconds,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local stand-in for the task API."
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Bind address"
+    )
+    parser.add_argument("--port", type=int, default=8000, help="Bind port")
+    add_server_args(parser)
+    args = parser.parse_args()
+
+    server = TaskServer((args.host, args.port), server_config_from_args(args))
+    print(
+        f"Task API stand-in listening on http://{args.host}:{server.server_port}"
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🔴 Task server interrupted by user.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
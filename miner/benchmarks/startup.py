@@ -0,0 +1,144 @@
+"""Startup benchmark for the miner CLI.
+
+Imports `miner.main` and runs `python -m miner.main --help` in fresh interpreters,
+reports the wall time of each and checks that none of the heavy dependencies were
+pulled in. It only needs the standard library, so it runs the same way locally,
+under pm2 hosts or in any CI.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--max-seconds 1.5] [--json]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["bittensor", "nltk", "datatrove", "datasets", "torch"]
+
+PROBE = """
+import json, runpy, sys, time
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+# Runs the CLI the way `python -m miner.main --help` does, in-process so the loaded
+# modules can be reported. Help output goes to /dev/null.
+HELP = """
+import contextlib, os
+sys.argv = ["miner.main", "--help"]
+with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+    try:
+        runpy.run_module("miner.main", run_name="__main__", alter_sys=True)
+    except SystemExit as exit:
+        if exit.code:
+            raise
+"""
+
+COMMANDS = {
+    "import miner.main": "import miner.main",
+    "python -m miner.main --help": HELP,
+}
+
+
+def measure_once(command: str) -> dict:
+    """
+    Run `command` in a new interpreter.
+
+    Args:
+        command (str): Key of COMMANDS to run.
+
+    Returns:
+        dict: Run time in seconds and the heavy modules that got loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE % (COMMANDS[command], HEAVY_MODULES)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{command} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(command: str, runs: int) -> dict:
+    """
+    Run `command` `runs` times and summarise the timings.
+
+    Returns:
+        dict: Median, min and max seconds and the heavy modules that got loaded.
+    """
+    samples = [measure_once(command) for _ in range(runs)]
+    timings = [sample["seconds"] for sample in samples]
+    return {
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "max_seconds": max(timings),
+        "heavy_modules_loaded": sorted(
+            {module for sample in samples for module in sample["loaded"]}
+        ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure miner CLI startup time."
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of fresh interpreters per command",
+    )
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=None,
+        help="Fail if the median time of a command exceeds this value",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON"
+    )
+    args = parser.parse_args()
+
+    report = {
+        "runs": args.runs,
+        "commands": {
+            command: measure(command, args.runs) for command in COMMANDS
+        },
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for command, result in report["commands"].items():
+            loaded = result["heavy_modules_loaded"]
+            print(f"{command} over {args.runs} runs:")
+            print(f"  median: {result['median_seconds'] * 1000:.1f} ms")
+            print(f"  min:    {result['min_seconds'] * 1000:.1f} ms")
+            print(f"  max:    {result['max_seconds'] * 1000:.1f} ms")
+            print(
+                f"  heavy modules loaded: {', '.join(loaded) if loaded else 'none'}"
+            )
+
+    failed = any(
+        result["heavy_modules_loaded"]
+        or (
+            args.max_seconds is not None
+            and result["median_seconds"] > args.max_seconds
+        )
+        for result in report["commands"].values()
+    )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
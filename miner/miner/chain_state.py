@@ -0,0 +1,76 @@
+import bittensor as bt
+from typing import Optional, Tuple
+from miner.logger_config import logger
+
+
+class ChainState:
+    """
+    Cached view of the miner's registration on the subtensor chain.
+
+    Keeps a single subtensor connection for the lifetime of the miner and resolves the
+    hotkey's UID with one targeted `SubtensorModule.Uids` storage query instead of a
+    full metagraph sync. The cached UID is only re-validated once the chain has
+    advanced by `check_interval` blocks.
+    """
+
+    def __init__(
+        self,
+        config: bt.config,
+        wallet: bt.wallet,
+        check_interval: int = 100,
+    ):
+        self.config = config
+        self.netuid = config.netuid
+        self.hotkey = wallet.hotkey.ss58_address
+        self.check_interval = max(int(check_interval), 1)
+        self.subtensor = bt.subtensor(config=config)
+        self._uid: Optional[int] = None
+        self._checked_block: Optional[int] = None
+
+    def reconnect(self):
+        """Drop the current subtensor connection and open a new one."""
+        try:
+            self.subtensor.close()
+        except Exception:
+            pass
+        self.subtensor = bt.subtensor(config=self.config)
+
+    def _needs_check(self, current_block: int) -> bool:
+        if self._uid is None or self._checked_block is None:
+            return True
+        return current_block - self._checked_block >= self.check_interval
+
+    def get_uid(self) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Return the miner's hotkey and UID, querying the chain only when the cache is stale.
+
+        Returns:
+            tuple: (hotkey, uid), or (None, None) if the hotkey is not registered or the
+            chain can't be reached.
+        """
+        try:
+            current_block = self.subtensor.get_current_block()
+        except Exception as e:
+            logger.warning(f"Lost connection to subtensor, reconnecting: {e}")
+            try:
+                self.reconnect()
+                current_block = self.subtensor.get_current_block()
+            except Exception as reconnect_error:
+                logger.error(
+                    f"Unable to reach subtensor after reconnecting: {reconnect_error}"
+                )
+                return None, None
+
+        if self._needs_check(current_block):
+            self._uid = self.subtensor.get_uid_for_hotkey_on_subnet(
+                self.hotkey, self.netuid, block=current_block
+            )
+            self._checked_block = current_block
+            if self._uid is not None:
+                logger.info(
+                    f"Registration re-validated at block {current_block}: uid {self._uid}"
+                )
+
+        if self._uid is None:
+            return None, None
+        return self.hotkey, self._uid
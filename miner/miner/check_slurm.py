@@ -3,6 +3,7 @@ import time
 import os
 from miner.logger_config import logger
 
+
 def terminate_slurm_jobs():
     """
     Function to terminate all running SLURM jobs.
@@ -41,7 +42,9 @@ def check_slurm_job_status(job_id):
 
         # Get the status from the command output
         job_status = (
-            result.stdout.strip().split()[0] if result.stdout.strip() else "UNKNOWN"
+            result.stdout.strip().split()[0]
+            if result.stdout.strip()
+            else "UNKNOWN"
         )
         return job_status
 
@@ -72,7 +75,9 @@ def wait_for_job_completion(job_id, check_interval=30, timeout=24 * 60 * 60):
             logger.error(f"Job {job_id} has failed.")
             return status
         elif time.time() - start_time > timeout:
-            logger.error(f"Job {job_id} did not complete within 1 day, aborting.")
+            logger.error(
+                f"Job {job_id} did not complete within 1 day, aborting."
+            )
             terminate_slurm_jobs()
             logger.info("All jobs have been cancelled.")
             return False
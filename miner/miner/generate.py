@@ -2,7 +2,6 @@ import bittensor as bt
 
 
 def generate_signature(wallet: bt.wallet, message: str):
-
     keypair = wallet.hotkey
     signature = keypair.sign(data=message)
     return signature.hex()
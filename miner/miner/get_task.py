@@ -1,15 +1,12 @@
-import os
 import requests
+from finest_common.api_client import get_client
 from miner.logger_config import logger
 
+
 def fetch_warc_files(hotkey, message, signature):
     """Fetches warc file paths from the API."""
     try:
-        api_url = os.getenv("API_URL")
-        response = requests.post(
-            f"{api_url}/subnets/get-task/",
-            json={"hotkey": hotkey, "message": message, "signature": signature},
-        )
+        response = get_client().get_task(hotkey, message, signature)
         response.raise_for_status()  # Raise an error for bad responses
         warc_files = response.json().get(
             "warc_paths"
@@ -29,15 +26,8 @@ def fetch_warc_files(hotkey, message, signature):
 def send_finish_request(hotkey, message, signature, hf_repo):
     """Sends a finish request to the API."""
     try:
-        api_url = os.getenv("API_URL")
-        response = requests.post(
-            f"{api_url}/subnets/finish-task/",
-            json={
-                "hotkey": hotkey,
-                "message": message,
-                "signature": signature,
-                "hf_repo": hf_repo,
-            },
+        response = get_client().finish_task(
+            hotkey, message, signature, hf_repo, max_retries=10
         )
         response.raise_for_status()
         if response.status_code == 200:
@@ -52,3 +42,6 @@ def send_finish_request(hotkey, message, signature, hf_repo):
         else:
             print(f"Error sending finish request: {str(http_err)}")
         return False
+    except requests.RequestException as req_err:
+        print(f"Error sending finish request: {str(req_err)}")
+        return False
@@ -4,6 +4,7 @@ from colorama import Fore, init
 # Initialize colorama
 init(autoreset=True)
 
+
 # Custom logging formatter to add colors and emojis
 class ColoredFormatter(logging.Formatter):
     COLORS = {
@@ -19,8 +20,11 @@ class ColoredFormatter(logging.Formatter):
         message = super().format(record)
         return f"{color} {message}"
 
+
 # Configure logging with color logging for console output
-logger = logging.getLogger(__name__)  # Use __name__ to ensure it's module-specific
+logger = logging.getLogger(
+    __name__
+)  # Use __name__ to ensure it's module-specific
 
 # Check if the logger already has handlers to avoid adding them multiple times
 if not logger.hasHandlers():
@@ -12,44 +12,45 @@ Example:
 
 from datetime import datetime
 import argparse
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 import os
-import bittensor as bt
-import nltk
 import time
 from miner.get_task import fetch_warc_files, send_finish_request
-from miner.upload_to_hf import upload_dataset
-from miner.refining_dataset import DataRefiner
 import asyncio
 import shutil
 import logging
-from utils import assert_registered
-from generate import generate_signature
 from miner.check_slurm import terminate_slurm_jobs
 from miner.logger_config import logger
+from miner.resources import ResourceUnavailableError, ensure_nltk_resource
 
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    logger.info("Downloading 'punkt' package...")
-    nltk.download("punkt")
+# bittensor, nltk, datatrove and datasets take several seconds to import, so they
+# are only loaded inside the code paths that need them.
+if TYPE_CHECKING:
+    import bittensor as bt
 
 
-def get_config() -> bt.config:
+def build_parser() -> argparse.ArgumentParser:
     """
-    Initialize and parse command-line arguments and add Bittensor-specific arguments.
+    Build the parser for the miner's own command-line arguments.
 
     Returns:
-        bt.Config: Parsed configuration.
+        argparse.ArgumentParser: Parser without the Bittensor-specific arguments.
     """
     parser = argparse.ArgumentParser(
-        description="Upload dataset to Hugging Face and commit dataset URL to Bittensor subtensor chain."
+        description="Upload dataset to Hugging Face and commit dataset URL to Bittensor subtensor chain.",
+        epilog="The Bittensor --wallet.*, --subtensor.* and --logging.* arguments are accepted as well.",
     )
     parser.add_argument(
-        "--netuid", type=int, default=63, help="The unique identifier for the network."
+        "--netuid",
+        type=int,
+        default=63,
+        help="The unique identifier for the network.",
     )
     parser.add_argument(
-        "--hf_repo", type=str, help="The Hugging Face repository to upload the dataset."
+        "--hf_repo",
+        type=str,
+        help="The Hugging Face repository to upload the dataset.",
     )
     parser.add_argument(
         "--total_tasks", type=int, default=4, help="Total number of tasks"
@@ -63,7 +64,29 @@ def get_config() -> bt.config:
         default=-1,
         help="Number of records to process in WarcReader",
     )
+    parser.add_argument(
+        "--registration_check_interval",
+        type=int,
+        default=100,
+        help="Number of blocks between registration re-checks",
+    )
+    return parser
+
+
+def get_config() -> "bt.config":
+    """
+    Initialize and parse command-line arguments and add Bittensor-specific arguments.
+
+    Returns:
+        bt.Config: Parsed configuration.
+    """
+    # Answer --help and reject malformed miner arguments before paying for the
+    # bittensor import; its own arguments are left for bt.config to parse.
+    build_parser().parse_known_args()
 
+    import bittensor as bt
+
+    parser = build_parser()
     # Add Bittensor-specific arguments
     bt.wallet.add_args(parser)
     bt.subtensor.add_args(parser)
@@ -85,27 +108,42 @@ async def processing(config):
     Args:
         config (bt.Config): Configuration object.
     """
+    import bittensor as bt
+    from miner.generate import generate_signature
+    from miner.chain_state import ChainState
+    from miner.refining_dataset import DataRefiner
+    from miner.upload_to_hf import upload_dataset
+
     logger.info(f"bittensor version: {bt.__version__}")
 
-    while True:  # Infinite loop to keep the script running continuously
+    # Fail fast before fetching a task if the tokenizer data is not available.
+    ensure_nltk_resource("punkt")
+
+    bt.logging(config=config)
+    wallet = bt.wallet(config=config)
+    chain_state = ChainState(
+        config, wallet, config.registration_check_interval
+    )
 
+    while True:  # Infinite loop to keep the script running continuously
         start = time.time()
-        bt.logging(config=config)
-        wallet = bt.wallet(config=config)
-        subtensor = bt.subtensor(config=config)
         timestamp = datetime.now()
         timezone = timestamp.astimezone().tzname()
 
         message = f"{timestamp}{timezone}"
         signature = generate_signature(wallet, message)
-        metagraph: bt.metagraph = subtensor.metagraph(config.netuid)
-        hotkey, uid = assert_registered(wallet, metagraph)
+        hotkey, uid = chain_state.get_uid()
+        subtensor = chain_state.subtensor
         if not hotkey:
-            logger.error(f"You are not registered. \nUse: \n`btcli s register --netuid {metagraph.netuid}` to register via burn \n or btcli s pow_register --netuid {metagraph.netuid} to register with a proof of work")
+            logger.error(
+                f"You are not registered. \nUse: \n`btcli s register --netuid {config.netuid}` to register via burn \n or btcli s pow_register --netuid {config.netuid} to register with a proof of work"
+            )
             return
-        logger.info( f"You are registered with address: {wallet.hotkey.ss58_address} and uid: {uid}")
+        logger.info(
+            f"You are registered with address: {wallet.hotkey.ss58_address} and uid: {uid}"
+        )
         warc_files = fetch_warc_files(hotkey, message, signature)
-       
+
         logger.info(f"Received {len(warc_files)} warc files")
 
         if not warc_files:
@@ -141,7 +179,9 @@ async def processing(config):
                         logger.info(
                             f"Committing dataset to subtensor chain {hf_repo_id}"
                         )
-                        subtensor.commit(wallet, config.netuid, f"{hf_repo_id}")
+                        subtensor.commit(
+                            wallet, config.netuid, f"{hf_repo_id}"
+                        )
                         logger.info(
                             "🎉 Successfully committed dataset to subtensor chain 🎉"
                         )
@@ -155,39 +195,39 @@ async def processing(config):
                         )
                         await asyncio.sleep(300)
 
-                max_retries = 10
-                retry_count = 0
-
-                while retry_count < max_retries:
-                    try:
-                        logger.info(
-                            f"Sending finish request for hotkey {hotkey} 📤"
-                        )
-                        message = f"{timestamp}{timezone}"
-                        signature = generate_signature(wallet, message)
-                        response = send_finish_request(
-                            hotkey, message, signature, f"{hf_repo_id}"
-                        )
-                        if response:
-                            break
-                    except Exception as e:
-                        logger.error(
-                            f"Can't send finish request now, trying again in 20 seconds {e}"
-                        )
-                        await asyncio.sleep(20)
-                        retry_count += 1
+                try:
+                    logger.info(
+                        f"Sending finish request for hotkey {hotkey} 📤"
+                    )
+                    message = f"{timestamp}{timezone}"
+                    signature = generate_signature(wallet, message)
+                    # The API client retries the request as long as it is safe to.
+                    accepted = await asyncio.to_thread(
+                        send_finish_request,
+                        hotkey,
+                        message,
+                        signature,
+                        f"{hf_repo_id}",
+                    )
+                    if not accepted:
+                        logger.error("Finish request was not accepted")
+                except Exception as e:
+                    logger.error(f"Can't send finish request: {e}")
         else:
-            logger.error("Data processing failed, waiting for 8 hours before retrying 🕒")
+            logger.error(
+                "Data processing failed, waiting for 8 hours before retrying 🕒"
+            )
             await asyncio.sleep(8 * 3600)
             continue
         end = time.time() - start
         logger.info(f"Processing time: {end:.2f} seconds 🕒")
-        
+
         logger.error("Waiting for 8 hours before starting next task again 🕒")
         try:
             await asyncio.wait_for(asyncio.sleep(8 * 3600), timeout=8 * 3600)
         except asyncio.TimeoutError:
-            pass 
+            pass
+
 
 def main():
     try:
@@ -195,13 +235,14 @@ def main():
         logger.info("Initiating the mining process 🚀")
         asyncio.run(processing(config))
 
+    except ResourceUnavailableError as e:
+        logger.error(f"🔴 {e}")
     except KeyboardInterrupt:
         logger.error("🔴 Mining process interrupted by user.")
         terminate_slurm_jobs()
 
 
 if __name__ == "__main__":
-
     load_dotenv()
 
-    main()
\ No newline at end of file
+    main()
@@ -15,17 +15,20 @@ from datatrove.pipeline.filters import (
     URLFilter,
 )
 from datatrove.pipeline.formatters import PIIFormatter
-from datatrove.pipeline.readers import JsonlReader, WarcReader
+from datatrove.pipeline.readers import JsonlReader
 from datatrove.pipeline.tokens import TokensCounter
 from datatrove.pipeline.writers.jsonl import JsonlWriter
 import tempfile
 from s3fs import S3FileSystem
 from datatrove.io import DataFolder
 from miner.check_slurm import wait_for_job_completion
+from miner.warc_reader import IndexedWarcReader
 
 
 class DataRefiner:
-    def __init__(self, warc_files, result_path, total_tasks, cpus_per_task, limit):
+    def __init__(
+        self, warc_files, result_path, total_tasks, cpus_per_task, limit
+    ):
         self.warc_files = warc_files
         self.result_path = result_path
         self.total_tasks = total_tasks
@@ -51,10 +54,12 @@ class DataRefiner:
         return SlurmPipelineExecutor(
             job_name="cc_warc",
             pipeline=[
-                WarcReader(
+                IndexedWarcReader(
                     data_folder=DataFolder(
                         path="s3://commoncrawl",
-                        fs=S3FileSystem(client_kwargs={"region_name": "us-east-1"}),
+                        fs=S3FileSystem(
+                            client_kwargs={"region_name": "us-east-1"}
+                        ),
                     ),
                     paths_file=warc_files_path,
                     file_progress=True,
@@ -192,13 +197,14 @@ class DataRefiner:
         if not self.warc_files:
             print("No WARC files fetched from API. Exiting.")
             return False
-        try :
-
+        try:
             warc_files_path = self._create_warc_files_path()
             main_processing_executor = self._create_main_processing_executor(
                 warc_files_path
             )
-            stage4 = self._create_deduplication_stages(main_processing_executor)
+            stage4 = self._create_deduplication_stages(
+                main_processing_executor
+            )
 
             stage4.run()
 
@@ -207,7 +213,6 @@ class DataRefiner:
             if final_status == "COMPLETED":
                 return True
             elif final_status == "FAILED":
-
                 print("Job failed, aborting post-processing.")
                 return False
             else:
@@ -216,6 +221,7 @@ class DataRefiner:
         except Exception as e:
             return False
 
+
 if __name__ == "__main__":
     warc_files = [
         "crawl-data/CC-MAIN-2024-42/segments/1727944253654.26/warc/CC-MAIN-20241009211335-20241010001335-00661.warc.gz",
@@ -227,6 +233,7 @@ if __name__ == "__main__":
     total_tasks = 4
     cpus_per_task = 20
     limit = 10
-    refiner = DataRefiner(warc_files, result_path, total_tasks, cpus_per_task, limit)
+    refiner = DataRefiner(
+        warc_files, result_path, total_tasks, cpus_per_task, limit
+    )
     refiner.refine()
-
@@ -0,0 +1,65 @@
+import os
+from miner.logger_config import logger
+
+# Map of short resource names to their location inside the NLTK data directory.
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+}
+
+
+class ResourceUnavailableError(RuntimeError):
+    """Raised when a required resource is missing from the local cache and can't be downloaded."""
+
+
+def is_offline() -> bool:
+    """
+    Check whether the miner is configured to run without network access.
+
+    Returns:
+        bool: True if MINER_OFFLINE or HF_HUB_OFFLINE is set to a truthy value.
+    """
+    return any(
+        os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+        for name in ("MINER_OFFLINE", "HF_HUB_OFFLINE")
+    )
+
+
+def ensure_nltk_resource(name: str) -> str:
+    """
+    Resolve an NLTK resource from the local cache, downloading it only when allowed.
+
+    Args:
+        name (str): Short resource name, e.g. "punkt".
+
+    Returns:
+        str: Local path of the resource.
+
+    Raises:
+        ResourceUnavailableError: If the resource is not cached and can't be downloaded.
+    """
+    import nltk
+
+    resource_path = NLTK_RESOURCES.get(name, name)
+    try:
+        return str(nltk.data.find(resource_path))
+    except LookupError:
+        pass
+
+    hint = (
+        f"NLTK resource '{name}' was not found in {nltk.data.path}. "
+        f"Install it with `python -m nltk.downloader {name}` "
+        f"or point NLTK_DATA at a directory that contains '{resource_path}'."
+    )
+    if is_offline():
+        raise ResourceUnavailableError(f"Offline mode is enabled. {hint}")
+
+    logger.info(f"Downloading '{name}' package...")
+    if not nltk.download(name, quiet=True, raise_on_error=False):
+        raise ResourceUnavailableError(f"Download failed. {hint}")
+
+    try:
+        return str(nltk.data.find(resource_path))
+    except LookupError as e:
+        raise ResourceUnavailableError(hint) from e
@@ -15,7 +15,9 @@ def read_datasets(dataset_path):
 
             with gzip.open(file_path, "rt") as f:
                 dataset = [json.loads(line) for line in f]
-                all_datasets.extend(dataset)  # Combine all datasets into a single list
+                all_datasets.extend(
+                    dataset
+                )  # Combine all datasets into a single list
     return all_datasets
 
 
@@ -61,7 +63,6 @@ def upload_dataset(result_path, hf_repo):
     repo_name = f"{hf_repo}_{formatted_timestamp}"
 
     if upload_to_hf(dataset_dict, repo_name, hf_token):
-
         remove_result_folder(result_path)
 
         return repo_name
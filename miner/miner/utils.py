@@ -1,19 +0,0 @@
-import bittensor as bt
-
-
-def assert_registered(wallet: bt.wallet, metagraph: bt.metagraph) -> int:
-    """Asserts the wallet is a registered miner and returns the miner's UID.
-
-    Raises:
-        ValueError: If the wallet is not registered.
-    """
-    if wallet.hotkey.ss58_address not in metagraph.hotkeys:
-        return None, None
-
-    uid = metagraph.hotkeys.index(wallet.hotkey.ss58_address)
-
-    bt.logging.success(
-        f"You are registered with address: {wallet.hotkey.ss58_address} and uid: {uid}"
-    )
-
-    return wallet.hotkey.ss58_address, uid
@@ -0,0 +1,37 @@
+from datatrove.pipeline.readers import WarcReader
+from datatrove.pipeline.readers.warc import process_record
+
+
+class IndexedWarcReader(WarcReader):
+    """
+    WarcReader that records where each document comes from in its WARC file.
+
+    Every document's metadata gets `warc_path` (the path of the WARC file in the
+    bucket), `warc_offset` and `warc_length` (the byte range of its gzip member in
+    the compressed file). The validator uses them to fetch only the records it
+    samples with ranged reads instead of downloading whole WARC files.
+
+    The files are handed to warcio still compressed, since the offsets of the gzip
+    members are only known before decompression.
+    """
+
+    def read_file(self, filepath: str):
+        from warcio.archiveiterator import ArchiveIterator
+
+        with self.data_folder.open(filepath, "rb", compression=None) as f:
+            records = ArchiveIterator(f)
+            for ri, record in enumerate(records):
+                with self.track_time():
+                    extracted_data = process_record(record)
+                    if not extracted_data:
+                        continue
+                    # The record's content has been read, so warcio knows where it ends.
+                    extracted_data["warc_path"] = filepath
+                    extracted_data["warc_offset"] = records.get_record_offset()
+                    extracted_data["warc_length"] = records.get_record_length()
+                    document = self.get_document_from_dict(
+                        extracted_data, filepath, ri
+                    )
+                    if not document:
+                        continue
+                yield document
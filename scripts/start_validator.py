@@ -44,7 +44,9 @@ def get_version() -> str:
     return commit[:8]
 
 
-def start_validator_process(pm2_name: str, args: List[str]) -> subprocess.Popen:
+def start_validator_process(
+    pm2_name: str, args: List[str]
+) -> subprocess.Popen:
     """
     Spawn a new python process running neurons.validator.
     `sys.executable` ensures that the same python interpreter is used as the one
@@ -73,7 +75,9 @@ def start_validator_process(pm2_name: str, args: List[str]) -> subprocess.Popen:
 
 def stop_validator_process(process: subprocess.Popen) -> None:
     """Stop the validator process"""
-    subprocess.run(("pm2", "delete", process.pm2_name), cwd=root_dir, check=True)
+    subprocess.run(
+        ("pm2", "delete", process.pm2_name), cwd=root_dir, check=True
+    )
 
 
 def pull_latest_version() -> None:
@@ -87,7 +91,9 @@ def pull_latest_version() -> None:
     to be used as-is.
     """
     try:
-        subprocess.run(split("git pull --rebase --autostash"), check=True, cwd=root_dir)
+        subprocess.run(
+            split("git pull --rebase --autostash"), check=True, cwd=root_dir
+        )
     except subprocess.CalledProcessError as exc:
         log.error("Failed to pull, reverting: %s", exc)
         subprocess.run(split("git rebase --abort"), check=True, cwd=root_dir)
@@ -106,7 +112,9 @@ def upgrade_packages() -> None:
             cwd=os.path.join(root_dir, "validator"),
         )
     except subprocess.CalledProcessError as exc:
-        log.error("Failed to run setup_environment.sh, proceeding anyway. %s", exc)
+        log.error(
+            "Failed to run setup_environment.sh, proceeding anyway. %s", exc
+        )
 
 
 def main(pm2_name: str, args: List[str]) -> None:
@@ -1,4 +1,5 @@
 import bittensor as bt
-subtensor = bt.subtensor(network = "test")
-latest_commit = subtensor.get_commitment(netuid = 18, uid = 43)
-print(latest_commit)
\ No newline at end of file
+
+subtensor = bt.subtensor(network="test")
+latest_commit = subtensor.get_commitment(netuid=18, uid=43)
+print(latest_commit)
@@ -0,0 +1,246 @@
+import asyncio
+import inspect
+import logging
+import operator
+import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+)
+
+from commitments import Commitment, decode_commitments
+from finest_common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CHAIN_RPC_SECONDS = REGISTRY.histogram(
+    "validator_chain_rpc_seconds", "Latency of the chain RPC calls, by method"
+)
+CHAIN_RPC_FAILURES = REGISTRY.counter(
+    "validator_chain_rpc_failures_total",
+    "Chain RPC calls that failed on an endpoint, by method",
+)
+
+# Errors caused by the call itself rather than the endpoint; these are raised
+# immediately instead of failing over to another endpoint.
+CALL_ERRORS = (
+    NotImplementedError,
+    AttributeError,
+    TypeError,
+    KeyError,
+    ValueError,
+)
+
+
+class ChainUnavailableError(RuntimeError):
+    """Raised when a chain call failed on every configured endpoint."""
+
+
+async def connect_async_subtensor(endpoint: str):
+    """Open an AsyncSubtensor connection to a network name or websocket endpoint."""
+    from bittensor.core.async_subtensor import AsyncSubtensor
+
+    subtensor = AsyncSubtensor(network=endpoint)
+    await subtensor.initialize()
+    return subtensor
+
+
+class AsyncChain:
+    """
+    asyncio chain access with bounded concurrency, per-call timeouts and failover.
+
+    Calls go to the last endpoint that answered. When a call fails or times out the
+    endpoint is put on cooldown and the call is retried on the next one.
+
+    Args:
+        endpoints (list): Network names or websocket endpoints, in order of preference.
+        factory: Coroutine function returning a connected async subtensor for an endpoint.
+        max_concurrency (int): Maximum number of calls in flight.
+        call_timeout (float): Seconds before a single call is abandoned.
+        cooldown (float): Seconds a failed endpoint is skipped.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[str],
+        factory: Callable[[str], Awaitable[Any]] = connect_async_subtensor,
+        max_concurrency: int = 16,
+        call_timeout: float = 30.0,
+        cooldown: float = 60.0,
+    ):
+        if not endpoints:
+            raise ValueError("At least one chain endpoint is required")
+        self.endpoints = list(dict.fromkeys(endpoints))
+        self.factory = factory
+        self.call_timeout = call_timeout
+        self.cooldown = cooldown
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._clients: Dict[str, Any] = {}
+        self._connect_locks: Dict[str, asyncio.Lock] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._active = 0
+
+    def _candidates(self) -> List[str]:
+        ordered = (
+            self.endpoints[self._active :] + self.endpoints[: self._active]
+        )
+        now = time.monotonic()
+        healthy = [e for e in ordered if self._failed_until.get(e, 0) <= now]
+        # When every endpoint is cooling down, try them all anyway.
+        return healthy or ordered
+
+    async def _client(self, endpoint: str):
+        client = self._clients.get(endpoint)
+        if client is not None:
+            return client
+        lock = self._connect_locks.setdefault(endpoint, asyncio.Lock())
+        async with lock:
+            if endpoint not in self._clients:
+                self._clients[endpoint] = await asyncio.wait_for(
+                    self.factory(endpoint), self.call_timeout
+                )
+            return self._clients[endpoint]
+
+    async def _drop(self, endpoint: str):
+        self._failed_until[endpoint] = time.monotonic() + self.cooldown
+        client = self._clients.pop(endpoint, None)
+        close = getattr(client, "close", None)
+        if close is not None:
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                pass
+
+    async def call(
+        self, method: str, *args, timeout: Optional[float] = None, **kwargs
+    ):
+        """
+        Call `method` (a dotted attribute path such as "substrate.query_map") on the
+        first healthy endpoint.
+
+        Raises:
+            ChainUnavailableError: If the call failed on every endpoint.
+        """
+        timeout = self.call_timeout if timeout is None else timeout
+        last_error = None
+        async with self._semaphore:
+            for endpoint in self._candidates():
+                start = time.perf_counter()
+                try:
+                    client = await self._client(endpoint)
+                    result = operator.attrgetter(method)(client)(
+                        *args, **kwargs
+                    )
+                    if inspect.isawaitable(result):
+                        result = await asyncio.wait_for(result, timeout)
+                    self._active = self.endpoints.index(endpoint)
+                    CHAIN_RPC_SECONDS.observe(
+                        time.perf_counter() - start, method=method
+                    )
+                    return result
+                except CALL_ERRORS:
+                    raise
+                except Exception as e:
+                    last_error = e
+                    CHAIN_RPC_SECONDS.observe(
+                        time.perf_counter() - start, method=method
+                    )
+                    CHAIN_RPC_FAILURES.inc(method=method)
+                    logger.warning(
+                        f"Chain call {method} failed on {endpoint}: {e!r}, failing over"
+                    )
+                    await self._drop(endpoint)
+        raise ChainUnavailableError(
+            f"Chain call {method} failed on all endpoints"
+        ) from last_error
+
+    async def gather(self, method: str, calls: Iterable[tuple]) -> List[Any]:
+        """
+        Issue the same call concurrently for several argument tuples.
+
+        Returns:
+            list: One result per call; failed calls are returned as the exception.
+        """
+        return await asyncio.gather(
+            *(self.call(method, *args) for args in calls),
+            return_exceptions=True,
+        )
+
+    async def close(self):
+        for endpoint in list(self._clients):
+            client = self._clients.pop(endpoint)
+            close = getattr(client, "close", None)
+            if close is not None:
+                try:
+                    result = close()
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception:
+                    pass
+
+
+async def _iterate(result) -> List[tuple]:
+    if hasattr(result, "__aiter__"):
+        return [item async for item in result]
+    return list(result)
+
+
+async def fetch_all_commitments_async(
+    chain: AsyncChain, netuid: int
+) -> Dict[str, Commitment]:
+    """Fetch every commitment on the subnet with a single storage-map query."""
+    result = await chain.call(
+        "substrate.query_map",
+        module="Commitments",
+        storage_function="CommitmentOf",
+        params=[netuid],
+    )
+    return decode_commitments(await _iterate(result))
+
+
+async def fetch_commitments_per_hotkey(
+    chain: AsyncChain, netuid: int, hotkeys: Sequence[str]
+) -> Dict[str, Commitment]:
+    """
+    Look up every hotkey's commitment with concurrent `CommitmentOf` queries.
+
+    Used when the storage map can't be queried in bulk. Hotkeys whose lookup failed
+    are left out and logged.
+    """
+    results = await chain.gather(
+        "substrate.query",
+        [
+            ("Commitments", "CommitmentOf", [netuid, hotkey])
+            for hotkey in hotkeys
+        ],
+    )
+    entries = []
+    for hotkey, registration in zip(hotkeys, results):
+        if isinstance(registration, Exception):
+            logger.error(
+                f"Failed to fetch commitment for {hotkey}: {registration}"
+            )
+            continue
+        entries.append((hotkey, registration))
+    return decode_commitments(entries)
+
+
+async def fetch_commitments(
+    chain: AsyncChain, netuid: int, hotkeys: Sequence[str]
+) -> Dict[str, Commitment]:
+    """Fetch all commitments in bulk, falling back to concurrent per-hotkey lookups."""
+    try:
+        return await fetch_all_commitments_async(chain, netuid)
+    except Exception as e:
+        logger.warning(
+            f"Bulk commitment query unavailable ({e!r}), falling back to per-UID lookups"
+        )
+        return await fetch_commitments_per_hotkey(chain, netuid, hotkeys)
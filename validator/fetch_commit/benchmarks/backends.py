@@ -0,0 +1,112 @@
+"""Queue and state backends: cost of the validator's hot paths on each of them.
+
+Times a commit fetch cycle (`apply_commit_updates` over every UID), leasing and
+acking the queued commits, and pushing then draining score reports, on the
+in-memory store, SQLite and, when one is reachable, Redis.
+
+Usage:
+    python benchmarks/backends.py [--uids 256] [--repeat 5] [--redis redis://localhost:6379/15]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from finest_common import state_backend  # noqa: E402
+from finest_common.commit_queue import CommitQueue  # noqa: E402
+from main import apply_commit_updates  # noqa: E402
+
+
+def fetch_cycle(store, uids: int, block: int):
+    commit_queue = CommitQueue(store)
+    commitments = {
+        uid: (f"hf/miner-{uid}/{block}", block - 5) for uid in range(uids)
+    }
+    apply_commit_updates(
+        store,
+        commit_queue,
+        list(range(uids)),
+        commitments,
+        set(commitments),
+        block,
+        {uid: uid / uids for uid in range(uids)},
+    )
+
+
+def drain_queue(store):
+    commit_queue = CommitQueue(store)
+    while True:
+        item = commit_queue.lease("benchmark", 60)
+        if item is None:
+            return
+        commit_queue.ack(item["uid"], "benchmark")
+
+
+def report_round_trip(store, reports: int):
+    for task_id in range(reports):
+        store.rpush(
+            "report_score", json.dumps({"task_id": task_id, "score": 0.5})
+        )
+    for _ in range(reports):
+        store.blpop("report_score", timeout=1)
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the state backends."
+    )
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--redis",
+        type=str,
+        default="redis://localhost:6379/15",
+        help="Redis database to benchmark; it is flushed of the benchmark keys",
+    )
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    backends = {
+        "memory": "memory://benchmark",
+        "sqlite": f"sqlite://{os.path.join(directory, 'state.db')}",
+        "redis": args.redis,
+    }
+
+    print(
+        f"{'backend':>8}{'fetch cycle ms':>16}{'lease+ack ms':>14}{'reports ms':>12}"
+    )
+    for name, url in backends.items():
+        store = state_backend.connect(url)
+        try:
+            store.ping()
+        except Exception as e:
+            print(f"{name:>8}  skipped: {e}")
+            continue
+        fetch = lease = reports = 0.0
+        for round_ in range(args.repeat):
+            CommitQueue(store).clear()
+            store.delete("previous_commits", "scores", "report_score")
+            fetch += timed(fetch_cycle, store, args.uids, 1000 + round_)
+            lease += timed(drain_queue, store)
+            reports += timed(report_round_trip, store, args.uids)
+        CommitQueue(store).clear()
+        store.delete("previous_commits", "scores", "report_score")
+        print(
+            f"{name:>8}{fetch / args.repeat * 1e3:>16.1f}"
+            f"{lease / args.repeat * 1e3:>14.1f}{reports / args.repeat * 1e3:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Cycle time of per-UID commitment lookups: sequential vs the asyncio chain layer.
+
+Simulates nodes without bulk storage-map support, where every UID needs its own
+query, plus a primary endpoint that is down to exercise failover.
+
+Usage:
+    python benchmarks/concurrent_lookups.py [--uids 256] [--rpc-latency 0.05] [--concurrency 1 4 16 64]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_chain import AsyncChain, fetch_commitments  # noqa: E402
+from mock_chain import MockAsyncSubtensor, MockSubtensor  # noqa: E402
+
+
+async def run_cycle(chain_state, endpoints, concurrency):
+    async def factory(endpoint):
+        return endpoints[endpoint]
+
+    chain = AsyncChain(
+        list(endpoints),
+        factory=factory,
+        max_concurrency=concurrency,
+        call_timeout=5.0,
+    )
+    start = time.perf_counter()
+    commitments = await fetch_commitments(chain, 63, chain_state.hotkeys)
+    elapsed = time.perf_counter() - start
+    await chain.close()
+    return elapsed, commitments
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark concurrent chain lookups."
+    )
+    parser.add_argument("--uids", type=int, default=256)
+    parser.add_argument(
+        "--rpc-latency", type=float, default=0.05, help="Seconds per RPC"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 4, 16, 64]
+    )
+    parser.add_argument(
+        "--primary-down",
+        action="store_true",
+        help="Make the first endpoint fail",
+    )
+    args = parser.parse_args()
+
+    chain_state = MockSubtensor(n=args.uids, rpc_latency=args.rpc_latency)
+    expected = set(chain_state.registrations)
+
+    print(f"{'concurrency':>12}{'cycle s':>10}{'commitments':>13}")
+    baseline = None
+    for concurrency in args.concurrency:
+        endpoints = {}
+        if args.primary_down:
+            endpoints["ws://primary"] = MockAsyncSubtensor(
+                chain_state, bulk_supported=False, fail=True
+            )
+        endpoints["ws://fallback"] = MockAsyncSubtensor(
+            chain_state, bulk_supported=False
+        )
+        elapsed, commitments = asyncio.run(
+            run_cycle(chain_state, endpoints, concurrency)
+        )
+        assert (
+            set(commitments) == expected
+        ), "lookups returned different hotkeys"
+        baseline = baseline or elapsed
+        print(
+            f"{concurrency:>12}{elapsed:>10.3f}{len(commitments):>13}  ({baseline / elapsed:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Per-cycle latency of fetching commitments: per-UID RPCs vs one storage-map query
+through the asyncio chain layer fetch_commits uses.
+
+Usage:
+    python benchmarks/fetch_commits.py [--uids 64 256 1024] [--rpc-latency 0.02]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_chain import AsyncChain, fetch_all_commitments_async  # noqa: E402
+from commitments import commitments_by_uid  # noqa: E402
+from mock_chain import (
+    MockAsyncSubtensor,
+    MockMetagraph,
+    MockSubtensor,
+)  # noqa: E402
+
+
+def per_uid_cycle(subtensor, metagraph):
+    """The access pattern fetch_commits used before the bulk query."""
+    commitments = {}
+    for uid in metagraph.uids:
+        current_commit = subtensor.get_commitment(
+            netuid=metagraph.netuid, uid=uid
+        )
+        if current_commit:
+            metadata = subtensor.get_metadata(
+                metagraph.netuid, metagraph.hotkeys[uid]
+            )
+            subtensor.get_current_block()
+            commitments[uid] = (current_commit, metadata["block"])
+    return commitments
+
+
+def bulk_cycle(subtensor, metagraph):
+    endpoint = MockAsyncSubtensor(subtensor)
+
+    async def factory(_):
+        return endpoint
+
+    async def cycle():
+        chain = AsyncChain(["mock"], factory=factory)
+        try:
+            await chain.call("get_current_block")
+            return await fetch_all_commitments_async(chain, metagraph.netuid)
+        finally:
+            await chain.close()
+
+    commitments = asyncio.run(cycle())
+    subtensor.calls.update(endpoint.calls)
+    return commitments_by_uid(commitments, metagraph.hotkeys)
+
+
+def measure(cycle, subtensor, metagraph):
+    subtensor.reset_calls()
+    start = time.perf_counter()
+    result = cycle(subtensor, metagraph)
+    return time.perf_counter() - start, sum(subtensor.calls.values()), result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark commitment fetching."
+    )
+    parser.add_argument("--uids", type=int, nargs="+", default=[64, 256])
+    parser.add_argument(
+        "--rpc-latency", type=float, default=0.02, help="Seconds per RPC"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'uids':>6}{'per-uid s':>12}{'rpcs':>7}{'bulk s':>10}{'rpcs':>7}{'speedup':>10}"
+    )
+    for n in args.uids:
+        subtensor = MockSubtensor(n=n, rpc_latency=args.rpc_latency)
+        metagraph = MockMetagraph(subtensor)
+        legacy_time, legacy_rpcs, legacy = measure(
+            per_uid_cycle, subtensor, metagraph
+        )
+        bulk_time, bulk_rpcs, bulk = measure(bulk_cycle, subtensor, metagraph)
+        assert legacy == bulk, "bulk fetch returned different commitments"
+        print(
+            f"{n:>6}{legacy_time:>12.3f}{legacy_rpcs:>7}{bulk_time:>10.3f}{bulk_rpcs:>7}"
+            f"{legacy_time / bulk_time:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""In-memory stand-in for the parts of the subtensor chain used by fetch_commit.
+
+Every call sleeps for a configurable RPC latency and is counted, so the benchmarks can
+compare chain access patterns without a node.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+
+
+def make_registration(commit: str, block: int) -> dict:
+    """Build a `Commitments.CommitmentOf` value the way the chain returns it."""
+    return {
+        "deposit": 0,
+        "block": block,
+        "info": {
+            "fields": [{f"Raw{len(commit)}": "0x" + commit.encode().hex()}]
+        },
+    }
+
+
+class MockSubtensor:
+    """
+    Args:
+        n (int): Number of UIDs on the subnet.
+        rpc_latency (float): Seconds slept by every RPC.
+        per_entry_latency (float): Extra seconds per entry returned by a storage-map query.
+        commit_fraction (float): Fraction of UIDs holding a commitment.
+        block (int): Initial block number.
+        seed (int): Random seed.
+    """
+
+    # The methods take the arguments of bt.subtensor's.
+    # pylint: disable=unused-argument
+
+    def __init__(
+        self,
+        n=256,
+        rpc_latency=0.02,
+        per_entry_latency=0.00002,
+        commit_fraction=0.8,
+        block=4_000_000,
+        seed=0,
+    ):
+        self.n = n
+        self.rpc_latency = rpc_latency
+        self.per_entry_latency = per_entry_latency
+        self.block = block
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.hotkeys = [f"5MockHotkey{uid:05d}" for uid in range(n)]
+        self.registrations = {}
+        for uid in range(n):
+            if self.random.random() < commit_fraction:
+                self.commit(
+                    uid, f"miner{uid}/dataset_{self.random.randrange(10**6)}"
+                )
+
+    def _rpc(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.rpc_latency:
+            time.sleep(self.rpc_latency)
+
+    def commit(self, uid, commit, block=None):
+        self.registrations[self.hotkeys[uid]] = make_registration(
+            commit, self.block if block is None else block
+        )
+
+    def advance(self, blocks=1):
+        self.block += blocks
+
+    def reset_calls(self):
+        with self._lock:
+            self.calls.clear()
+
+    def get_current_block(self):
+        self._rpc("get_current_block")
+        return self.block
+
+    def get_metadata(self, netuid, hotkey):
+        self._rpc("get_metadata")
+        return self.registrations.get(hotkey)
+
+    def get_commitment(self, netuid, uid):
+        self._rpc("get_commitment")
+        registration = self.registrations.get(self.hotkeys[uid])
+        if not registration:
+            return ""
+        commitment = registration["info"]["fields"][0]
+        hex_data = commitment[list(commitment.keys())[0]][2:]
+        return bytes.fromhex(hex_data).decode()
+
+
+class MockMetagraph:
+    def __init__(self, chain: MockSubtensor, netuid=63):
+        self.netuid = netuid
+        self.hotkeys = list(chain.hotkeys)
+        self.uids = list(range(chain.n))
+
+
+class MockAsyncSubstrate:
+    # pylint: disable=protected-access,unused-argument
+
+    def __init__(self, chain: "MockAsyncSubtensor"):
+        self.chain = chain
+
+    async def query(
+        self, module, storage_function, params=None, block_hash=None, **kwargs
+    ):
+        await self.chain._rpc("query")
+        _, hotkey = params
+        return self.chain.sync.registrations.get(hotkey)
+
+    async def query_map(
+        self, module, storage_function, params=None, block_hash=None, **kwargs
+    ):
+        if not self.chain.bulk_supported:
+            raise NotImplementedError(
+                "query_map is disabled on this mock endpoint"
+            )
+        await self.chain._rpc("query_map")
+        await asyncio.sleep(
+            self.chain.sync.per_entry_latency
+            * len(self.chain.sync.registrations)
+        )
+        return list(self.chain.sync.registrations.items())
+
+
+class MockAsyncSubtensor:
+    """
+    Async view of a MockSubtensor. RPCs sleep on the event loop, so concurrent calls
+    overlap the way they do on a real websocket connection.
+
+    Args:
+        sync (MockSubtensor): Chain state to serve.
+        rpc_latency (float): Seconds slept by every RPC, defaults to the sync chain's.
+        bulk_supported (bool): Whether storage-map queries are available.
+        fail (bool): Whether every call on this endpoint raises a connection error.
+    """
+
+    def __init__(
+        self,
+        sync: MockSubtensor,
+        rpc_latency=None,
+        bulk_supported=True,
+        fail=False,
+    ):
+        self.sync = sync
+        self.rpc_latency = (
+            sync.rpc_latency if rpc_latency is None else rpc_latency
+        )
+        self.bulk_supported = bulk_supported
+        self.fail = fail
+        self.calls = Counter()
+        self.substrate = MockAsyncSubstrate(self)
+
+    async def _rpc(self, name):
+        self.calls[name] += 1
+        if self.fail:
+            raise ConnectionError("mock endpoint is down")
+        if self.rpc_latency:
+            await asyncio.sleep(self.rpc_latency)
+
+    async def get_current_block(self):
+        await self._rpc("get_current_block")
+        return self.sync.block
+
+    async def close(self):
+        pass
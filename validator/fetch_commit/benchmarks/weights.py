@@ -0,0 +1,167 @@
+"""Weight normalisation and emit conversion: NumPy versions vs the previous loops.
+
+Checks that both give identical uint16 weights on random, sparse, tied and capped
+score vectors, then times them.
+
+Usage:
+    python benchmarks/weights.py [--uids 256 1024 4096] [--repeat 200]
+"""
+
+import argparse
+import functools
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import (  # noqa: E402
+    U16_MAX,
+    convert_weights_and_uids_for_emit,
+    normalize_max_weight,
+)
+
+
+def legacy_normalize_max_weight(
+    x: np.ndarray, limit: float = 0.1
+) -> np.ndarray:
+    """`normalize_max_weight` before vectorisation."""
+    epsilon = 1e-7
+
+    weights = x.copy()
+    values = np.sort(weights)
+
+    if x.sum() == 0 or len(x) * limit <= 1:
+        return np.ones_like(x) / x.size
+    else:
+        estimation = values / values.sum()
+
+        if estimation.max() <= limit:
+            return weights / weights.sum()
+
+        cumsum = np.cumsum(estimation, 0)
+        estimation_sum = np.array(
+            [(len(values) - i - 1) * estimation[i] for i in range(len(values))]
+        )
+        n_values = (
+            estimation / (estimation_sum + cumsum + epsilon) < limit
+        ).sum()
+        cutoff_scale = (limit * cumsum[n_values - 1] - epsilon) / (
+            1 - (limit * (len(estimation) - n_values))
+        )
+        cutoff = cutoff_scale * values.sum()
+        weights[weights > cutoff] = cutoff
+        return weights / weights.sum()
+
+
+def legacy_convert_weights_and_uids_for_emit(
+    uids: np.ndarray, weights: np.ndarray
+):
+    """`convert_weights_and_uids_for_emit` before vectorisation, without the logging."""
+    uids = np.asarray(uids)
+    weights = np.asarray(weights)
+    if np.sum(weights) == 0:
+        return [], []
+    max_weight = float(np.max(weights))
+    weights = [float(value) / max_weight for value in weights]
+
+    weight_vals = []
+    weight_uids = []
+    for weight_i, uid_i in zip(weights, uids):
+        uint16_val = round(float(weight_i) * int(U16_MAX))
+        if uint16_val != 0:
+            weight_vals.append(uint16_val)
+            weight_uids.append(uid_i)
+    return weight_uids, weight_vals
+
+
+def score_vectors(n: int, seed: int = 0):
+    """Score distributions seen on the subnet: dense, sparse, tied and one dominant UID."""
+    rng = np.random.default_rng(seed)
+    dense = rng.random(n).astype(np.float32)
+    sparse = np.where(rng.random(n) < 0.1, rng.random(n), 0).astype(np.float32)
+    tied = np.repeat(rng.random(8), -(-n // 8))[:n].astype(np.float32)
+    dominant = (rng.random(n) * 1e-3).astype(np.float32)
+    dominant[rng.integers(n)] = 1.0
+    return {
+        "dense": dense,
+        "sparse": sparse,
+        "tied": tied,
+        "dominant": dominant,
+    }
+
+
+def emit(normalize, convert, scores, limit):
+    uids = np.arange(len(scores))
+    return convert(uids, normalize(scores, limit=limit))
+
+
+def check_equivalence(n: int, limit: float):
+    for name, scores in score_vectors(n).items():
+        legacy = emit(
+            legacy_normalize_max_weight,
+            legacy_convert_weights_and_uids_for_emit,
+            scores,
+            limit,
+        )
+        current = emit(
+            normalize_max_weight,
+            convert_weights_and_uids_for_emit,
+            scores,
+            limit,
+        )
+        assert [int(uid) for uid in legacy[0]] == current[
+            0
+        ], f"{name}: uids differ"
+        assert legacy[1] == current[1], f"{name}: uint16 weights differ"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark weight processing."
+    )
+    parser.add_argument(
+        "--uids", type=int, nargs="+", default=[256, 1024, 4096]
+    )
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument(
+        "--limit", type=float, default=0.05, help="max_weight_limit"
+    )
+    args = parser.parse_args()
+
+    print(f"{'uids':>6}{'legacy ms':>12}{'numpy ms':>11}{'speedup':>10}")
+    for n in args.uids:
+        check_equivalence(n, args.limit)
+        scores = score_vectors(n)["dense"]
+        scores[0] = scores.sum()  # force the capping path
+        legacy = timeit.timeit(
+            functools.partial(
+                emit,
+                legacy_normalize_max_weight,
+                legacy_convert_weights_and_uids_for_emit,
+                scores,
+                args.limit,
+            ),
+            number=args.repeat,
+        )
+        current = timeit.timeit(
+            functools.partial(
+                emit,
+                normalize_max_weight,
+                convert_weights_and_uids_for_emit,
+                scores,
+                args.limit,
+            ),
+            number=args.repeat,
+        )
+        print(
+            f"{n:>6}{legacy / args.repeat * 1e3:>12.3f}"
+            f"{current / args.repeat * 1e3:>11.3f}{legacy / current:>9.1f}x"
+        )
+    print("uint16 output identical on all score vectors.")
+
+
+if __name__ == "__main__":
+    main()
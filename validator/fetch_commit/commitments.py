@@ -0,0 +1,167 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# (commit string, block the commitment was made at)
+Commitment = Tuple[str, int]
+
+
+def _decode_hotkey(key: Any) -> str:
+    """Decode a storage-map key into an ss58 hotkey address."""
+    if isinstance(key, (tuple, list)) and len(key) == 1:
+        key = key[0]
+    if isinstance(key, str):
+        return key
+    if (
+        isinstance(key, (tuple, list))
+        and key
+        and isinstance(key[0], (tuple, list))
+    ):
+        key = key[0]
+    from bittensor.core.chain_data.utils import decode_account_id
+
+    return decode_account_id(key)
+
+
+def _unwrap(value: Any) -> Any:
+    """Strip the single-element tuples the SCALE decoder wraps around newtypes."""
+    while isinstance(value, (tuple, list)) and len(value) == 1:
+        value = value[0]
+    return value
+
+
+def decode_commitment(registration: Any) -> Optional[str]:
+    """
+    Decode the first field of a `Commitments.CommitmentOf` registration into a string.
+
+    Handles both the hex-string and the raw-bytes encodings returned by the different
+    substrate interface versions.
+
+    Args:
+        registration: Decoded storage value with "block" and "info" keys.
+
+    Returns:
+        str: The committed string, or None if the registration holds no data.
+    """
+    registration = getattr(registration, "value", registration)
+    if not registration:
+        return None
+    try:
+        fields = _unwrap(registration["info"]["fields"])
+        field = _unwrap(
+            fields[0] if isinstance(fields, (tuple, list)) else fields
+        )
+        data = _unwrap(field[next(iter(field.keys()))])
+    except (KeyError, IndexError, TypeError, StopIteration, AttributeError):
+        return None
+
+    if isinstance(data, str):
+        data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+    elif isinstance(data, (tuple, list)):
+        data = bytes(data)
+    elif not isinstance(data, (bytes, bytearray)):
+        return None
+    return data.decode() or None
+
+
+def decode_commitments(
+    entries: Iterable[Tuple[Any, Any]]
+) -> Dict[str, Commitment]:
+    """
+    Decode `Commitments.CommitmentOf` entries, as returned by a storage-map query.
+
+    Args:
+        entries: (storage key or hotkey, registration) pairs.
+
+    Returns:
+        dict: hotkey -> (commit, commit_block) for every entry holding a commitment.
+    """
+    commitments = {}
+    for key, registration in entries:
+        registration = getattr(registration, "value", registration)
+        commit = decode_commitment(registration)
+        if commit:
+            commitments[_decode_hotkey(key)] = (
+                commit,
+                int(registration["block"]),
+            )
+    return commitments
+
+
+def commitments_by_uid(
+    commitments: Dict[str, Commitment], hotkeys: Iterable[str]
+) -> Dict[int, Commitment]:
+    """Re-key a hotkey -> commitment mapping by UID, using the metagraph's hotkey order."""
+    return {
+        uid: commitments[hotkey]
+        for uid, hotkey in enumerate(hotkeys)
+        if hotkey in commitments
+    }
+
+
+def diff_commitments(
+    previous: Dict[int, Commitment], current: Dict[int, Commitment]
+) -> Set[int]:
+    """Return the UIDs whose commitment is new or differs from the previous snapshot."""
+    return {
+        uid
+        for uid, commitment in current.items()
+        if previous.get(uid) != commitment
+    }
+
+
+# A commitment older than this many blocks (~1 day) is not evaluated, and a UID whose
+# commitment hasn't changed for this long has its score decayed.
+COMMIT_MAX_AGE = 7200
+SCORE_DECAY = 0.8
+
+
+def plan_commit_updates(
+    uids: Iterable[int],
+    commitments: Dict[int, Commitment],
+    changed_uids: Set[int],
+    previous_commits: Dict[int, Tuple[Optional[str], Optional[int]]],
+    scores: Dict[int, float],
+    current_block: int,
+) -> Tuple[List[dict], Dict[int, Tuple[str, int]], Dict[int, float]]:
+    """
+    Decide, for one fetch cycle, which commits to enqueue and which scores to decay.
+
+    Args:
+        uids: UIDs of the subnet.
+        commitments: uid -> (commit, commit_block) from the chain.
+        changed_uids: UIDs whose commitment changed since the previous cycle.
+        previous_commits: uid -> (commit, block) last recorded for each UID.
+        scores: uid -> current score.
+        current_block (int): Block the commitments were read at.
+
+    Returns:
+        tuple: (commit queue items, previous_commits updates, scores updates).
+    """
+    queue_items = []
+    previous_updates = {}
+    score_updates = {}
+    for uid in uids:
+        if uid not in commitments:
+            continue
+        current_commit, commit_block = commitments[uid]
+        previous_commit, previous_block = previous_commits.get(
+            uid, (None, None)
+        )
+
+        if (
+            uid in changed_uids
+            and (current_block - commit_block) < COMMIT_MAX_AGE
+            and current_commit != previous_commit
+        ):
+            queue_items.append(
+                {
+                    "uid": uid,
+                    "current_commit": current_commit,
+                    "commit_block": commit_block,
+                }
+            )
+            previous_updates[uid] = (current_commit, commit_block)
+        # If commit is not changed in one day, giving punishment
+        elif current_block - (previous_block or 0) > COMMIT_MAX_AGE:
+            previous_updates[uid] = (current_commit, current_block)
+            score_updates[uid] = scores.get(uid, 0) * SCORE_DECAY
+    return queue_items, previous_updates, score_updates
@@ -1,13 +1,25 @@
+import asyncio
 import time
 import sys
 import logging
-from typing import Any, cast
 import bittensor as bt
-from bittensor.core.extrinsics.serving import get_metadata
 import redis
 import json
 from collections import defaultdict
 import utils
+from async_chain import AsyncChain, fetch_commitments
+from commitments import (
+    commitments_by_uid,
+    diff_commitments,
+    plan_commit_updates,
+)
+from metagraph_cache import MetagraphCache
+from finest_common.commit_queue import CommitQueue
+from finest_common.score_store import ScoreStore
+from finest_common.heartbeat import Heartbeat
+from finest_common.metrics import REGISTRY, publish_metrics
+from finest_common import state_backend
+from finest_common import tracing
 
 import logging
 from colorama import init, Fore
@@ -50,13 +62,129 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(
     ColoredFormatter("%(asctime)s - %(levelname)s - %(message)s")
 )
-logger.handlers[0] = (
-    console_handler  # Replace the default stream handler with our colored one
-)
+logger.handlers[
+    0
+] = console_handler  # Replace the default stream handler with our colored one
 
 
 # previous_commits = defaultdict(dict)
 
+FETCH_CYCLE_SECONDS = REGISTRY.histogram(
+    "validator_fetch_cycle_seconds",
+    "Duration of a commit fetch cycle, from the commitments query to the queue update",
+)
+FETCH_CYCLE_FAILURES = REGISTRY.counter(
+    "validator_fetch_cycle_failures_total",
+    "Commit fetch cycles that failed, by stage",
+)
+COMMITS_FETCHED = REGISTRY.gauge(
+    "validator_commits_fetched",
+    "Commitments found in the last fetch cycle, by state",
+)
+
+
+def apply_commit_updates(
+    redis_queue: redis.Redis,
+    commit_queue: CommitQueue,
+    uids: list,
+    commitments: dict,
+    changed_uids: set,
+    current_block: int,
+    stakes: dict = None,
+    max_attempts: int = 5,
+    cycle_started_at: float = None,
+):
+    """
+    Reads the commit state, plans the cycle in memory and writes it back atomically.
+
+    Previous commits, scores and the commit queue state are read in one pipelined
+    round trip, and every queue push and hash update is written in a single MULTI/EXEC
+    transaction. The keys read are WATCHed, so a score written or a commit popped by
+    process_commit in between aborts the transaction and the cycle is re-planned on
+    fresh data, keeping the decay atomic.
+
+    Every queued commit starts a trace (see `tracing`) at `cycle_started_at`, whose
+    context travels in its payload.
+
+    Returns:
+        tuple: (commit queue items, previous_commits updates, scores updates,
+            number of coalesced commits).
+    """
+    with redis_queue.pipeline() as transaction:
+        for _ in range(max_attempts):
+            try:
+                transaction.watch(
+                    "previous_commits", "scores", *commit_queue.watch_keys
+                )
+                reads = redis_queue.pipeline(transaction=False)
+                reads.hgetall("previous_commits")
+                reads.hgetall("scores")
+                commit_queue.read_state(reads)
+                (
+                    raw_previous,
+                    raw_scores,
+                    enqueued_at,
+                    last_evaluated,
+                ) = reads.execute()
+
+                previous_commits = {
+                    int(uid): tuple(json.loads(value))
+                    for uid, value in raw_previous.items()
+                }
+                scores = {
+                    int(uid): json.loads(value)
+                    for uid, value in raw_scores.items()
+                }
+                (
+                    queue_items,
+                    previous_updates,
+                    score_updates,
+                ) = plan_commit_updates(
+                    uids,
+                    commitments,
+                    changed_uids,
+                    previous_commits,
+                    scores,
+                    current_block,
+                )
+                for item in queue_items:
+                    item["trace"] = tracing.new_trace(cycle_started_at)
+
+                transaction.multi()
+                coalesced = commit_queue.stage_push(
+                    transaction,
+                    queue_items,
+                    current_block,
+                    enqueued_at,
+                    last_evaluated,
+                    stakes,
+                )
+                if previous_updates:
+                    transaction.hset(
+                        "previous_commits",
+                        mapping={
+                            uid: json.dumps(value)
+                            for uid, value in previous_updates.items()
+                        },
+                    )
+                if score_updates:
+                    transaction.hset(
+                        "scores",
+                        mapping={
+                            uid: json.dumps(value)
+                            for uid, value in score_updates.items()
+                        },
+                    )
+                transaction.execute()
+                return queue_items, previous_updates, score_updates, coalesced
+            except redis.WatchError:
+                logging.warning(
+                    "Commit state changed during the update, retrying."
+                )
+    raise RuntimeError(
+        f"Commit state kept changing, gave up after {max_attempts} attempts"
+    )
+
 
 def fetch_commits(config: bt.config, redis_queue: redis.Redis):
     """
@@ -68,7 +196,14 @@ def fetch_commits(config: bt.config, redis_queue: redis.Redis):
     try:
         wallet = bt.wallet(config=config)
         subtensor = bt.subtensor(config=config)
-        metagraph: bt.metagraph = subtensor.metagraph(config.netuid)
+        metagraph_cache = MetagraphCache(
+            subtensor,
+            config.netuid,
+            redis_queue,
+            ttl=config.metagraph_ttl,
+            full_sync_interval=config.metagraph_full_sync_interval,
+        )
+        metagraph = metagraph_cache.get()
 
         # Ensure the wallet is registered
         try:
@@ -93,73 +228,164 @@ def fetch_commits(config: bt.config, redis_queue: redis.Redis):
 
         logging.info("Initiating the commit fetching process...")
 
-        while True:
+        # Commitment lookups go through the asyncio chain layer, which fails over
+        # between endpoints; its connections live on this dedicated event loop.
+        chain = AsyncChain(
+            [subtensor.chain_endpoint, *config.chain_endpoints],
+            max_concurrency=config.chain_concurrency,
+            call_timeout=config.chain_timeout,
+        )
+        loop = asyncio.new_event_loop()
+        score_store = ScoreStore(config.score_db)
+
+        commit_queue = CommitQueue(
+            redis_queue,
+            age_weight=config.queue_age_weight,
+            stake_weight=config.queue_stake_weight,
+            idle_weight=config.queue_idle_weight,
+            max_boost=config.queue_max_boost,
+        )
+        commit_queue.register_metrics(REGISTRY)
+
+        # A scan cycle, including the wait for its block and a reconnect, must end
+        # within this budget or the supervisor restarts the process.
+        heartbeat = Heartbeat(
+            redis_queue,
+            "fetch_commits",
+            timeout=config.scan_interval * utils.BLOCK_TIME * 2 + 300,
+        )
 
-            logging.info("Fetching commits...")
-            for uid in metagraph.uids:
-                try:
-                    current_commit = subtensor.get_commitment(
-                        netuid=config.netuid, uid=uid
+        previous_snapshot = {}
+        next_scan_block = None
+        reconnect_attempt = 0
+        while True:
+            try:
+                # Scan as soon as the chain reaches the next cadence block. After a
+                # disconnect the next scan is planned from the block we actually
+                # reached, so missed intervals collapse into a single catch-up scan.
+                if next_scan_block is None:
+                    current_block = subtensor.get_current_block()
+                else:
+                    heartbeat.beat(f"waiting for block {next_scan_block}")
+                    current_block = utils.wait_for_block(
+                        subtensor, next_scan_block
                     )
 
-                    if current_commit:
-                        hotkey = metagraph.hotkeys[uid]
-                        metadata = cast(
-                            dict[str, Any],
-                            get_metadata(subtensor, metagraph.netuid, hotkey),
+                # Pick up registrations since the previous scan; cheap within the TTL.
+                metagraph = metagraph_cache.get(current_block)
+                logging.info(f"Fetching commits at block {current_block}...")
+                heartbeat.beat(f"fetching commits at block {current_block}")
+                cycle_start = time.perf_counter()
+                cycle_started_at = time.time()
+                commitments = commitments_by_uid(
+                    loop.run_until_complete(
+                        fetch_commitments(
+                            chain, config.netuid, metagraph.hotkeys
                         )
+                    ),
+                    metagraph.hotkeys,
+                )
+                reconnect_attempt = 0
+            except Exception as e:
+                FETCH_CYCLE_FAILURES.inc(stage="chain")
+                delay = min(5 * 2**reconnect_attempt, 300)
+                reconnect_attempt += 1
+                heartbeat.beat(f"reconnecting to the chain in {delay}s")
+                logging.error(
+                    f"Unable to fetch commitments from the chain, reconnecting in {delay} seconds: {e}",
+                    exc_info=True,
+                )
+                time.sleep(delay)
+                try:
+                    subtensor = bt.subtensor(config=config)
+                    metagraph_cache.subtensor = subtensor
+                except Exception as reconnect_error:
+                    logging.error(
+                        f"Failed to reconnect to subtensor: {reconnect_error}"
+                    )
+                continue
+            changed_uids = diff_commitments(previous_snapshot, commitments)
+            logging.info(
+                f"Fetched {len(commitments)} commitments ({len(changed_uids)} changed) in {time.perf_counter() - cycle_start:.2f}s"
+            )
 
-                        commit_block = metadata["block"]
-                        current_block = subtensor.get_current_block()
-
-                        previous_commit_data = redis_queue.hget("previous_commits", int(uid))
-                        previous_commit = json.loads(previous_commit_data) if previous_commit_data else (None, None)
-
-                        if (current_block - commit_block) < 7200 and current_commit != previous_commit[0]:
-                            data = {
-                                "uid": int(uid),
-                                "current_commit": current_commit,
-                                "commit_block": commit_block,
-                            }
-                            redis_queue.rpush("commit_queue", json.dumps(data))
-                            logging.info(f"Pushed commit data to Redis: {data}")
-                            redis_queue.hset("previous_commits", int(uid), json.dumps((current_commit, commit_block)))
-                        # If commit is not changed in one day, giving punishment
-                        elif (
-                            subtensor.get_current_block()
-                            - (
-                                previous_commit[1]
-                                if previous_commit[1] is not None
-                                else 0
-                            )
-                        ) > 7200:
-                            logging.warning(
-                                f"Commit for UID {uid} has not changed in over a day, updating score."
-                            )
-                            redis_queue.hset("previous_commits", int(uid), json.dumps((current_commit, subtensor.get_current_block())))
-
-                            raw_score = redis_queue.hget("scores", int(uid))
-                            current_score = json.loads(raw_score) if raw_score else 0
-                            updated_score = current_score * 0.8
-                            redis_queue.hset(
-                                "scores", int(uid), json.dumps(updated_score)
-                            )
-                        else:
-                            logging.warning(
-                                f"Commit for UID {uid} is unchanged for a day, skipping."
-                            )
-                    else:
-                        logging.warning(f"No commit for UID {uid} ")
-                        continue
+            uids = [int(uid) for uid in metagraph.uids]
+            max_stake = float(max(metagraph.S, default=0.0))
+            stakes = {
+                uid: float(metagraph.S[uid]) / max_stake
+                if max_stake > 0
+                else 0.0
+                for uid in uids
+            }
+            try:
+                (
+                    queue_items,
+                    previous_updates,
+                    score_updates,
+                    coalesced,
+                ) = apply_commit_updates(
+                    redis_queue,
+                    commit_queue,
+                    uids,
+                    commitments,
+                    changed_uids,
+                    current_block,
+                    stakes,
+                    cycle_started_at=cycle_started_at,
+                )
+            except Exception as e:
+                FETCH_CYCLE_FAILURES.inc(stage="update")
+                # The snapshot is kept, so every UID is re-evaluated next cycle.
+                logging.error(
+                    f"Encountered an error while updating commit state: {e}. Retrying next cycle.",
+                    exc_info=True,
+                )
+            else:
+                for data in queue_items:
+                    logging.info(f"Pushed commit data to Redis: {data}")
+                tracing.export(
+                    *(
+                        tracing.child(
+                            "fetch_commits.enqueue",
+                            data["trace"],
+                            data["trace"]["started_at"],
+                            uid=int(data["uid"]),
+                            commit=data["current_commit"],
+                            commit_block=int(data["commit_block"]),
+                            block=int(current_block),
+                        ).finish(data["trace"]["enqueued_at"])
+                        for data in queue_items
+                    )
+                )
+                try:
+                    score_store.record(score_updates, source="decay")
                 except Exception as e:
                     logging.error(
-                        f"Encountered an error while fetching commit for UID {uid}: {e}. Skipping this UID.",
-                        exc_info=True,
+                        f"Failed to record decayed scores locally: {e}"
                     )
-
-            # Sleep for the interval defined in config
-            logging.info("Pausing for 5 minutes before the next commit fetch cycle.")
-            time.sleep(5 * 1)
+                for uid in score_updates:
+                    logging.warning(
+                        f"Commit for UID {uid} has not changed in over a day, updating score."
+                    )
+                logging.info(
+                    f"{len(uids) - len(commitments)} UIDs without commit, "
+                    f"{len(commitments) - len(previous_updates)} unchanged commits skipped."
+                )
+                queue_stats = commit_queue.stats()
+                logging.info(
+                    f"Commit queue depth: {queue_stats['depth']}, "
+                    f"{coalesced} pending commits replaced this cycle "
+                    f"({queue_stats['coalesced']} coalesced in total)."
+                )
+                previous_snapshot = commitments
+                FETCH_CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
+                COMMITS_FETCHED.set(len(commitments), state="committed")
+                COMMITS_FETCHED.set(len(changed_uids), state="changed")
+
+            next_scan_block = current_block + config.scan_interval
+            logging.info(
+                f"Next commit fetch cycle at block {next_scan_block} (in {config.scan_interval} blocks)."
+            )
 
     except Exception as e:
         logging.error(
@@ -171,25 +397,27 @@ def fetch_commits(config: bt.config, redis_queue: redis.Redis):
 
 
 def main():
-
     try:
+        config = utils.get_config()
         try:
-            redis_queue = redis.Redis(host="localhost", port=6379, db=0)
+            redis_queue = state_backend.connect(config.backend)
 
             if redis_queue.ping():
-                logging.info("🟢 Successfully connected to Redis.")
+                logging.info(f"🟢 Successfully connected to {config.backend}.")
             else:
-                logging.error("🔴 Failed to connect to Redis.")
+                logging.error(f"🔴 Failed to connect to {config.backend}.")
                 return
         except redis.ConnectionError as e:
             logging.error(f"🔴 Redis connection error: {e}")
             return
         except Exception as e:
-            logging.error(f"🔴 An unexpected error occurred while connecting to Redis: {e}")
+            logging.error(
+                f"🔴 An unexpected error occurred while connecting to {config.backend}: {e}"
+            )
             return
-        print(redis_queue)
-        config = utils.get_config()
         logging.info(config)
+        publish_metrics(redis_queue, "fetch_commits", config.metrics_interval)
+        tracing.configure(config.trace_file, "fetch_commits")
         fetch_commits(config, redis_queue)
 
     except KeyboardInterrupt:
@@ -197,5 +425,4 @@ def main():
 
 
 if __name__ == "__main__":
-
     main()
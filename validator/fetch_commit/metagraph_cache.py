@@ -0,0 +1,229 @@
+import json
+import logging
+from typing import List, Optional
+
+import bittensor as bt
+import numpy as np
+import redis
+
+from commitments import _decode_hotkey, _unwrap
+from finest_common.metrics import REGISTRY
+
+SNAPSHOT_KEY = "metagraph_snapshot"
+LOCK_KEY = "metagraph_snapshot_lock"
+
+CHAIN_RPC_SECONDS = REGISTRY.histogram(
+    "validator_chain_rpc_seconds", "Latency of the chain RPC calls, by method"
+)
+
+
+class MetagraphSnapshot:
+    """
+    The subset of a metagraph the validator components use, cheap to serialize.
+
+    Exposes the same attribute names as `bt.metagraph` (netuid, n, uids, hotkeys, S),
+    so it can be passed wherever the validator code expects a metagraph.
+    """
+
+    def __init__(
+        self,
+        netuid: int,
+        block: int,
+        hotkeys: List[str],
+        stake: List[float],
+        full_sync_block: Optional[int] = None,
+    ):
+        self.netuid = netuid
+        self.block = block
+        self.hotkeys = list(hotkeys)
+        self.S = np.asarray(stake, dtype=np.float32)
+        self.n = len(self.hotkeys)
+        self.uids = np.arange(self.n)
+        self.full_sync_block = (
+            block if full_sync_block is None else full_sync_block
+        )
+
+    @classmethod
+    def from_metagraph(
+        cls, metagraph: bt.metagraph, block: int
+    ) -> "MetagraphSnapshot":
+        return cls(
+            netuid=metagraph.netuid,
+            block=block,
+            hotkeys=list(metagraph.hotkeys),
+            stake=[float(s) for s in metagraph.S],
+        )
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "netuid": self.netuid,
+                "block": self.block,
+                "full_sync_block": self.full_sync_block,
+                "hotkeys": self.hotkeys,
+                "stake": self.S.tolist(),
+            }
+        )
+
+    @classmethod
+    def from_json(cls, data) -> "MetagraphSnapshot":
+        data = json.loads(data)
+        return cls(
+            netuid=data["netuid"],
+            block=data["block"],
+            hotkeys=data["hotkeys"],
+            stake=data["stake"],
+            full_sync_block=data["full_sync_block"],
+        )
+
+
+class MetagraphCache:
+    """
+    Block-TTL metagraph cache shared between validator processes through Redis.
+
+    A snapshot younger than `ttl` blocks is served from memory or from the Redis
+    snapshot another process published. Older snapshots get a lite refresh: one
+    `SubtensorModule.Keys` storage-map query for the UID -> hotkey mapping. A full
+    metagraph sync is only done when registrations changed or the stake is older
+    than `full_sync_interval` blocks.
+
+    Args:
+        subtensor (bt.subtensor): Connected subtensor.
+        netuid (int): Subnet UID.
+        redis_queue (redis.Redis): Redis connection used to share snapshots.
+        ttl (int): Blocks a snapshot stays fresh.
+        full_sync_interval (int): Maximum age of the stake values, in blocks.
+    """
+
+    def __init__(
+        self,
+        subtensor: bt.subtensor,
+        netuid: int,
+        redis_queue: Optional[redis.Redis] = None,
+        ttl: int = 25,
+        full_sync_interval: int = 360,
+    ):
+        self.subtensor = subtensor
+        self.netuid = netuid
+        self.redis_queue = redis_queue
+        self.ttl = ttl
+        self.full_sync_interval = full_sync_interval
+        self.snapshot: Optional[MetagraphSnapshot] = None
+
+    def _is_fresh(
+        self, snapshot: Optional[MetagraphSnapshot], block: int
+    ) -> bool:
+        return (
+            snapshot is not None
+            and snapshot.netuid == self.netuid
+            and block - snapshot.block < self.ttl
+        )
+
+    def _load_shared(self) -> Optional[MetagraphSnapshot]:
+        if self.redis_queue is None:
+            return None
+        try:
+            data = self.redis_queue.get(SNAPSHOT_KEY)
+            return MetagraphSnapshot.from_json(data) if data else None
+        except Exception as e:
+            logging.warning(
+                f"Failed to read the shared metagraph snapshot: {e}"
+            )
+            return None
+
+    def _publish(self, snapshot: MetagraphSnapshot):
+        if self.redis_queue is None:
+            return
+        try:
+            self.redis_queue.set(SNAPSHOT_KEY, snapshot.to_json())
+        except Exception as e:
+            logging.warning(f"Failed to publish the metagraph snapshot: {e}")
+
+    def _acquire_refresh_lock(self) -> bool:
+        if self.redis_queue is None:
+            return True
+        try:
+            return bool(self.redis_queue.set(LOCK_KEY, 1, nx=True, ex=60))
+        except Exception:
+            return True
+
+    def _release_refresh_lock(self):
+        if self.redis_queue is not None:
+            try:
+                self.redis_queue.delete(LOCK_KEY)
+            except Exception:
+                pass
+
+    def _query_hotkeys(self) -> List[str]:
+        """UID -> hotkey mapping from a single `SubtensorModule.Keys` storage-map query."""
+        with CHAIN_RPC_SECONDS.time(method="substrate.query_map"):
+            result = self.subtensor.substrate.query_map(
+                module="SubtensorModule",
+                storage_function="Keys",
+                params=[self.netuid],
+            )
+        keys = {}
+        for uid, hotkey in result:
+            uid = int(getattr(_unwrap(uid), "value", _unwrap(uid)))
+            keys[uid] = _decode_hotkey(getattr(hotkey, "value", hotkey))
+        return [keys[uid] for uid in range(len(keys))]
+
+    def _full_sync(self, block: int) -> MetagraphSnapshot:
+        logging.info(
+            f"Syncing metagraph for subnet {self.netuid} at block {block}"
+        )
+        with CHAIN_RPC_SECONDS.time(method="metagraph"):
+            metagraph = self.subtensor.metagraph(self.netuid, lite=True)
+        return MetagraphSnapshot.from_metagraph(metagraph, block)
+
+    def refresh(self, block: int) -> MetagraphSnapshot:
+        """Refresh the snapshot from the chain, as cheaply as the cached state allows."""
+        previous = self.snapshot
+        if (
+            previous is None
+            or block - previous.full_sync_block >= self.full_sync_interval
+        ):
+            return self._full_sync(block)
+
+        hotkeys = self._query_hotkeys()
+        if hotkeys != previous.hotkeys:
+            logging.info("Registrations changed, re-syncing metagraph")
+            return self._full_sync(block)
+
+        return MetagraphSnapshot(
+            netuid=self.netuid,
+            block=block,
+            hotkeys=hotkeys,
+            stake=previous.S,
+            full_sync_block=previous.full_sync_block,
+        )
+
+    def get(self, block: Optional[int] = None) -> MetagraphSnapshot:
+        """
+        Return a metagraph snapshot no older than `ttl` blocks.
+
+        Args:
+            block (int): Current block, if the caller already knows it.
+        """
+        if block is None:
+            block = self.subtensor.get_current_block()
+        if self._is_fresh(self.snapshot, block):
+            return self.snapshot
+
+        shared = self._load_shared()
+        if shared is not None and shared.netuid == self.netuid:
+            if self.snapshot is None or shared.block > self.snapshot.block:
+                self.snapshot = shared
+            if self._is_fresh(self.snapshot, block):
+                return self.snapshot
+
+        # Another process is refreshing; a slightly stale snapshot is good enough.
+        if self.snapshot is not None and not self._acquire_refresh_lock():
+            return self.snapshot
+
+        try:
+            self.snapshot = self.refresh(block)
+            self._publish(self.snapshot)
+        finally:
+            self._release_refresh_lock()
+        return self.snapshot
@@ -1,12 +1,24 @@
-import os
 import time
 import logging
+import math
 import bittensor as bt
 import redis
 import sys
 import json
 import utils
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from finest_common.api_client import (
+    LatencyHistogram,
+    TaskApiClient,
+    get_client,
+)
+from metagraph_cache import MetagraphCache
+from finest_common.heartbeat import Heartbeat
+from finest_common.metrics import REGISTRY, latency_family, publish_metrics
+from finest_common import state_backend
+from finest_common import tracing
 
 # Set up logging
 logging.basicConfig(
@@ -20,105 +32,418 @@ logging.basicConfig(
     ],
 )
 
+# Upper bounds (in seconds) of the queue-to-acknowledgement histogram buckets.
+QUEUE_TO_ACK_BUCKETS = (
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+    3600.0,
+    math.inf,
+)
 
-def report_score(config: bt.config, redis_queue: redis.Redis):
+# Statuses of the batch endpoint meaning the API doesn't support batched reports.
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+REPORTS_TOTAL = REGISTRY.counter(
+    "validator_reports_total", "Score reports sent, by result"
+)
+QUEUE_TO_ACK_SECONDS = REGISTRY.histogram(
+    "validator_report_queue_to_ack_seconds",
+    "Time from a score being queued to its acknowledgement by the API",
+    buckets=QUEUE_TO_ACK_BUCKETS,
+)
+REPORT_QUEUE_DEPTH = REGISTRY.gauge(
+    "validator_report_queue_depth", "Scores waiting to be reported"
+)
+
+
+class ScoreReporter:
     """
-    Async task to fetch commits and put them into the commit queue.
+    Long-lived reporter draining the `report_score` queue.
+
+    The wallet, chain connection and hotkey are created once, and registration is
+    only re-checked every `registration_check_interval` seconds. Reports are popped
+    in batches and submitted either in one request to the batch endpoint or
+    concurrently over the client's pooled connections.
 
     Args:
         config (bt.config): Configuration object.
+        redis_queue (redis.Redis): Redis connection.
+        api_client (TaskApiClient): Task API client.
+        batch_size (int): Maximum number of reports submitted together.
+        concurrency (int): Parallel requests when reports are sent one by one.
+        batch_endpoint (bool): Whether to try the batch endpoint first.
+        registration_check_interval (float): Seconds between registration checks.
+        stats_interval (float): Seconds between two throughput log lines.
     """
-    logging.info("Starting report_score")
-    while True:
-        try:
-            result = redis_queue.blpop("report_score", timeout=1)
-            if result:
-                report_data = json.loads(result[1].decode())
-                task_id = report_data["task_id"]
-                score = report_data["score"]
-                wallet = bt.wallet(config=config)
-                subtensor = bt.subtensor(config=config)
-                metagraph: bt.metagraph = subtensor.metagraph(config.netuid)
-                hotkey, _ = utils.assert_registered(wallet, metagraph)
-                signature = utils.generate_signature(wallet, f"{task_id}")
-
-                logging.info(f"Report score for task_id {task_id}: {score}")
-
-                max_retries = 10
-                retry_count = 0
-
-                while retry_count < max_retries:
-                    try:
-                        response = requests.post(
-                            f"{os.getenv('API_URL')}/subnets/report-score/",
-                            json={
-                                "hotkey": hotkey,
-                                "task_id": task_id,
-                                "score": score,
-                                "signature": signature,
-                            },
-                        )
-                        response.raise_for_status()
-
-                        if response.status_code == 200:
-                            logging.info(
-                                f"Report submitted successfully for task_id: {task_id}"
-                            )
-                            break
-                        else:
-                            logging.error(
-                                f"Can't report score now, try again in 10 seconds: {response.status_code}",
-                                exc_info=True,
-                            )
-                            time.sleep(10)
-                    except requests.HTTPError as http_err:
-                        if http_err.response.status_code == 404:
-                            logging.error(
-                                f"{response.json().get('message', 'Unknown error')}",
-                                exc_info=True,
-                            )
-                            time.sleep(10)
-                        else:
-                            logging.error(
-                                f"Can't report score now, try again in 10 seconds: {http_err}",
-                                exc_info=True,
-                            )
-                            time.sleep(10)
-                    retry_count += 1
-                else:
-                    logging.error(
-                        "Max retries reached. Failed to submit report. Going to next task"
-                    )
-        except Exception as e:
+
+    def __init__(
+        self,
+        config: bt.config,
+        redis_queue: redis.Redis,
+        api_client: TaskApiClient,
+        batch_size: int = 32,
+        concurrency: int = 8,
+        batch_endpoint: bool = False,
+        registration_check_interval: float = 600.0,
+        stats_interval: float = 60.0,
+    ):
+        self.config = config
+        self.redis_queue = redis_queue
+        self.api_client = api_client
+        self.batch_size = max(1, batch_size)
+        self.batch_endpoint = batch_endpoint
+        self.registration_check_interval = registration_check_interval
+        self.stats_interval = stats_interval
+        self.executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+        self.wallet = bt.wallet(config=config)
+        self.hotkey = self.wallet.hotkey.ss58_address
+        self.subtensor = bt.subtensor(config=config)
+        # Registration is checked against the snapshot the other processes keep
+        # fresh, instead of a full metagraph sync.
+        self.metagraph_cache = MetagraphCache(
+            self.subtensor,
+            config.netuid,
+            redis_queue,
+            ttl=config.metagraph_ttl,
+            full_sync_interval=config.metagraph_full_sync_interval,
+        )
+        self.registration_checked_at = None
+        self.heartbeat = Heartbeat(redis_queue, "report_score")
+
+        self.queue_to_ack = LatencyHistogram(QUEUE_TO_ACK_BUCKETS)
+        self.acked = 0
+        self.failed = 0
+        self.stats_started_at = time.monotonic()
+        self.stats_acked = 0
+        self.submit_started_at = time.time()
+        # Reports of the batch being submitted that have no outcome yet, by id().
+        self.pending = {}
+        REGISTRY.add_collector(self.collect_metrics)
+
+    def collect_metrics(self):
+        REPORT_QUEUE_DEPTH.set(self.redis_queue.llen("report_score"))
+        return [
+            latency_family(
+                "validator_api_request_seconds",
+                "Latency of the task API requests, by endpoint",
+                "path",
+                self.api_client.latencies,
+            )
+        ]
+
+    def ensure_registered(self):
+        """Re-checks registration if the last check is older than the interval.
+
+        Raises:
+            ValueError: If the hotkey is not registered.
+        """
+        now = time.monotonic()
+        if (
+            self.registration_checked_at is not None
+            and now - self.registration_checked_at
+            < self.registration_check_interval
+        ):
+            return
+        utils.assert_registered(self.wallet, self.metagraph_cache.get())
+        self.registration_checked_at = now
+
+    def next_batch(self, timeout: int = 1) -> List[dict]:
+        """Waits up to `timeout` seconds for a report and pops up to a batch of them."""
+        result = self.redis_queue.blpop("report_score", timeout=timeout)
+        if not result:
+            return []
+        raw_reports = [result[1]]
+        if self.batch_size > 1:
+            with self.redis_queue.pipeline() as transaction:
+                transaction.lrange("report_score", 0, self.batch_size - 2)
+                transaction.ltrim("report_score", self.batch_size - 1, -1)
+                raw_reports += transaction.execute()[0]
+        reports = []
+        for raw in raw_reports:
+            try:
+                reports.append(json.loads(raw))
+            except ValueError:
+                logging.error(f"Dropping malformed report {raw!r}")
+        return reports
+
+    def requeue(self, reports: List[dict]):
+        """Puts reports back at the head of the queue, in their order."""
+        if reports:
+            self.redis_queue.lpush(
+                "report_score",
+                *(json.dumps(report) for report in reversed(reports)),
+            )
+
+    def sign(self, report: dict) -> dict:
+        return {
+            "task_id": report["task_id"],
+            "score": report["score"],
+            "signature": utils.generate_signature(
+                self.wallet, f"{report['task_id']}"
+            ),
+        }
+
+    def _trace(self, report: dict, status: int, message: str):
+        """Records the report's spans and closes the trace of its commit."""
+        trace = report.get("trace")
+        if not trace:
+            return
+        error = None if status == 200 else message or f"status {status}"
+        queued_at = report.get("queued_at")
+        if queued_at is not None:
+            tracing.record(
+                "report_score.queue_wait",
+                trace,
+                queued_at,
+                self.submit_started_at,
+            )
+        tracing.record(
+            "report_score.submit",
+            trace,
+            self.submit_started_at,
+            error=error,
+            task_id=str(report["task_id"]),
+            status=status if status is not None else 0,
+        )
+        tracing.finish_trace(
+            trace,
+            error=error,
+            task_id=str(report["task_id"]),
+            score=report["score"],
+        )
+
+    def _acknowledge(self, report: dict, status: int, message: str = ""):
+        task_id = report["task_id"]
+        self.pending.pop(id(report), None)
+        self._trace(report, status, message)
+        if status == 200:
+            self.acked += 1
+            REPORTS_TOTAL.inc(result="acknowledged")
+            logging.info(
+                f"Report submitted successfully for task_id: {task_id}"
+            )
+            queued_at = report.get("queued_at")
+            if queued_at is not None:
+                waited = max(time.time() - queued_at, 0.0)
+                self.queue_to_ack.observe(waited)
+                QUEUE_TO_ACK_SECONDS.observe(waited)
+            return
+        self.failed += 1
+        REPORTS_TOTAL.inc(result="failed")
+        if status is None:
+            logging.error(message)
+        elif status == 404:
+            logging.error(message or f"Task {task_id} not found")
+        else:
             logging.error(
-                f"Can't report score now, try again in 10 seconds: {e}", exc_info=True
+                f"Failed to submit report for task_id {task_id}: {status}. Going to next task"
             )
-            time.sleep(10)
+
+    def _submit_one(self, report: dict, signed: dict):
+        """Sends one report; returns (status, message), status None if no answer."""
+        try:
+            response = self.api_client.report_score(
+                self.hotkey,
+                signed["task_id"],
+                signed["score"],
+                signed["signature"],
+                max_retries=10,
+            )
+        except requests.RequestException as e:
+            return (
+                None,
+                f"Failed to submit report for task_id {report['task_id']}: {e}. Going to next task",
+            )
+        message = ""
+        if response.status_code == 404:
+            try:
+                message = response.json().get("message", "Unknown error")
+            except ValueError:
+                message = response.text or "Unknown error"
+        return response.status_code, message
+
+    def _submit_batch(
+        self, reports: List[dict], signed: List[dict]
+    ) -> List[int]:
+        """
+        Submits through the batch endpoint.
+
+        Returns:
+            list: Indexes of the reports the batch didn't acknowledge or reject, to send
+            one by one; all of them if the batch failed or isn't supported.
+        """
+        everything = list(range(len(reports)))
+        try:
+            response = self.api_client.report_scores(
+                self.hotkey, signed, max_retries=10
+            )
+        except requests.RequestException as e:
+            logging.warning(
+                f"Batched report failed ({e}), sending reports one by one"
+            )
+            return everything
+        if response.status_code in BATCH_UNSUPPORTED_STATUSES:
+            logging.warning(
+                f"Batched reports are not supported by the API ({response.status_code}), "
+                "sending reports one by one from now on"
+            )
+            self.batch_endpoint = False
+            return everything
+        if response.status_code != 200:
+            logging.warning(
+                f"Batched report returned {response.status_code}, sending reports one by one"
+            )
+            return everything
+        try:
+            results = response.json().get("results") or []
+            statuses = {str(result["task_id"]): result for result in results}
+        except (ValueError, AttributeError, KeyError, TypeError):
+            logging.warning(
+                "Unreadable answer to a batched report, sending reports one by one"
+            )
+            return everything
+
+        missing = []
+        for index, report in enumerate(reports):
+            result = statuses.get(str(report["task_id"]))
+            if result is None or "status" not in result:
+                # Not acknowledged, the report is sent again on its own.
+                missing.append(index)
+                continue
+            self._acknowledge(
+                report, int(result["status"]), result.get("message", "")
+            )
+        if missing:
+            logging.warning(
+                f"Batched report left {len(missing)} report(s) unanswered, sending them one by one"
+            )
+        return missing
+
+    def submit(self, reports: List[dict]):
+        """
+        Submits reports, acknowledging each one (accepted or rejected).
+
+        Reports without an outcome when an exception is raised are left in `pending`.
+        """
+        self.submit_started_at = time.time()
+        self.pending = {id(report): report for report in reports}
+        signed = [self.sign(report) for report in reports]
+        remaining = list(range(len(reports)))
+        if len(reports) > 1 and self.batch_endpoint:
+            remaining = self._submit_batch(reports, signed)
+        remaining_reports = [reports[index] for index in remaining]
+        for report, (status, message) in zip(
+            remaining_reports,
+            self.executor.map(
+                self._submit_one,
+                remaining_reports,
+                [signed[index] for index in remaining],
+            ),
+        ):
+            self._acknowledge(report, status, message)
+
+    def log_stats(self, force: bool = False):
+        elapsed = time.monotonic() - self.stats_started_at
+        if not force and elapsed < self.stats_interval:
+            return
+        rate = (self.acked - self.stats_acked) / elapsed if elapsed else 0.0
+        logging.info(
+            f"Reported {rate:.2f} scores/s ({self.acked} acknowledged, {self.failed} failed in total), "
+            f"queue-to-ack p50 {self.queue_to_ack.quantile(0.5)}s, p95 {self.queue_to_ack.quantile(0.95)}s"
+        )
+        self.stats_started_at = time.monotonic()
+        self.stats_acked = self.acked
+
+    def run(self):
+        logging.info("Starting report_score")
+        while True:
+            try:
+                self.log_stats()
+                self.heartbeat.beat("waiting for scores")
+                reports = self.next_batch()
+                if not reports:
+                    continue
+                try:
+                    self.ensure_registered()
+                except Exception:
+                    # Keep the reports for when the hotkey is registered again.
+                    self.requeue(reports)
+                    raise
+                logging.info(f"Reporting {len(reports)} score(s)")
+                self.heartbeat.beat(f"reporting {len(reports)} score(s)")
+                try:
+                    self.submit(reports)
+                except Exception:
+                    # Reports without an outcome go back to the queue, in order.
+                    self.requeue(
+                        [
+                            report
+                            for report in reports
+                            if id(report) in self.pending
+                        ]
+                    )
+                    self.pending = {}
+                    raise
+            except Exception as e:
+                logging.error(
+                    f"Can't report score now, try again in 10 seconds: {e}",
+                    exc_info=True,
+                )
+                time.sleep(10)
+
+
+def report_score(config: bt.config, redis_queue: redis.Redis):
+    """
+    Reports the scores pushed by process_commit to the task API.
+
+    Args:
+        config (bt.config): Configuration object.
+    """
+    ScoreReporter(
+        config,
+        redis_queue,
+        get_client(),
+        batch_size=config.report_batch_size,
+        concurrency=config.report_concurrency,
+        batch_endpoint=config.batch_reports,
+        registration_check_interval=config.registration_check_interval,
+    ).run()
 
 
 def main():
     try:
+        config = utils.get_config()
         try:
-            redis_queue = redis.Redis(host="localhost", port=6379, db=0)
+            redis_queue = state_backend.connect(config.backend)
 
             if redis_queue.ping():
-                logging.info("🟢 Successfully connected to Redis.")
+                logging.info(f"🟢 Successfully connected to {config.backend}.")
             else:
-                logging.error("🔴 Failed to connect to Redis.")
+                logging.error(f"🔴 Failed to connect to {config.backend}.")
                 return
-            
+
         except redis.ConnectionError as e:
             logging.error(f"🔴 Redis connection error: {e}")
             return
         except Exception as e:
-            logging.error(f"🔴 An unexpected error occurred while connecting to Redis: {e}")
+            logging.error(
+                f"🔴 An unexpected error occurred while connecting to {config.backend}: {e}"
+            )
             return
-        config = utils.get_config()
+        publish_metrics(redis_queue, "report_score", config.metrics_interval)
+        tracing.configure(config.trace_file, "report_score")
         report_score(config, redis_queue)
     except KeyboardInterrupt:
         print("🔴 Report-score Process interrupted by user")
 
 
 if __name__ == "__main__":
-
     main()
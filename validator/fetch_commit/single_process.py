@@ -0,0 +1,78 @@
+"""Runs fetch_commits, weight_setter and report_score in one process.
+
+The three components share this environment, so on a single host they can run as
+threads over one connection to the state backend instead of three processes. If any
+of them stops, the process exits, and the supervisor restarts all of them.
+
+Usage:
+    .venv/bin/python single_process.py --backend sqlite:///path/state.db [component args]
+"""
+
+import logging
+import queue
+import sys
+import threading
+
+import bittensor as bt
+import redis
+from dotenv import load_dotenv
+
+from finest_common import state_backend
+from finest_common import tracing
+import utils
+from finest_common.metrics import publish_metrics
+from main import fetch_commits
+from report_score import report_score
+from weight_setter import run_weight_setter
+
+
+def run(name: str, target, stopped: queue.Queue):
+    try:
+        target()
+    except BaseException as e:
+        logging.error(f"🔴 {name} failed: {e!r}", exc_info=True)
+    finally:
+        stopped.put(name)
+
+
+def main():
+    load_dotenv()
+    config = utils.get_config()
+    try:
+        redis_queue = state_backend.connect(config.backend)
+        if not redis_queue.ping():
+            logging.error(f"🔴 Failed to connect to {config.backend}.")
+            sys.exit(1)
+    except redis.ConnectionError as e:
+        logging.error(f"🔴 Redis connection error: {e}")
+        sys.exit(1)
+    logging.info(f"🟢 Successfully connected to {config.backend}.")
+    publish_metrics(redis_queue, "single_process", config.metrics_interval)
+    tracing.configure(config.trace_file, "single_process")
+
+    components = {
+        "fetch_commits": lambda: fetch_commits(config, redis_queue),
+        "weight_setter": lambda: run_weight_setter(
+            config, bt.subtensor(config=config), redis_queue
+        ),
+        "report_score": lambda: report_score(config, redis_queue),
+    }
+    stopped = queue.Queue()
+    for name, target in components.items():
+        threading.Thread(
+            target=run, args=(name, target, stopped), name=name, daemon=True
+        ).start()
+
+    try:
+        name = stopped.get()
+    except KeyboardInterrupt:
+        print("🔴 Single-process validator interrupted by user.")
+        return
+    logging.error(
+        f"🔴 {name} stopped, exiting so every component is restarted."
+    )
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
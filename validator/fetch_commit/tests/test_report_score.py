@@ -0,0 +1,240 @@
+import importlib
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from finest_common import state_backend
+
+
+class Stop(BaseException):
+    """Ends ScoreReporter.run, which catches every Exception."""
+
+
+class FakeKeypair:
+    ss58_address = "5FakeHotkey"
+
+    def sign(self, data):
+        return data.encode()
+
+
+class FakeWallet:
+    # pylint: disable=unused-argument
+
+    def __init__(self, config=None):
+        self.hotkey = FakeKeypair()
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = ""
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("no JSON body")
+        return self.body
+
+
+class FakeApi:
+    """
+    Answers each report with `statuses[task_id]`: a status code, or an exception
+    to raise. The batch endpoint answers `batch`, or raises it.
+    """
+
+    # pylint: disable=unused-argument
+
+    def __init__(self, statuses=None, batch=None):
+        self.statuses = statuses or {}
+        self.batch = batch
+        self.latencies = {}
+        self.reported = []
+        self.batches = []
+
+    def report_score(self, hotkey, task_id, score, signature, **kwargs):
+        self.reported.append(task_id)
+        status = self.statuses.get(task_id, 200)
+        if isinstance(status, BaseException):
+            raise status
+        if status == 404:
+            return FakeResponse(404, {"message": f"Task {task_id} is gone"})
+        return FakeResponse(status)
+
+    def report_scores(self, hotkey, signed, **kwargs):
+        self.batches.append([report["task_id"] for report in signed])
+        if isinstance(self.batch, BaseException):
+            raise self.batch
+        return self.batch
+
+
+@pytest.fixture(name="report_score", scope="module")
+def fixture_report_score(tmp_path_factory):
+    # The module opens report_score.log in the working directory on import.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("logs"))
+        return importlib.import_module("report_score")
+
+
+@pytest.fixture(name="queue")
+def fixture_queue():
+    return state_backend.connect(f"memory://{uuid.uuid4().hex}")
+
+
+@pytest.fixture(name="reporter")
+def fixture_reporter(report_score, queue, monkeypatch):
+    monkeypatch.setattr(report_score.bt, "wallet", FakeWallet)
+    monkeypatch.setattr(report_score.bt, "subtensor", lambda config: None)
+    config = SimpleNamespace(
+        netuid=1, metagraph_ttl=25, metagraph_full_sync_interval=360
+    )
+
+    def make(api, **kwargs):
+        return report_score.ScoreReporter(config, queue, api, **kwargs)
+
+    return make
+
+
+def reports(*task_ids):
+    return [
+        {"task_id": task_id, "score": 0.5, "queued_at": time.time()}
+        for task_id in task_ids
+    ]
+
+
+def queued(queue):
+    return [
+        json.loads(raw)["task_id"]
+        for raw in queue.lrange("report_score", 0, -1)
+    ]
+
+
+def test_next_batch(reporter, queue):
+    scores = reporter(FakeApi(), batch_size=4)
+    first, second, *rest = reports(1, 2, 3, 4, 5)
+    queue.rpush("report_score", json.dumps(first), json.dumps(second))
+    queue.rpush("report_score", "not json")
+    queue.rpush("report_score", *(json.dumps(report) for report in rest))
+
+    # The malformed report is dropped.
+    assert [report["task_id"] for report in scores.next_batch()] == [1, 2, 3]
+    assert [report["task_id"] for report in scores.next_batch()] == [4, 5]
+    assert queue.llen("report_score") == 0
+
+
+def test_requeue_keeps_the_order(reporter, queue):
+    scores = reporter(FakeApi())
+    queue.rpush("report_score", json.dumps(reports(4)[0]))
+    scores.requeue(reports(1, 2, 3))
+    assert queued(queue) == [1, 2, 3, 4]
+
+
+def test_submit_one_by_one(reporter):
+    api = FakeApi(
+        {2: 404, 3: 500, 4: requests.ConnectionError("refused")},
+    )
+    scores = reporter(api, concurrency=2)
+    scores.submit(reports(1, 2, 3, 4))
+    assert sorted(api.reported) == [1, 2, 3, 4]
+    assert (scores.acked, scores.failed) == (1, 3)
+    assert scores.pending == {}
+    assert scores.queue_to_ack.count == 1
+
+
+def test_batch_sends_unanswered_reports_one_by_one(reporter):
+    api = FakeApi(
+        batch=FakeResponse(
+            200,
+            {
+                "results": [
+                    {"task_id": 1, "status": 200},
+                    {"task_id": "2", "status": 404, "message": "gone"},
+                    {"task_id": 3},
+                ]
+            },
+        )
+    )
+    scores = reporter(api, batch_endpoint=True)
+    scores.submit(reports(1, 2, 3, 4))
+    assert api.batches == [[1, 2, 3, 4]]
+    assert sorted(api.reported) == [3, 4]
+    assert (scores.acked, scores.failed) == (3, 1)
+    assert scores.batch_endpoint
+
+
+@pytest.mark.parametrize(
+    "batch",
+    [
+        FakeResponse(500),
+        FakeResponse(200),
+        FakeResponse(200, {"results": [{"status": 200}]}),
+        requests.ConnectionError("refused"),
+    ],
+)
+def test_failed_batch_sends_every_report_one_by_one(reporter, batch):
+    api = FakeApi(batch=batch)
+    scores = reporter(api, batch_endpoint=True)
+    scores.submit(reports(1, 2))
+    assert sorted(api.reported) == [1, 2]
+    assert scores.acked == 2
+    assert scores.batch_endpoint
+
+
+def test_unsupported_batch_endpoint_is_disabled(reporter):
+    api = FakeApi(batch=FakeResponse(404))
+    scores = reporter(api, batch_endpoint=True)
+    scores.submit(reports(1, 2))
+    assert sorted(api.reported) == [1, 2]
+    assert not scores.batch_endpoint
+    scores.submit(reports(3, 4))
+    assert api.batches == [[1, 2]]
+
+
+def test_single_report_skips_the_batch_endpoint(reporter):
+    api = FakeApi(batch=FakeResponse(200, {"results": []}))
+    reporter(api, batch_endpoint=True).submit(reports(1))
+    assert api.batches == []
+    assert api.reported == [1]
+
+
+def run_once(report_score, scores, monkeypatch):
+    """Runs the reporter until its first error."""
+
+    def stop(seconds):
+        raise Stop
+
+    monkeypatch.setattr(report_score.time, "sleep", stop)
+    with pytest.raises(Stop):
+        scores.run()
+
+
+def test_reports_without_outcome_are_requeued(
+    report_score, reporter, queue, monkeypatch
+):
+    api = FakeApi({2: RuntimeError("unexpected")})
+    scores = reporter(api, concurrency=1)
+    scores.registration_checked_at = time.monotonic()
+    scores.requeue(reports(1, 2, 3))
+    run_once(report_score, scores, monkeypatch)
+    assert scores.acked == 1
+    assert queued(queue) == [2, 3]
+    assert scores.pending == {}
+
+
+def test_reports_are_requeued_while_unregistered(
+    report_score, reporter, queue, monkeypatch
+):
+    api = FakeApi()
+    scores = reporter(api)
+
+    def unregistered():
+        raise ValueError("You are not registered.")
+
+    scores.ensure_registered = unregistered
+    scores.requeue(reports(1, 2, 3))
+    run_once(report_score, scores, monkeypatch)
+    assert api.reported == []
+    assert queued(queue) == [1, 2, 3]
@@ -0,0 +1,118 @@
+import pytest
+
+from weight_schedule import WeightScheduler
+
+
+class FakeSubtensor:
+    # pylint: disable=unused-argument
+
+    def __init__(self, tempo=99, rate_limit=0, last_update=None):
+        self._tempo = tempo
+        self._rate_limit = rate_limit
+        self._last_update = last_update
+
+    def tempo(self, netuid):
+        return self._tempo
+
+    def weights_rate_limit(self, netuid):
+        return self._rate_limit
+
+    def get_hyperparameter(self, param_name, netuid, block):
+        assert param_name == "LastUpdate"
+        return self._last_update
+
+
+def scheduler(netuid=0, uid=None, **chain):
+    # Epochs of 100 blocks, starting at block 99 on netuid 0.
+    subtensor = FakeSubtensor(**chain)
+    weights = WeightScheduler(
+        subtensor, netuid, uid, offset=10, retry_interval=5
+    )
+    weights.refresh(0)
+    return weights
+
+
+@pytest.mark.parametrize(
+    "netuid, block, window",
+    [
+        (0, 99, (99, 199)),
+        (0, 150, (99, 199)),
+        (0, 198, (99, 199)),
+        (0, 199, (199, 299)),
+        (3, 150, (96, 196)),
+        (3, 196, (196, 296)),
+    ],
+)
+def test_window(netuid, block, window):
+    assert scheduler(netuid).window(block) == window
+
+
+def test_waits_for_the_offset():
+    assert scheduler().next_attempt_block(100) == 109
+    assert scheduler().next_attempt_block(150) == 150
+
+
+def test_sets_weights_once_per_window():
+    weights = scheduler()
+    weights.record(109, True)
+    assert weights.next_attempt_block(120) == 209
+    assert weights.next_attempt_block(250) == 250
+
+
+def test_waits_for_the_rate_limit():
+    weights = scheduler(rate_limit=150, uid=1, last_update=[0, 130])
+    assert weights.last_update == 130
+    # 130 + 150 is in the next window.
+    assert weights.next_attempt_block(140) == 280
+    weights = scheduler(rate_limit=250, uid=1, last_update=[0, 130])
+    # 130 + 250 is two windows ahead.
+    assert weights.next_attempt_block(140) == 380
+
+
+def test_rate_limit_past_the_window_skips_it():
+    weights = scheduler(rate_limit=300)
+    weights.record(190, True)
+    # 190 + 300 is past the window starting at 399.
+    assert weights.next_attempt_block(200) == 490
+
+
+def test_retries_in_the_window():
+    weights = scheduler()
+    weights.record(109, False)
+    assert weights.retry_block == 114
+    assert weights.next_attempt_block(110) == 114
+    assert weights.next_attempt_block(120) == 120
+    weights.record(120, True)
+    assert weights.retry_block is None
+    assert weights.next_attempt_block(121) == 209
+
+
+def test_failure_at_the_end_of_the_window_waits_for_the_next():
+    weights = scheduler()
+    weights.record(195, False)
+    assert weights.retry_block is None
+    assert weights.next_attempt_block(196) == 209
+    assert weights.last_update is None
+
+
+def test_stale_retry_is_dropped():
+    weights = scheduler()
+    weights.record(150, False)
+    # The retry block belongs to a window that has passed.
+    assert weights.next_attempt_block(260) == 260
+    assert weights.retry_block is None
+
+
+def test_wait_for_window(monkeypatch):
+    weights = scheduler()
+    weights.subtensor.get_current_block = lambda: 100
+    waited = []
+
+    # pylint: disable-next=unused-argument
+    def wait_for_block(subtensor, block, block_time):
+        waited.append(block)
+        return block
+
+    monkeypatch.setattr("utils.wait_for_block", wait_for_block)
+    assert weights.wait_for_window() == 109
+    assert waited == [109]
@@ -0,0 +1,149 @@
+import importlib
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from finest_common import state_backend
+
+
+class Stop(BaseException):
+    """Ends run_weight_setter, which retries every Exception."""
+
+
+class FakeScheduler:
+    """Hands out `blocks` in order and records the outcome of each attempt."""
+
+    # pylint: disable=unused-argument
+
+    tempo = 99
+    block_time = 12.0
+
+    def __init__(self, blocks, *args, **kwargs):
+        self.blocks = list(blocks)
+        self.recorded = []
+
+    def wait_for_window(self):
+        block = self.blocks.pop(0)
+        if isinstance(block, BaseException):
+            raise block
+        return block
+
+    def record(self, block, success):
+        self.recorded.append((block, success))
+
+
+class FakeMetagraphCache:
+    # pylint: disable=unused-argument
+
+    def __init__(self, *args, **kwargs):
+        self.metagraph = SimpleNamespace(
+            hotkeys=["5FakeHotkey"], uids=np.array([0])
+        )
+
+    def get(self, block=None):
+        return self.metagraph
+
+
+class FakeWallet:
+    # pylint: disable=unused-argument
+
+    def __init__(self, config=None):
+        self.hotkey = SimpleNamespace(ss58_address="5FakeHotkey")
+
+
+@pytest.fixture(name="weight_setter", scope="module")
+def fixture_weight_setter(tmp_path_factory):
+    # The module opens weight_setting.log in the working directory on import.
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(tmp_path_factory.mktemp("logs"))
+        return importlib.import_module("weight_setter")
+
+
+def run(weight_setter, monkeypatch, tmp_path, blocks, outcomes, sleeps=1):
+    """
+    Runs the loop over `blocks`, answering set_weights with `outcomes` (a bool, or an
+    exception to raise), until the loop sleeps `sleeps` times after an error.
+    """
+    scheduler = FakeScheduler(blocks)
+    outcomes = list(outcomes)
+    delays = []
+
+    def set_weights(*args):  # pylint: disable=unused-argument
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    def sleep(delay):
+        delays.append(delay)
+        if len(delays) >= sleeps:
+            raise Stop
+
+    monkeypatch.setattr(
+        weight_setter, "WeightScheduler", lambda *a, **k: scheduler
+    )
+    monkeypatch.setattr(weight_setter, "MetagraphCache", FakeMetagraphCache)
+    monkeypatch.setattr(weight_setter, "set_weights", set_weights)
+    monkeypatch.setattr(weight_setter, "init_wandb_logger", lambda *args: None)
+    monkeypatch.setattr(weight_setter.bt, "wallet", FakeWallet)
+    monkeypatch.setattr(weight_setter.time, "sleep", sleep)
+
+    config = SimpleNamespace(
+        netuid=1,
+        metagraph_ttl=60,
+        metagraph_full_sync_interval=3600,
+        score_db=str(tmp_path / "scores.db"),
+        weights_window_offset=10,
+        weights_retry_interval=5,
+    )
+    redis_queue = state_backend.connect(f"memory://{uuid.uuid4().hex}")
+    with pytest.raises(Stop):
+        weight_setter.run_weight_setter(config, None, redis_queue)
+    return scheduler, delays
+
+
+def test_failed_set_weights_is_retried(weight_setter, monkeypatch, tmp_path):
+    scheduler, delays = run(
+        weight_setter,
+        monkeypatch,
+        tmp_path,
+        blocks=[100, 105, Stop()],
+        outcomes=[ConnectionError("RPC down"), True],
+        sleeps=2,
+    )
+
+    assert scheduler.recorded == [(100, False), (105, True)]
+    assert delays == [5]
+
+
+def test_error_before_the_window_is_retried(
+    weight_setter, monkeypatch, tmp_path
+):
+    scheduler, delays = run(
+        weight_setter,
+        monkeypatch,
+        tmp_path,
+        blocks=[TimeoutError("no block"), TimeoutError("no block")],
+        outcomes=[],
+        sleeps=2,
+    )
+
+    # No window was reached, so no attempt was recorded as failed.
+    assert scheduler.recorded == []
+    assert delays == [5, 10]
+
+
+def test_backoff_resets_after_a_success(weight_setter, monkeypatch, tmp_path):
+    scheduler, delays = run(
+        weight_setter,
+        monkeypatch,
+        tmp_path,
+        blocks=[100, 105, 200],
+        outcomes=[ConnectionError("RPC down"), True, ConnectionError("again")],
+        sleeps=2,
+    )
+
+    assert scheduler.recorded == [(100, False), (105, True), (200, False)]
+    assert delays == [5, 5]
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from benchmarks.weights import (
+    legacy_convert_weights_and_uids_for_emit,
+    legacy_normalize_max_weight,
+    score_vectors,
+)
+from utils import (
+    U16_MAX,
+    convert_weights_and_uids_for_emit,
+    normalize_max_weight,
+)
+
+VECTORS = [
+    (name, n, seed)
+    for n in (1, 16, 256, 1024)
+    for seed in range(3)
+    for name in ("dense", "sparse", "tied", "dominant")
+]
+
+
+@pytest.mark.parametrize("limit", [0.01, 0.05, 0.1, 0.5])
+@pytest.mark.parametrize("name, n, seed", VECTORS)
+def test_normalize_max_weight_matches_the_loop(name, n, seed, limit):
+    scores = score_vectors(n, seed)[name]
+    np.testing.assert_array_equal(
+        normalize_max_weight(scores, limit=limit),
+        legacy_normalize_max_weight(scores, limit=limit),
+    )
+
+
+@pytest.mark.parametrize("name, n, seed", VECTORS)
+def test_convert_matches_the_loop(name, n, seed):
+    scores = score_vectors(n, seed)[name]
+    uids = np.arange(n)
+    weights = normalize_max_weight(scores, limit=0.05)
+    legacy_uids, legacy_vals = legacy_convert_weights_and_uids_for_emit(
+        uids, weights
+    )
+    weight_uids, weight_vals = convert_weights_and_uids_for_emit(uids, weights)
+    assert weight_uids == [int(uid) for uid in legacy_uids]
+    assert weight_vals == legacy_vals
+    assert all(type(value) is int for value in weight_uids + weight_vals)
+
+
+def test_normalize_max_weight_caps_the_largest_weight():
+    scores = np.ones(100, dtype=np.float32)
+    scores[0] = 1000
+    weights = normalize_max_weight(scores, limit=0.05)
+    assert weights.sum() == pytest.approx(1)
+    assert weights.max() == pytest.approx(0.05, abs=1e-4)
+
+
+def test_normalize_max_weight_zero_scores_are_uniform():
+    weights = normalize_max_weight(np.zeros(8, dtype=np.float32))
+    np.testing.assert_array_equal(weights, np.full(8, 1 / 8))
+
+
+def test_convert_rounds_half_to_even():
+    # 0.5 / 65535 and 1.5 / 65535 of the maximum land exactly on halves.
+    weights = np.array([U16_MAX, 0.5, 1.5, 2.5, 0])
+    assert convert_weights_and_uids_for_emit(np.arange(5), weights) == (
+        [0, 2, 3],
+        [U16_MAX, 2, 2],
+    )
+    assert legacy_convert_weights_and_uids_for_emit(np.arange(5), weights) == (
+        [0, 2, 3],
+        [U16_MAX, 2, 2],
+    )
+
+
+def test_convert_nothing_to_set():
+    assert convert_weights_and_uids_for_emit(np.arange(3), np.zeros(3)) == (
+        [],
+        [],
+    )
+
+
+def test_convert_rejects_invalid_input():
+    with pytest.raises(ValueError):
+        convert_weights_and_uids_for_emit(np.arange(2), np.array([1.0, -1.0]))
+    with pytest.raises(ValueError):
+        convert_weights_and_uids_for_emit(np.arange(3), np.ones(2))
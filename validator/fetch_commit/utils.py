@@ -2,12 +2,17 @@ import bittensor as bt
 import base64
 import hashlib
 import argparse
+import time
 import numpy as np
+from finest_common import state_backend
+from finest_common.score_store import DEFAULT_SCORE_DB
+from finest_common.tracing import DEFAULT_TRACE_FILE
 from typing import Tuple, List, Union, Any
 from numpy import ndarray, dtype, floating, complexfloating
 
 U32_MAX = 4294967295
 U16_MAX = 65535
+BLOCK_TIME = 12  # Seconds between two subtensor blocks.
 
 
 def get_config():
@@ -37,6 +42,127 @@ def get_config():
         default="miners-stats",
         help="The wandb run name",
     )
+    parser.add_argument(
+        "--scan_interval",
+        type=int,
+        default=25,
+        help="Number of blocks between two commitment scans",
+    )
+    parser.add_argument(
+        "--chain_endpoints",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Fallback subtensor endpoints used when the primary one fails",
+    )
+    parser.add_argument(
+        "--chain_concurrency",
+        type=int,
+        default=16,
+        help="Maximum number of concurrent chain queries",
+    )
+    parser.add_argument(
+        "--chain_timeout",
+        type=float,
+        default=30.0,
+        help="Timeout in seconds for a single chain query",
+    )
+    parser.add_argument(
+        "--metagraph_ttl",
+        type=int,
+        default=25,
+        help="Number of blocks a cached metagraph snapshot stays fresh",
+    )
+    parser.add_argument(
+        "--metagraph_full_sync_interval",
+        type=int,
+        default=360,
+        help="Maximum number of blocks between two full metagraph syncs",
+    )
+    parser.add_argument(
+        "--queue_age_weight",
+        type=float,
+        default=3600.0,
+        help="Seconds a commit made at the current block is moved ahead in the commit queue",
+    )
+    parser.add_argument(
+        "--queue_stake_weight",
+        type=float,
+        default=3600.0,
+        help="Seconds the highest-staked UID's commit is moved ahead in the commit queue",
+    )
+    parser.add_argument(
+        "--queue_idle_weight",
+        type=float,
+        default=7200.0,
+        help="Seconds a UID not evaluated for a day is moved ahead in the commit queue",
+    )
+    parser.add_argument(
+        "--queue_max_boost",
+        type=float,
+        default=21600.0,
+        help="Maximum seconds a commit can be moved ahead; bounds how long any UID waits",
+    )
+    parser.add_argument(
+        "--weights_window_offset",
+        type=int,
+        default=10,
+        help="Blocks after the epoch step before weights are set",
+    )
+    parser.add_argument(
+        "--weights_retry_interval",
+        type=int,
+        default=5,
+        help="Blocks between two weight setting attempts after a failure",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=state_backend.DEFAULT_URL,
+        help="Queue and state backend: redis://host:port/db, unix:///path/redis.sock, "
+        "sqlite:///path/state.db or memory://",
+    )
+    parser.add_argument(
+        "--score_db",
+        type=str,
+        default=DEFAULT_SCORE_DB,
+        help="SQLite file of the local score store, shared by the validator processes",
+    )
+    parser.add_argument(
+        "--report_batch_size",
+        type=int,
+        default=32,
+        help="Maximum number of scores reported together",
+    )
+    parser.add_argument(
+        "--report_concurrency",
+        type=int,
+        default=8,
+        help="Parallel requests used when scores are reported one by one",
+    )
+    parser.add_argument(
+        "--batch_reports",
+        action="store_true",
+        help="Report scores through the batch endpoint when the API supports it",
+    )
+    parser.add_argument(
+        "--registration_check_interval",
+        type=float,
+        default=600.0,
+        help="Seconds between two registration checks of the score reporter",
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        type=float,
+        default=15.0,
+        help="Seconds between two publications of the process metrics, 0 to disable them",
+    )
+    parser.add_argument(
+        "--trace_file",
+        type=str,
+        default=DEFAULT_TRACE_FILE,
+        help="File the commit traces are appended to, in the OTLP/JSON layout; empty to disable tracing",
+    )
     # Add Bittensor-specific arguments
     bt.wallet.add_args(parser)
     bt.subtensor.add_args(parser)
@@ -46,6 +172,30 @@ def get_config():
     return config
 
 
+def wait_for_block(
+    subtensor: bt.subtensor,
+    target_block: int,
+    block_time: float = BLOCK_TIME,
+    min_poll: float = 1.0,
+) -> int:
+    """Sleeps until the chain reaches `target_block` and returns the current block.
+
+    Instead of polling on a fixed short interval, sleeps for the expected time until
+    the target block, so waiting N blocks costs about one RPC.
+
+    Args:
+        subtensor (bt.subtensor): Connected subtensor.
+        target_block (int): Block number to wait for.
+        block_time (float): Expected seconds per block.
+        min_poll (float): Minimum seconds between two block reads.
+    """
+    while True:
+        current_block = subtensor.get_current_block()
+        if current_block >= target_block:
+            return current_block
+        time.sleep(max(min_poll, (target_block - current_block) * block_time))
+
+
 def assert_registered(wallet: bt.wallet, metagraph: bt.metagraph):
     """Asserts the wallet is a registered miner and returns the miner's UID.
 
@@ -129,10 +279,13 @@ def normalize_max_weight(x: np.ndarray, limit: float = 0.1) -> np.ndarray:
         cumsum = np.cumsum(estimation, 0)
 
         # Determine the index of cutoff
-        estimation_sum = np.array(
-            [(len(values) - i - 1) * estimation[i] for i in range(len(values))]
+        estimation_sum = (
+            np.arange(len(values) - 1, -1, -1).astype(estimation.dtype)
+            * estimation
         )
-        n_values = (estimation / (estimation_sum + cumsum + epsilon) < limit).sum()
+        n_values = (
+            estimation / (estimation_sum + cumsum + epsilon) < limit
+        ).sum()
 
         # Determine the cutoff based on the index
         cutoff_scale = (limit * cumsum[n_values - 1] - epsilon) / (
@@ -167,22 +320,20 @@ def convert_weights_and_uids_for_emit(
     uids = np.asarray(uids)
     weights = np.asarray(weights)
 
-    # Get non-zero weights and corresponding uids
-    non_zero_weights = weights[weights > 0]
-    non_zero_weight_uids = uids[weights > 0]
-
-    # Debugging information
-    bt.logging.debug(f"weights: {weights}")
-    bt.logging.debug(f"non_zero_weights: {non_zero_weights}")
-    bt.logging.debug(f"uids: {uids}")
-    bt.logging.debug(f"non_zero_weight_uids: {non_zero_weight_uids}")
+    bt.logging.debug(
+        f"converting {len(weights)} weights, {np.count_nonzero(weights > 0)} non-zero"
+    )
 
     if np.min(weights) < 0:
         raise ValueError(
-            "Passed weight is negative cannot exist on chain {}".format(weights)
+            "Passed weight is negative cannot exist on chain {}".format(
+                weights
+            )
         )
     if np.min(uids) < 0:
-        raise ValueError("Passed uid is negative cannot exist on chain {}".format(uids))
+        raise ValueError(
+            "Passed uid is negative cannot exist on chain {}".format(uids)
+        )
     if len(uids) != len(weights):
         raise ValueError(
             "Passed weights and uids must have the same length, got {} and {}".format(
@@ -192,27 +343,22 @@ def convert_weights_and_uids_for_emit(
     if np.sum(weights) == 0:
         bt.logging.debug("nothing to set on chain")
         return [], []  # Nothing to set on chain.
-    else:
-        max_weight = float(np.max(weights))
-        weights = [
-            float(value) / max_weight for value in weights
-        ]  # max-upscale values (max_weight = 1).
-        bt.logging.debug(f"setting on chain max: {max_weight} and weights: {weights}")
-
-    weight_vals = []
-    weight_uids = []
-
-    for i, (weight_i, uid_i) in enumerate(list(zip(weights, uids))):
-        uint16_val = round(
-            float(weight_i) * int(U16_MAX)
-        )  # convert to int representation.
-
-        # Filter zeros
-        if uint16_val != 0:  # Filter zeros
-            weight_vals.append(uint16_val)
-            weight_uids.append(uid_i)
-
-    bt.logging.debug(f"final params: {weight_uids} : {weight_vals}")
+
+    # max-upscale values (max_weight = 1) and convert to int representation;
+    # np.rint rounds half to even like the built-in round.
+    max_weight = float(np.max(weights))
+    uint16_vals = np.rint(
+        weights.astype(np.float64) / max_weight * int(U16_MAX)
+    )
+
+    # Filter zeros
+    non_zero = uint16_vals != 0
+    weight_uids = uids[non_zero].tolist()
+    weight_vals = uint16_vals[non_zero].astype(np.int64).tolist()
+
+    bt.logging.debug(
+        f"setting {len(weight_uids)} weights on chain, max: {max_weight}"
+    )
     return weight_uids, weight_vals
 
 
@@ -277,10 +423,14 @@ def process_weights_for_netuid(
         bt.logging.warning(
             "No non-zero weights less then min allowed weight, returning all ones."
         )
-        weights = np.ones(metagraph.n) * 1e-5  # creating minimum even non-zero weights
+        weights = (
+            np.ones(metagraph.n) * 1e-5
+        )  # creating minimum even non-zero weights
         weights[non_zero_weight_idx] += non_zero_weights
         bt.logging.debug("final_weights", weights)
-        normalized_weights = normalize_max_weight(x=weights, limit=max_weight_limit)
+        normalized_weights = normalize_max_weight(
+            x=weights, limit=max_weight_limit
+        )
         return np.arange(len(normalized_weights)), normalized_weights
 
     bt.logging.debug("non_zero_weights", non_zero_weights)
@@ -296,7 +446,9 @@ def process_weights_for_netuid(
     bt.logging.debug("lowest_quantile", lowest_quantile)
 
     # Exclude all weights below the allowed quantile.
-    non_zero_weight_uids = non_zero_weight_uids[lowest_quantile <= non_zero_weights]
+    non_zero_weight_uids = non_zero_weight_uids[
+        lowest_quantile <= non_zero_weights
+    ]
     non_zero_weights = non_zero_weights[lowest_quantile <= non_zero_weights]
     bt.logging.debug("non_zero_weight_uids", non_zero_weight_uids)
     bt.logging.debug("non_zero_weights", non_zero_weights)
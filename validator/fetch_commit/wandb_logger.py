@@ -1,15 +1,37 @@
 import wandb
 import sys
+import logging
+import queue
+import threading
+
+SCORE_PREFIX = "score/"
+
 
 class WandbLogger:
-    def __init__(self, project_name="finest-data-subnet", run_name="miners-stats"):
+    def __init__(
+        self,
+        project_name="finest-data-subnet",
+        run_name="miners-stats",
+        max_pending=16,
+        run_id=None,
+    ):
         self.project_name = project_name
         self.run_name = run_name
-        self.run_id = self._get_or_create_run_id()
+        # Score logs are sent from a background thread so W&B latency never delays
+        # weight setting; when W&B falls behind, the oldest pending log is dropped.
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.worker = None
+        self.run_id = run_id or self._get_or_create_run_id()
         self.entity = self._get_entity()
         self.initialized = False
         try:
-            self.run = wandb.init(project=project_name, id=self.run_id, name=self.run_name, entity=self.entity)
+            self.run = wandb.init(
+                project=project_name,
+                id=self.run_id,
+                name=self.run_name,
+                entity=self.entity,
+            )
             self.initialized = True
         except Exception as _:
             self.run = None
@@ -17,7 +39,6 @@ class WandbLogger:
         self.api = wandb.Api()
 
     def _get_or_create_run_id(self):
-   
         run_id = None
         try:
             api = wandb.Api(timeout=60)
@@ -33,7 +54,7 @@ class WandbLogger:
             run_id = wandb.util.generate_id()
 
         return run_id
-    
+
     def _get_entity(self):
         try:
             api = wandb.Api(timeout=60)
@@ -45,13 +66,69 @@ class WandbLogger:
     def log_wandb(self, data):
         wandb.log(data)
 
+    def log_scores(self, block, scores):
+        """Queues one history step holding the block and every UID's score."""
+        data = {"block": int(block)}
+        data.update(
+            {
+                f"{SCORE_PREFIX}{int(uid)}": float(score)
+                for uid, score in scores.items()
+            }
+        )
+
+        if self.worker is None:
+            self.worker = threading.Thread(
+                target=self._send_pending, daemon=True
+            )
+            self.worker.start()
+        while True:
+            try:
+                self.pending.put_nowait(data)
+                return
+            except queue.Full:
+                try:
+                    self.pending.get_nowait()
+                    self.dropped += 1
+                    logging.warning(
+                        f"W&B is falling behind, dropped {self.dropped} score logs so far"
+                    )
+                except queue.Empty:
+                    pass
+
+    def _send_pending(self):
+        while True:
+            data = self.pending.get()
+            if data is None:
+                return
+            try:
+                wandb.log(data)
+            except Exception as e:
+                logging.error(f"Failed to log scores to W&B: {e}")
+
+    def close(self, timeout=30):
+        """Flushes the pending score logs."""
+        if self.worker is not None:
+            self.pending.put(None)
+            self.worker.join(timeout)
+            self.worker = None
+
     def get_all_scores(self):
         run = self.api.run(f"{self.project_name}/{self.run_id}")
+
+        # The run summary holds the last logged value of every score key.
+        scores = {
+            int(key[len(SCORE_PREFIX) :]): run.summary.get(key)
+            for key in run.summary.keys()
+            if key.startswith(SCORE_PREFIX)
+        }
+        if scores:
+            return scores
+
+        # Runs logged before scores were batched have one history step per UID.
         history = run.history(pandas=False)
-        scores = {}
         for row in history:
             uid = row.get("uid")
             score = row.get("score")
             if uid is not None and score is not None:
-                scores[int(uid)] = score 
-        return scores 
+                scores[int(uid)] = score
+        return scores
@@ -0,0 +1,118 @@
+import logging
+from typing import Optional, Tuple
+
+import bittensor as bt
+
+import utils
+
+
+class WeightScheduler:
+    """
+    Plans weight setting around the subnet's epochs.
+
+    Each epoch (tempo + 1 blocks) is one window, and weights are set once per window:
+    `offset` blocks after the epoch step, or later if the weights rate limit since
+    the validator's last update requires it. A failed attempt is retried every
+    `retry_interval` blocks until the window closes. Between attempts the scheduler
+    sleeps for the expected block time, so a window costs a handful of chain calls.
+
+    Args:
+        subtensor (bt.subtensor): Connected subtensor.
+        netuid (int): Subnet UID.
+        uid (int): UID of this validator, used to read its last weight update.
+        offset (int): Blocks to wait after the epoch step before setting weights.
+        retry_interval (int): Blocks between two attempts after a failure.
+        block_time (float): Expected seconds per block.
+    """
+
+    def __init__(
+        self,
+        subtensor: bt.subtensor,
+        netuid: int,
+        uid: Optional[int],
+        offset: int = 10,
+        retry_interval: int = 5,
+        block_time: float = utils.BLOCK_TIME,
+    ):
+        self.subtensor = subtensor
+        self.netuid = netuid
+        self.uid = uid
+        self.offset = offset
+        self.retry_interval = retry_interval
+        self.block_time = block_time
+
+        self.tempo = 360
+        self.rate_limit = 0
+        self.last_update: Optional[int] = None
+        self.last_window: Optional[int] = None
+        self.retry_block: Optional[int] = None
+
+    def refresh(self, block: int):
+        """Reads the subnet tempo, the weights rate limit and this validator's last update."""
+        self.tempo = self.subtensor.tempo(self.netuid) or self.tempo
+        self.rate_limit = self.subtensor.weights_rate_limit(self.netuid) or 0
+        if self.uid is not None:
+            last_update = self.subtensor.get_hyperparameter(
+                param_name="LastUpdate", netuid=self.netuid, block=block
+            )
+            if last_update is not None and self.uid < len(last_update):
+                self.last_update = int(last_update[self.uid])
+
+    def window(self, block: int) -> Tuple[int, int]:
+        """Returns the [start, end) blocks of the epoch containing `block`."""
+        length = self.tempo + 1
+        start = block - (block + self.netuid + 1) % length
+        return start, start + length
+
+    def next_attempt_block(self, block: int) -> int:
+        """Returns the first block at or after `block` where weights should be set."""
+        start, end = self.window(block)
+        if self.retry_block is not None:
+            if start <= self.retry_block < end and self.last_window != start:
+                return max(block, self.retry_block)
+            self.retry_block = None
+
+        if self.last_window == start:
+            start, end = end, end + self.tempo + 1
+        while True:
+            target = max(block, start + self.offset)
+            if self.last_update is not None:
+                target = max(target, self.last_update + self.rate_limit)
+            if target < end:
+                return target
+            start, end = end, end + self.tempo + 1
+
+    def wait_for_window(self) -> int:
+        """Sleeps until the next attempt is due and returns the current block."""
+        block = self.subtensor.get_current_block()
+        self.refresh(block)
+        target = self.next_attempt_block(block)
+        if target > block:
+            logging.info(
+                f"Next weight setting at block {target} (in {target - block} blocks, "
+                f"tempo {self.tempo}, rate limit {self.rate_limit})."
+            )
+            block = utils.wait_for_block(
+                self.subtensor, target, self.block_time
+            )
+        return block
+
+    def record(self, block: int, success: bool):
+        """Records the outcome of the attempt made at `block`."""
+        start, end = self.window(block)
+        if success:
+            self.last_window = start
+            self.last_update = block
+            self.retry_block = None
+        elif block + self.retry_interval < end:
+            self.retry_block = block + self.retry_interval
+            logging.warning(
+                f"Setting weights failed, retrying at block {self.retry_block}."
+            )
+        else:
+            # Too late for a retry, the window is given up.
+            self.last_window = start
+            self.retry_block = None
+            logging.error(
+                f"Setting weights failed and the epoch ends at block {end}, waiting for the next one."
+            )
@@ -10,6 +10,12 @@ import logging
 import wandb
 from dotenv import load_dotenv
 from wandb_logger import WandbLogger
+from metagraph_cache import MetagraphCache
+from weight_schedule import WeightScheduler
+from finest_common.score_store import ScoreStore
+from finest_common.heartbeat import Heartbeat
+from finest_common.metrics import REGISTRY, publish_metrics
+from finest_common import state_backend
 
 
 # Set up logging
@@ -24,9 +30,26 @@ logging.basicConfig(
     ],
 )
 
+WEIGHT_SET_SECONDS = REGISTRY.histogram(
+    "validator_weight_set_seconds", "Duration of a weight setting attempt"
+)
+WEIGHT_SET_TOTAL = REGISTRY.counter(
+    "validator_weight_set_total", "Weight setting attempts, by result"
+)
+WEIGHT_SET_LAST_SUCCESS = REGISTRY.gauge(
+    "validator_weight_set_last_success_timestamp_seconds",
+    "Unix time of the last successful weight setting",
+)
+SCORES = REGISTRY.gauge(
+    "validator_score", "Score of each UID when weights were last set"
+)
+
 
 def set_weights(
-    scores: list, config: bt.config, metagraph: bt.metagraph, subtensor: bt.subtensor
+    scores: list,
+    config: bt.config,
+    metagraph: bt.metagraph,
+    subtensor: bt.subtensor,
 ):
     """Sets weights on the blockchain based on provided scores."""
 
@@ -38,7 +61,9 @@ def set_weights(
     norm = np.linalg.norm(scores, ord=1, axis=0, keepdims=True)
 
     if np.any(norm == 0) or np.isnan(norm).any():
-        logging.warning("Norm is zero or NaN. Adjusting to avoid division by zero.")
+        logging.warning(
+            "Norm is zero or NaN. Adjusting to avoid division by zero."
+        )
         norm = np.ones_like(norm)  # Avoid division by zero or NaN
 
     # Compute raw_weights safely
@@ -75,88 +100,209 @@ def set_weights(
             return False
 
     except Exception as e:
-        logging.error(f"An error occurred during weight setting: {e}", exc_info=True)
+        logging.error(
+            f"An error occurred during weight setting: {e}", exc_info=True
+        )
         return False
 
 
-def main(config, subtensor: bt.subtensor):
-    """Main loop to periodically set weights."""
-    
+def init_wandb_logger(config, score_store: ScoreStore):
+    """Connects the optional W&B backup, or returns None if W&B is unavailable."""
+    wandb_api_key = os.getenv("WANDB_API_KEY")
+    if wandb_api_key is None:
+        logging.warning(
+            "WANDB_API_KEY is not set, scores are only kept locally."
+        )
+        return None
     try:
-        wandb_api_key = os.getenv("WANDB_API_KEY")
-        if wandb_api_key is None:
-            logging.error("🔴 WANDB_API_KEY is not set")
-            return
         wandb.login(key=wandb_api_key)
+        # The run id is cached locally, so restarts don't scan every run of the project.
+        wandb_logger = WandbLogger(
+            config.wandb_project,
+            config.wandb_run_name,
+            run_id=score_store.get_meta("wandb_run_id"),
+        )
     except Exception as e:
         logging.error(f"🔴 An error occurred while logging in to Wandb: {e}")
-        return
-
-    wandb_logger = WandbLogger(config.wandb_project, config.wandb_run_name)
-    
+        return None
     if wandb_logger.initialized is False:
-        logging.error("🔴 WandbLogger failed to initialize, check your WANDB_API_KEY")
+        logging.error(
+            "🔴 WandbLogger failed to initialize, check your WANDB_API_KEY"
+        )
+        return None
+    score_store.set_meta("wandb_run_id", wandb_logger.run_id)
+    return wandb_logger
+
+
+def restore_scores(
+    redis_queue: redis.Redis, score_store: ScoreStore, wandb_logger
+):
+    """
+    Restores the scores in Redis after a Redis restart, from the local score store or,
+    if that is empty, from the W&B backup. Scores already in Redis are kept.
+    """
+    if redis_queue.exists("scores"):
+        logging.info("Scores found in Redis, keeping them.")
         return
 
+    start = time.perf_counter()
+    saved_scores = score_store.load()
+    source = "local score store"
+    if not saved_scores and wandb_logger is not None:
+        saved_scores = wandb_logger.get_all_scores()
+        source = "Wandb"
+        score_store.record(saved_scores, source="wandb")
+
+    if saved_scores:
+        redis_queue.hset("scores", mapping=saved_scores)
+        logging.info(
+            f"Restored {len(saved_scores)} scores from the {source} in {time.perf_counter() - start:.3f}s."
+        )
+
+
+def main(config, subtensor: bt.subtensor):
+    """Connects to the state backend and runs the weight setting loop."""
+
     try:
-        redis_queue = redis.Redis(host="localhost", port=6379, db=0)
+        redis_queue = state_backend.connect(config.backend)
 
         if redis_queue.ping():
-            logging.info("🟢 Successfully connected to Redis.")
+            logging.info(f"🟢 Successfully connected to {config.backend}.")
         else:
-            logging.error("🔴 Failed to connect to Redis.")
+            logging.error(f"🔴 Failed to connect to {config.backend}.")
             return
     except redis.ConnectionError as e:
         logging.error(f"🔴 Redis connection error: {e}")
         return
     except Exception as e:
-        logging.error(f"🔴 An unexpected error occurred while connecting to Redis: {e}")
+        logging.error(
+            f"🔴 An unexpected error occurred while connecting to {config.backend}: {e}"
+        )
         return
 
-    saved_scores = wandb_logger.get_all_scores()
+    publish_metrics(redis_queue, "weight_setter", config.metrics_interval)
+    run_weight_setter(config, subtensor, redis_queue)
 
-    if saved_scores:
-        logging.info("Successfully fetched scores from Wandb.")
-        redis_queue.hset('scores', mapping=saved_scores)
+
+def run_weight_setter(
+    config, subtensor: bt.subtensor, redis_queue: redis.Redis
+):
+    """Main loop to periodically set weights."""
+    metagraph_cache = MetagraphCache(
+        subtensor,
+        config.netuid,
+        redis_queue,
+        ttl=config.metagraph_ttl,
+        full_sync_interval=config.metagraph_full_sync_interval,
+    )
+
+    score_store = ScoreStore(config.score_db)
+    wandb_logger = init_wandb_logger(config, score_store)
+    restore_scores(redis_queue, score_store, wandb_logger)
+
+    hotkey = bt.wallet(config=config).hotkey.ss58_address
+    metagraph = metagraph_cache.get()
+    scheduler = WeightScheduler(
+        subtensor,
+        config.netuid,
+        metagraph.hotkeys.index(hotkey)
+        if hotkey in metagraph.hotkeys
+        else None,
+        offset=config.weights_window_offset,
+        retry_interval=config.weights_retry_interval,
+    )
+
+    heartbeat = Heartbeat(redis_queue, "weight_setter")
 
     logging.info("Started main loop to periodically set weights.")
+    error_attempt = 0
     try:
         while True:
+            # Block of the attempt in progress, until its outcome is recorded.
+            attempt_block = None
             try:
-                if subtensor.get_current_block() % 100 == 0:
-                    metagraph: bt.metagraph = subtensor.metagraph(config.netuid)
-                    raw_scores = redis_queue.hgetall("scores")
-
-                    scores = [
-                        float(raw_scores.get(str(uid).encode('utf-8'), b"0").decode('utf-8'))
-                        for uid in metagraph.uids
-                    ]
+                # The next window starts at most two epochs away.
+                heartbeat.beat(
+                    "waiting for the weights window",
+                    timeout=2 * (scheduler.tempo + 1) * scheduler.block_time
+                    + 300,
+                )
+                current_block = scheduler.wait_for_window()
+                attempt_block = current_block
+                metagraph = metagraph_cache.get(current_block)
+                raw_scores = redis_queue.hgetall("scores")
 
-                    logging.info(f"Setting weights for {len(scores)} UIDs...")
-                    is_set = set_weights(scores, config, metagraph, subtensor)
+                scores = [
+                    float(
+                        raw_scores.get(str(uid).encode("utf-8"), b"0").decode(
+                            "utf-8"
+                        )
+                    )
+                    for uid in metagraph.uids
+                ]
+                # Catch up on score changes made by workers on other hosts.
+                stored_scores = score_store.load()
+                score_store.record(
+                    {
+                        int(uid): float(value)
+                        for uid, value in raw_scores.items()
+                        if stored_scores.get(int(uid)) != float(value)
+                    },
+                    source="weight_setter",
+                )
 
-                    if is_set:
-                        for i, value in enumerate(scores):
-                            wandb_logger.log_wandb({"uid": i, "score": value})
+                logging.info(
+                    f"Setting weights for {len(scores)} UIDs at block {current_block}..."
+                )
+                heartbeat.beat(f"setting weights at block {current_block}")
+                start = time.perf_counter()
+                is_set = set_weights(scores, config, metagraph, subtensor)
+                WEIGHT_SET_SECONDS.observe(time.perf_counter() - start)
+                WEIGHT_SET_TOTAL.inc(result="success" if is_set else "failure")
+                scheduler.record(current_block, is_set)
+                attempt_block = None
+                SCORES.clear()
+                for uid, score in zip(metagraph.uids.tolist(), scores):
+                    SCORES.set(score, uid=uid)
+                if is_set:
+                    WEIGHT_SET_LAST_SUCCESS.set(time.time())
 
-                    logging.info("Waiting for next cycle...")
-                    time.sleep(10)
+                if is_set and wandb_logger is not None:
+                    wandb_logger.log_scores(
+                        current_block,
+                        dict(zip(metagraph.uids.tolist(), scores)),
+                    )
+                error_attempt = 0
 
             except Exception as e:
-                logging.error(f"An error occurred in the main loop: {e}")
-                return
+                if attempt_block is not None:
+                    # Counts as a failed attempt, retried within the window.
+                    WEIGHT_SET_TOTAL.inc(result="failure")
+                    scheduler.record(attempt_block, False)
+                delay = min(5 * 2**error_attempt, 300)
+                error_attempt += 1
+                heartbeat.beat(f"retrying after an error in {delay}s")
+                logging.error(
+                    f"An error occurred in the main loop, retrying in {delay} seconds: {e}",
+                    exc_info=True,
+                )
+                time.sleep(delay)
+                continue
 
     except KeyboardInterrupt:
         print("🔴 Weight-setter Process interrupted by user.")
     except Exception as e:
         print(f"{e}")
         sys.exit(1)
+    finally:
+        if wandb_logger is not None:
+            wandb_logger.close()
+        score_store.close()
 
 
 if __name__ == "__main__":
-
     logging.info("Initializing the process...")
-    
+
     load_dotenv()
 
     config = utils.get_config()
@@ -1,38 +1,17 @@
-import subprocess
 import argparse
-from multiprocessing import Process
+import os
+import socket
 from dotenv import load_dotenv
-import psutil
+from finest_common import state_backend
+from supervisor import (
+    Component,
+    Supervisor,
+    install_signal_handlers,
+    serve_status,
+)
 
 
-def terminate_process(process):
-    if process.is_alive():
-        try:
-            parent = psutil.Process(process.pid)
-            children = parent.children(recursive=True)
-            for child in children:
-                child.terminate()
-            process.terminate()
-            process.join(timeout=15)
-
-            for child in children:
-                if child.is_running():
-                    child.kill()
-
-            if process.is_alive():
-                process.kill()
-        except psutil.NoSuchProcess:
-            print(f"Process {process.pid} no longer exists.")
-
-        print(f"✅ {process.name} (PID: {process.pid}) terminated successfully.")
-
-
-def terminate_processes(processes):
-    for process in processes:
-        terminate_process(process)
-
-
-def run_fetch_commits(args):
+def fetch_commits_command(args):
     command = [
         ".venv/bin/python",
         "main.py",
@@ -44,19 +23,21 @@ def run_fetch_commits(args):
         args.wallet_hotkey,
         "--subtensor.network",
         args.subtensor_network,
+        "--scan_interval",
+        str(args.scan_interval),
+        "--backend",
+        args.backend,
     ]
 
     if args.subtensor_chain_endpoint:
-        command.extend(["--subtensor.chain_endpoint", args.subtensor_chain_endpoint])
+        command.extend(
+            ["--subtensor.chain_endpoint", args.subtensor_chain_endpoint]
+        )
 
-    try:
-        subprocess.run(command, check=True, cwd="fetch_commit")
-    except subprocess.CalledProcessError as e:
-        print(f"Error in fetch_commits: {e}")
-        raise
+    return command
 
 
-def run_report_score(args):
+def report_score_command(args):
     command = [
         ".venv/bin/python",
         "report_score.py",
@@ -68,30 +49,34 @@ def run_report_score(args):
         args.wallet_hotkey,
         "--subtensor.network",
         args.subtensor_network,
+        "--backend",
+        args.backend,
     ]
 
     if args.subtensor_chain_endpoint:
-        command.extend(["--subtensor.chain_endpoint", args.subtensor_chain_endpoint])
+        command.extend(
+            ["--subtensor.chain_endpoint", args.subtensor_chain_endpoint]
+        )
 
-    try:
-        subprocess.run(command, check=True, cwd="fetch_commit")
-    except subprocess.CalledProcessError as e:
-        print(f"Error in report_score: {e}")
-        raise
+    return command
 
 
-def run_process_commits(args):
+def process_commits_command(args):
     command = [
         ".venv/bin/python",
         "main.py",
         "--world_size",
         str(args.world_size),
+        "--worker_id",
+        args.worker_id,
+        "--backend",
+        args.backend,
     ]
 
-    subprocess.run(command, check=True, cwd="process_commit")
+    return command
 
 
-def run_weight_setter(args):
+def weight_setter_command(args):
     command = [
         ".venv/bin/python",
         "weight_setter.py",
@@ -107,22 +92,65 @@ def run_weight_setter(args):
         args.wandb_project,
         "--wandb_run_name",
         args.wandb_run_name,
+        "--backend",
+        args.backend,
     ]
 
     if args.subtensor_chain_endpoint:
-        command.extend(["--subtensor.chain_endpoint", args.subtensor_chain_endpoint])
+        command.extend(
+            ["--subtensor.chain_endpoint", args.subtensor_chain_endpoint]
+        )
 
-    try:
-        subprocess.run(command, check=True, cwd="fetch_commit")
-    except subprocess.CalledProcessError as e:
-        print(f"Error in weight_setter: {e}")
-        raise
+    return command
+
+
+def single_process_command(args):
+    """fetch_commits, weight_setter and report_score in one process."""
+    command = [
+        ".venv/bin/python",
+        "single_process.py",
+        "--netuid",
+        args.netuid,
+        "--wallet.name",
+        args.wallet_name,
+        "--wallet.hotkey",
+        args.wallet_hotkey,
+        "--subtensor.network",
+        args.subtensor_network,
+        "--scan_interval",
+        str(args.scan_interval),
+        "--wandb_project",
+        args.wandb_project,
+        "--wandb_run_name",
+        args.wandb_run_name,
+        "--backend",
+        args.backend,
+    ]
+
+    if args.subtensor_chain_endpoint:
+        command.extend(
+            ["--subtensor.chain_endpoint", args.subtensor_chain_endpoint]
+        )
+
+    return command
+
+
+def resolve_backend(parser, url):
+    """Makes a SQLite path absolute, as the components run from their own directory."""
+    scheme, _, location = url.partition("://")
+    if scheme == "memory":
+        parser.error(
+            "memory:// can't be shared between the validator processes, "
+            "use sqlite:// to run the validator without Redis"
+        )
+    if scheme == "sqlite":
+        return f"sqlite://{os.path.abspath(location)}"
+    return url
 
 
 def main():
-    processes = []
+    supervisor = None
     try:
-
         parser = argparse.ArgumentParser(
             description="Execute validator code with the provided arguments."
         )
@@ -136,7 +164,10 @@ def main():
             "--wallet_name", type=str, required=True, help="The wallet name"
         )
         parser.add_argument(
-            "--wallet_hotkey", type=str, required=True, help="The wallet hotkey"
+            "--wallet_hotkey",
+            type=str,
+            required=True,
+            help="The wallet hotkey",
         )
         parser.add_argument(
             "--subtensor_network",
@@ -164,57 +195,137 @@ def main():
         )
 
         parser.add_argument(
-            "--world_size", type=int, default=1, help="The number of GPUs to utilize"
+            "--world_size",
+            type=int,
+            default=1,
+            help="The number of GPUs to utilize",
+        )
+        parser.add_argument(
+            "--scan_interval",
+            type=int,
+            default=25,
+            help="Number of blocks between two commitment scans",
+        )
+
+        parser.add_argument(
+            "--backend",
+            type=str,
+            default=state_backend.DEFAULT_URL,
+            help="Queue and state backend: redis://host:port/db, unix:///path/redis.sock "
+            "or sqlite:///path/state.db",
+        )
+        parser.add_argument(
+            "--single_process",
+            action="store_true",
+            help="Run fetch_commits, weight_setter and report_score in one process",
+        )
+        parser.add_argument(
+            "--restart_backoff",
+            type=float,
+            default=5.0,
+            help="Seconds before restarting a failed process, doubled on each consecutive failure",
+        )
+        parser.add_argument(
+            "--max_restart_backoff",
+            type=float,
+            default=300.0,
+            help="Maximum seconds before restarting a failed process",
+        )
+        parser.add_argument(
+            "--liveness_interval",
+            type=float,
+            default=30.0,
+            help="Seconds between two checks of the process heartbeats",
+        )
+        parser.add_argument(
+            "--startup_grace",
+            type=float,
+            default=300.0,
+            help="Seconds a started process has to send its first heartbeat",
+        )
+        parser.add_argument(
+            "--status_host",
+            type=str,
+            default="127.0.0.1",
+            help="Address of the status endpoint",
+        )
+        parser.add_argument(
+            "--status_port",
+            type=int,
+            default=8091,
+            help="Port of the status endpoint, 0 to disable it",
         )
 
         args = parser.parse_args()
+        args.backend = resolve_backend(parser, args.backend)
+        args.worker_id = f"{socket.gethostname()}:{os.getenv('CUDA_VISIBLE_DEVICES', 'all')}"
+
+        if args.single_process:
+            components = [
+                Component(
+                    "single_process",
+                    single_process_command(args),
+                    "fetch_commit",
+                    heartbeats=[
+                        "fetch_commits",
+                        "weight_setter",
+                        "report_score",
+                    ],
+                ),
+            ]
+        else:
+            components = [
+                Component(
+                    "fetch_commits",
+                    fetch_commits_command(args),
+                    "fetch_commit",
+                ),
+                Component(
+                    "weight_setter",
+                    weight_setter_command(args),
+                    "fetch_commit",
+                ),
+                Component(
+                    "report_score", report_score_command(args), "fetch_commit"
+                ),
+            ]
+        components.append(
+            Component(
+                "process_commits",
+                process_commits_command(args),
+                "process_commit",
+                heartbeats=[f"process_commits:{args.worker_id}"],
+            )
+        )
 
-        # Initialize process objects
-        fetch_process = Process(target=run_fetch_commits, args=(args,), daemon=True)
-        process_process = Process(target=run_process_commits, args=(args,), daemon=True)
-        weight_setter_process = Process(
-            target=run_weight_setter, args=(args,), daemon=True
-        )
-        report_score_process = Process(
-            target=run_report_score, args=(args,), daemon=True
-        )
-
-        processes = [
-            fetch_process,
-            process_process,
-            weight_setter_process,
-            report_score_process,
-        ]
-
-        # Launch processes
-        for process in processes:
-            process.start()
-
-        # # Monitor processes
-        while True:
-            for process in processes:
-                if not process.is_alive():
-                    print(
-                        f"❌ {process.name} (PID: {process.pid}) terminated unexpectedly.\n🙊 Terminating other processes..."
-                    )
-                    terminate_processes(processes)
-                    return
-
-            if process.exitcode:
-                raise RuntimeError(
-                    f"Process {process.name} (PID: {process.pid}) failed with exit code {process.exitcode}"
-                )
+        supervisor = Supervisor(
+            components,
+            state_backend.connect(args.backend),
+            backoff=args.restart_backoff,
+            max_backoff=args.max_restart_backoff,
+            liveness_interval=args.liveness_interval,
+            startup_grace=args.startup_grace,
+        )
+        install_signal_handlers(supervisor)
+        if args.status_port:
+            serve_status(supervisor, args.status_host, args.status_port)
+            print(
+                f"📡 Status available at http://{args.status_host}:{args.status_port}/status"
+            )
+            print(
+                f"📈 Metrics available at http://{args.status_host}:{args.status_port}/metrics"
+            )
+
+        supervisor.run()
 
     except KeyboardInterrupt as e:
         print("🔴 Main process interrupted by user.")
-    except RuntimeError as e:
-        print("🔴 All subprocesses terminated due to an error.")
     finally:
-        terminate_processes(processes)
+        if supervisor is not None:
+            supervisor.shutdown()
 
 
 if __name__ == "__main__":
-
     load_dotenv()
 
     main()
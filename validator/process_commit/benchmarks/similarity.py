@@ -0,0 +1,193 @@
+"""Benchmark of the word-match similarity of the similarity check.
+
+Scores a batch of (source record, refined document) pairs with the former method
+(`nltk.word_tokenize` and a stop word set rebuilt for every text) and with the
+`similarity` engine, in this process and in a process pool, and reports their time
+and the largest score difference. The pairs are synthetic HTML pages and the text
+of a part of their paragraphs, about the size of CommonCrawl records.
+
+The former method needs the NLTK `punkt` and `stopwords` data:
+    python -m nltk.downloader punkt stopwords
+
+Usage:
+    python benchmarks/similarity.py [--samples 30] [--words 5000] [--workers 4] [--json]
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nltk  # noqa: E402
+from nltk.corpus import stopwords  # noqa: E402
+
+from similarity import batch_similarity  # noqa: E402
+
+VOCABULARY = (
+    "the of and to a in is it you that he was for on are with as I his they be at one "
+    "have this from or had by hot word but what some we can out other were all there "
+    "when up use your how said an each she which do their time if will way about many "
+    "then them write would like so these her long make thing see him two has look more "
+    "day could go come did number sound no most people my over know water than call "
+    "first who may down side been now find data model training crawl refine validator "
+    "miner subnet quality filter dataset language english record archive page content"
+).split()
+PUNCTUATION = [
+    ",",
+    ".",
+    ";",
+    ":",
+    "!",
+    "?",
+    " -",
+    "'s",
+    "n't",
+    "...",
+    " (see",
+    ")",
+]
+
+
+def fixture_pairs(samples: int, words: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(samples):
+        paragraphs = []
+        for _ in range(max(1, words // 100)):
+            tokens = []
+            for _ in range(100):
+                word = rng.choice(VOCABULARY)
+                tokens.append(
+                    word
+                    + (rng.choice(PUNCTUATION) if rng.random() < 0.15 else "")
+                )
+            paragraphs.append(" ".join(tokens).capitalize() + ".")
+        html = "".join(
+            f'<p class="text">{paragraph}</p>\n' for paragraph in paragraphs
+        )
+        original = (
+            f"<html><head><title>Page</title></head><body>{html}</body></html>"
+        )
+        refined = "\n".join(p for p in paragraphs if rng.random() < 0.7)
+        pairs.append((original, refined))
+    return pairs
+
+
+def legacy_similarity(original_text: str, refined_text: str) -> float:
+    """The former `DataProcessor.calculate_word_match_similarity`."""
+
+    def tokenize_and_filter(text):
+        stop_words = set(stopwords.words("english"))
+        words = nltk.word_tokenize(text.lower())
+        return [
+            word for word in words if word.isalpha() and word not in stop_words
+        ]
+
+    original_words = tokenize_and_filter(original_text)
+    refined_words = tokenize_and_filter(refined_text)
+
+    original_word_count = Counter(original_words)
+    refined_word_count = Counter(refined_words)
+
+    matching_words = sum((original_word_count & refined_word_count).values())
+
+    if not refined_words:
+        return 0
+    return (matching_words / len(refined_words)) * 100
+
+
+def measure(score, runs: int) -> tuple:
+    """Best wall time of `runs` calls of `score`, and its result."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = score()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the word-match similarity."
+    )
+    parser.add_argument(
+        "--samples", type=int, default=30, help="Pairs scored per batch"
+    )
+    parser.add_argument(
+        "--words", type=int, default=5000, help="Words per source record"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes of the pool run",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Runs per measure, the best is kept",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON"
+    )
+    args = parser.parse_args()
+
+    pairs = fixture_pairs(args.samples, args.words)
+    legacy_seconds, expected = measure(
+        lambda: [legacy_similarity(*pair) for pair in pairs], args.runs
+    )
+    results = [
+        {
+            "method": "nltk (former)",
+            "workers": 1,
+            "seconds": legacy_seconds,
+            "max_diff": 0.0,
+        }
+    ]
+    for workers in sorted({1, args.workers}):
+        seconds, scores = measure(
+            functools.partial(batch_similarity, pairs, workers), args.runs
+        )
+        max_diff = max(
+            (abs(a - b) for a, b in zip(scores, expected)), default=0.0
+        )
+        results.append(
+            {
+                "method": "similarity",
+                "workers": workers,
+                "seconds": seconds,
+                "max_diff": max_diff,
+            }
+        )
+    for result in results:
+        result["speedup"] = legacy_seconds / result["seconds"]
+
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "samples": args.samples,
+                    "words": args.words,
+                    "results": results,
+                }
+            )
+        )
+        return
+    print(f"{args.samples} pairs of ~{args.words} words")
+    for result in results:
+        print(
+            f"{result['method']:<14} workers={result['workers']:<3} {result['seconds']:.3f}s  "
+            f"x{result['speedup']:.1f}  max score difference {result['max_diff']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
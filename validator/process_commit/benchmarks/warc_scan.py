@@ -0,0 +1,192 @@
+"""Benchmark of the WARC scans of the similarity check.
+
+Scans a gzipped WARC file for a few record ids, once with a single `ArchiveIterator`
+pass (the streaming scan of `DataProcessor`) and then with `WarcScanner` for each
+number of workers, checks that every scan finds the same records and reports their
+throughput. Without `--warc`, a fixture corpus of synthetic HTML records is written
+to a temporary directory first.
+
+Usage:
+    python benchmarks/warc_scan.py [--warc file.warc.gz] [--workers 1 2 4 8] [--json]
+"""
+
+import argparse
+import functools
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from warcio.archiveiterator import ArchiveIterator  # noqa: E402
+from warcio.statusandheaders import StatusAndHeaders  # noqa: E402
+from warcio.warcwriter import WARCWriter  # noqa: E402
+
+from warc_scanner import LocalSource, WarcScanner, worker_count  # noqa: E402
+
+
+def write_fixture(path: str, records: int, seed: int = 0) -> None:
+    """Writes `records` HTML response records of a few KB each to a .warc.gz file."""
+    rng = random.Random(seed)
+    vocabulary = [
+        "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz")
+            for _ in range(rng.randint(2, 10))
+        )
+        for _ in range(20000)
+    ]
+    with open(path, "wb") as output:
+        writer = WARCWriter(output, gzip=True)
+        for index in range(records):
+            paragraphs = "".join(
+                f"<p>{' '.join(rng.choices(vocabulary, k=rng.randint(20, 200)))}</p>"
+                for _ in range(rng.randint(2, 20))
+            )
+            payload = f"<html><body>{paragraphs}</body></html>".encode()
+            http_headers = StatusAndHeaders(
+                "200 OK", [("Content-Type", "text/html")], protocol="HTTP/1.1"
+            )
+            writer.write_record(
+                writer.create_warc_record(
+                    f"https://example.com/{index}",
+                    "response",
+                    payload=io.BytesIO(payload),
+                    http_headers=http_headers,
+                )
+            )
+
+
+def sample_ids(path: str, count: int, seed: int = 0) -> set:
+    with open(path, "rb") as f:
+        ids = [
+            record.rec_headers.get_header("WARC-Record-ID")
+            for record in ArchiveIterator(f)
+        ]
+    return set(random.Random(seed).sample(ids, min(count, len(ids))))
+
+
+def scan_serial(path: str, ids_to_find: set) -> dict:
+    found = {}
+    with open(path, "rb") as f:
+        for record in ArchiveIterator(f):
+            warc_id = record.rec_headers.get_header("WARC-Record-ID")
+            if warc_id in ids_to_find:
+                found[warc_id] = (
+                    record.content_stream()
+                    .read()
+                    .decode("utf-8", errors="ignore")
+                )
+    return found
+
+
+def scan_parallel(path: str, ids_to_find: set, workers: int) -> dict:
+    _, found_texts = WarcScanner(workers).scan(LocalSource(path), ids_to_find)
+    return {found["id"]: found["text"] for found in found_texts}
+
+
+def measure(scan, runs: int) -> tuple:
+    """Best wall time of `runs` calls of `scan`, and its result."""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = scan()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the WARC scans.")
+    parser.add_argument(
+        "--warc",
+        type=str,
+        default=None,
+        help="WARC file, a fixture by default",
+    )
+    parser.add_argument(
+        "--records",
+        type=int,
+        default=20000,
+        help="Records of the fixture corpus",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="Worker counts to measure, powers of two up to the CPU count by default",
+    )
+    parser.add_argument(
+        "--ids", type=int, default=30, help="Record ids looked up"
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=3,
+        help="Runs per measure, the best is kept",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="Print results as JSON"
+    )
+    args = parser.parse_args()
+
+    workers = args.workers
+    if not workers:
+        cpus = os.cpu_count() or 1
+        workers = [1]
+        while workers[-1] * 2 <= cpus:
+            workers.append(workers[-1] * 2)
+        if workers[-1] != cpus:
+            workers.append(cpus)
+    # The scanner uses at most one process per core.
+    workers = sorted({worker_count(count) for count in workers})
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.warc
+        if path is None:
+            path = os.path.join(directory, "fixture.warc.gz")
+            write_fixture(path, args.records)
+        size = os.path.getsize(path)
+        ids_to_find = sample_ids(path, args.ids)
+
+        seconds, expected = measure(
+            lambda: scan_serial(path, ids_to_find), args.runs
+        )
+        results = [
+            {"scan": "ArchiveIterator", "workers": 1, "seconds": seconds}
+        ]
+        for count in workers:
+            seconds, found = measure(
+                functools.partial(scan_parallel, path, ids_to_find, count),
+                args.runs,
+            )
+            if found != expected:
+                raise RuntimeError(
+                    f"WarcScanner with {count} workers found other records"
+                )
+            results.append(
+                {"scan": "WarcScanner", "workers": count, "seconds": seconds}
+            )
+
+    for result in results:
+        result["mb_per_second"] = size / 1e6 / result["seconds"]
+        result["speedup"] = results[0]["seconds"] / result["seconds"]
+
+    if args.json:
+        print(json.dumps({"file_mb": size / 1e6, "results": results}))
+        return
+    print(f"{size / 1e6:.1f} MB, {len(ids_to_find)} ids looked up")
+    for result in results:
+        print(
+            f"{result['scan']:<16} workers={result['workers']:<3} "
+            f"{result['seconds']:.2f}s  {result['mb_per_second']:.1f} MB/s  "
+            f"x{result['speedup']:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
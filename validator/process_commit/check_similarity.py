@@ -1,63 +1,203 @@
 # data_processing.py
 
 import time
-import random
+import threading
 import boto3
 from warcio.archiveiterator import ArchiveIterator
 from io import BytesIO
 import pandas as pd
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datasets import load_dataset
-import nltk
-from nltk.corpus import stopwords
-from collections import Counter
 from utils import extract_commit
+from dataset_sampler import DatasetSampler
+from warc_scanner import S3Source, WarcScanner, worker_count
+from similarity import batch_similarity, word_match_similarity
+from finest_common.metrics import PHASE_BUCKETS, REGISTRY
+from finest_common import tracing
 
-# Ensure necessary NLTK packages are available
-try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    print("Downloading 'punkt' package...")
-    nltk.download("punkt")
+PHASE_SECONDS = REGISTRY.histogram(
+    "validator_commit_phase_seconds",
+    "Duration of each phase of a commit evaluation",
+    buckets=PHASE_BUCKETS,
+)
+WARC_DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "validator_warc_download_seconds",
+    "Duration of a WARC file download from S3",
+)
+WARC_DOWNLOAD_BYTES = REGISTRY.counter(
+    "validator_warc_download_bytes_total",
+    "Bytes of WARC files downloaded from S3, by method (full file or ranged record read)",
+)
 
-try:
-    nltk.data.find("corpora/stopwords")
-except LookupError:
-    print("Downloading 'stopwords' package...")
-    nltk.download("stopwords")
+WARC_FILE_BYTES = REGISTRY.counter(
+    "validator_warc_file_bytes_total",
+    "Size of the WARC files scanned, of which the scan may read only a part",
+)
+
+# Largest record fetched with a ranged read, CommonCrawl records are far smaller.
+MAX_RECORD_LENGTH = 16 * 1024 * 1024
+
+
+class S3Stream:
+    """Read-only stream over an S3 object body, counting the bytes read."""
+
+    def __init__(self, body):
+        self.body = body
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.body.read(size if size is not None and size >= 0 else None)
+        self.bytes_read += len(data)
+        return data
+
+    def tell(self):
+        return self.bytes_read
+
+    def close(self):
+        self.body.close()
 
 
 class DataProcessor:
-    def __init__(self, warc_files, hf_url, num_samples=30, bucket_name="commoncrawl"):
+    def __init__(
+        self,
+        warc_files,
+        hf_url,
+        num_samples=30,
+        bucket_name="commoncrawl",
+        hub_dir=None,
+        scan_workers=1,
+        similarity_workers=1,
+    ):
         self.num_samples = num_samples
         self.bucket_name = bucket_name
         self.warc_files = warc_files
         self.hf_url = hf_url
+        self.hub_dir = hub_dir
+        self.scan_workers = worker_count(scan_workers)
+        self.similarity_workers = similarity_workers
         self.s3 = boto3.client("s3", region_name="us-west-1")
+        # Guards the set of IDs still searched for, shared by the WARC file scans.
+        self.lock = threading.Lock()
 
     def get_random_samples(self):
-        dataset = load_dataset(self.hf_url, split="train")
-        random_indices = random.sample(range(len(dataset)), self.num_samples)
-        return [dataset[i] for i in random_indices]
+        sampler = DatasetSampler(
+            self.hf_url, split="train", hub_dir=self.hub_dir
+        )
+        return sampler.sample(
+            self.num_samples, columns=["id", "text", "metadata"]
+        )
 
-    def download_warc_file(self, warc_path):
+    def record_location(self, sample):
+        """
+        (warc_path, offset, length) of the WARC record of a sample, read from the
+        metadata written by the miner, or None if it is missing or doesn't point
+        into one of the task's WARC files.
+        """
+        metadata = sample.get("metadata") or {}
         try:
-            response = self.s3.get_object(Bucket=self.bucket_name, Key=warc_path)
-            return BytesIO(response["Body"].read())
-        except Exception as e:
-            print(f"Failed to download {warc_path}: {e}")
+            warc_path = metadata["warc_path"]
+            offset = int(metadata["warc_offset"])
+            length = int(metadata["warc_length"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        if warc_path not in self.warc_files:
             return None
+        if offset < 0 or not 0 < length <= MAX_RECORD_LENGTH:
+            return None
+        return warc_path, offset, length
+
+    def fetch_record(self, warc_id, warc_path, offset, length):
+        """
+        Text of a record fetched with one ranged read of its gzip member, None if
+        the record found there isn't `warc_id`. Download errors are raised.
+        """
+        with WARC_DOWNLOAD_SECONDS.time():
+            response = self.s3.get_object(
+                Bucket=self.bucket_name,
+                Key=warc_path,
+                Range=f"bytes={offset}-{offset + length - 1}",
+            )
+            body = response["Body"].read()
+        WARC_DOWNLOAD_BYTES.inc(len(body), method="range")
+        for record in ArchiveIterator(BytesIO(body)):
+            if record.rec_headers.get_header("WARC-Record-ID") == warc_id:
+                return (
+                    record.content_stream()
+                    .read()
+                    .decode("utf-8", errors="ignore")
+                )
+            break
+        print(f"Record at {warc_path}:{offset} is not {warc_id}")
+        return None
+
+    def fetch_indexed_records(self, random_samples):
+        """
+        Fetches the records of the samples whose metadata locates them.
+
+        Returns:
+            tuple: Texts found, as {"id", "text"} dicts, and the set of IDs left to
+            find by scanning the whole WARC files.
+        """
+        found_texts = []
+        unresolved = set()
+        locations = {}
+        for sample in random_samples:
+            location = self.record_location(sample)
+            if location is None:
+                unresolved.add(sample["id"])
+            else:
+                locations[sample["id"]] = location
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            future_to_id = {
+                executor.submit(self.fetch_record, warc_id, *location): warc_id
+                for warc_id, location in locations.items()
+            }
+            for future in as_completed(future_to_id):
+                warc_id = future_to_id[future]
+                try:
+                    text = future.result()
+                except Exception as e:
+                    print(f"Ranged read of {warc_id} failed: {e}")
+                    text = None
+                if text is None:
+                    unresolved.add(warc_id)
+                else:
+                    found_texts.append({"id": warc_id, "text": text})
+
+        print(
+            f"Fetched {len(found_texts)} of {len(random_samples)} records with ranged reads, "
+            f"{len(unresolved)} left for a full scan"
+        )
+        return found_texts, unresolved
 
-    def find_text_by_id(self, warc_file_stream, ids_to_find):
+    def find_text_by_id(self, warc_file_stream, ids_to_find, remaining=None):
+        """
+        Texts of the records of `ids_to_find` in a WARC stream, read record by record.
+
+        Args:
+            warc_file_stream: Stream of the (gzipped) WARC file.
+            ids_to_find (set): IDs of the records to look for.
+            remaining (set): IDs not found yet in any file, shared by the scans of all
+                files. The scan stops as soon as none of `ids_to_find` is left in it.
+        """
+        if remaining is None:
+            remaining = set(ids_to_find)
         found_texts = []
         try:
             for record in ArchiveIterator(warc_file_stream):
                 warc_id = record.rec_headers.get_header("WARC-Record-ID")
                 if warc_id in ids_to_find:
                     text_content = (
-                        record.content_stream().read().decode("utf-8", errors="ignore")
+                        record.content_stream()
+                        .read()
+                        .decode("utf-8", errors="ignore")
                     )
                     found_texts.append({"id": warc_id, "text": text_content})
+                    with self.lock:
+                        remaining.discard(warc_id)
+                with self.lock:
+                    if remaining.isdisjoint(ids_to_find):
+                        break
         except Exception as e:
             print(f"Error processing WARC file: {e}")
         finally:
@@ -65,19 +205,76 @@ class DataProcessor:
                 warc_file_stream.close()
         return found_texts
 
-    def process_warc_file(self, warc_path, ids_to_random):
+    def process_warc_file(self, warc_path, ids_to_random, remaining=None):
+        """
+        Scans a WARC file streamed from S3 for `ids_to_random`, without buffering it,
+        and stops reading once they have all been found.
+        """
         print(f"Processing WARC file: {warc_path}")
-        warc_file_stream = self.download_warc_file(warc_path)
-        if warc_file_stream:
-            return self.find_text_by_id(warc_file_stream, ids_to_random)
-        return []
+        try:
+            response = self.s3.get_object(
+                Bucket=self.bucket_name, Key=warc_path
+            )
+        except Exception as e:
+            print(f"Failed to download {warc_path}: {e}")
+            return []
+        warc_file_stream = S3Stream(response["Body"])
+        with WARC_DOWNLOAD_SECONDS.time():
+            found_texts = self.find_text_by_id(
+                warc_file_stream, ids_to_random, remaining
+            )
+        bytes_read = warc_file_stream.bytes_read
+        file_size = response.get("ContentLength") or bytes_read
+        WARC_DOWNLOAD_BYTES.inc(bytes_read, method="full")
+        WARC_FILE_BYTES.inc(file_size)
+        print(
+            f"Found {len(found_texts)} record(s) in {warc_path}, "
+            f"read {bytes_read / 1e6:.1f} of {file_size / 1e6:.1f} MB"
+        )
+        return found_texts
+
+    def scan_warc_file(self, warc_path, ids_to_random):
+        """
+        Scans a whole WARC file with ranged reads, decompressed and parsed by
+        `self.scan_workers` processes.
+        """
+        print(
+            f"Scanning WARC file {warc_path} with {self.scan_workers} workers"
+        )
+        scanner = WarcScanner(self.scan_workers)
+        try:
+            with WARC_DOWNLOAD_SECONDS.time():
+                _, found_texts = scanner.scan(
+                    S3Source(
+                        self.bucket_name, warc_path, self.s3.meta.region_name
+                    ),
+                    ids_to_random,
+                )
+        except Exception as e:
+            print(f"Failed to scan {warc_path}: {e}")
+            return []
+        finally:
+            WARC_DOWNLOAD_BYTES.inc(scanner.bytes_read, method="full")
+        WARC_FILE_BYTES.inc(scanner.file_bytes)
+        print(f"Found {len(found_texts)} record(s) in {warc_path}")
+        return found_texts
 
     def process_all_warc_files(self, ids_to_random):
         all_texts = []
+        remaining = set(ids_to_random)
+        if self.scan_workers > 1:
+            # Each file already uses every worker, scan them one after the other.
+            for warc_path in self.warc_files:
+                if not remaining:
+                    break
+                found_texts = self.scan_warc_file(warc_path, remaining)
+                remaining -= {found["id"] for found in found_texts}
+                all_texts.extend(found_texts)
+            return all_texts
         with ThreadPoolExecutor(max_workers=4) as executor:
             future_to_warc = {
                 executor.submit(
-                    self.process_warc_file, warc_path, ids_to_random
+                    self.process_warc_file, warc_path, ids_to_random, remaining
                 ): warc_path
                 for warc_path in self.warc_files
             }
@@ -92,41 +289,48 @@ class DataProcessor:
         return all_texts
 
     def calculate_word_match_similarity(self, original_text, refined_text):
-        def tokenize_and_filter(text):
-            stop_words = set(stopwords.words("english"))
-            words = nltk.word_tokenize(text.lower())
-            return [word for word in words if word.isalpha() and word not in stop_words]
-
-        original_words = tokenize_and_filter(original_text)
-        refined_words = tokenize_and_filter(refined_text)
+        return word_match_similarity(original_text, refined_text)
 
-        original_word_count = Counter(original_words)
-        refined_word_count = Counter(refined_words)
-
-        matching_words = sum((original_word_count & refined_word_count).values())
-
-        if not refined_words:
-            return 0
-        return (matching_words / len(refined_words)) * 100
+    def score_samples(self, random_samples, all_random_texts):
+        found_texts = {
+            found["id"]: found["text"] for found in all_random_texts
+        }
+        matched_samples = [
+            sample for sample in random_samples if sample["id"] in found_texts
+        ][: self.num_samples]
+        if len(matched_samples) < len(random_samples):
+            print(
+                f"{len(random_samples) - len(matched_samples)} sampled record(s) not found "
+                "in the WARC files"
+            )
 
-    def run(self):
-        random_samples = self.get_random_samples()
-        ids_to_random = {sample["id"] for sample in random_samples}
-        all_random_texts = self.process_all_warc_files(ids_to_random)
-        sorted_random_samples = sorted(random_samples, key=lambda sample: sample["id"])
-        sorted_all_random_texts = sorted(
-            all_random_texts, key=lambda found: found["id"]
+        similarities = batch_similarity(
+            [
+                (found_texts[sample["id"]], sample["text"])
+                for sample in matched_samples
+            ],
+            workers=self.similarity_workers,
         )
 
-        selected_texts = [sample["text"] for sample in sorted_random_samples]
-        found_texts = [found["text"] for found in sorted_all_random_texts]
-
         scores = []
-        for i in range(min(self.num_samples, len(found_texts))):
-            score = self.calculate_word_match_similarity(
-                found_texts[i], selected_texts[i]
-            )
+        for sample, score in zip(matched_samples, similarities):
             scores.append(round(score, 2))
-            print(f'Match Score for ID {sorted_random_samples[i]["id"]}: {score:.2f}%')
+            print(f'Match Score for ID {sample["id"]}: {score:.2f}%')
 
         return scores
+
+    def run(self):
+        with tracing.span("sampling"), PHASE_SECONDS.time(phase="sampling"):
+            random_samples = self.get_random_samples()
+        with tracing.span("warc_download"), PHASE_SECONDS.time(
+            phase="warc_download"
+        ):
+            all_random_texts, unresolved = self.fetch_indexed_records(
+                random_samples
+            )
+            if unresolved:
+                all_random_texts += self.process_all_warc_files(unresolved)
+        with tracing.span("similarity"), PHASE_SECONDS.time(
+            phase="similarity"
+        ):
+            return self.score_samples(random_samples, all_random_texts)
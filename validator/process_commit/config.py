@@ -22,7 +22,6 @@ from nanotron.logging import human_format
 
 
 def generate_training_config(hf_url: str):
-
     try:
         # Define model configuration for a tiny LLaMA model
         model_config = LlamaConfig(
@@ -102,7 +101,9 @@ def generate_training_config(hf_url: str):
         )
 
         # Set up checkpoint path
-        checkpoints_path = os.path.join(os.path.dirname(__file__), "checkpoints")
+        checkpoints_path = os.path.join(
+            os.path.dirname(__file__), "checkpoints"
+        )
         os.makedirs(checkpoints_path, exist_ok=True)
 
         # Define the configuration object
@@ -154,7 +155,9 @@ def generate_training_config(hf_url: str):
         config.data_stages = data_stages
 
         # Save the config as a YAML file
-        config.save_as_yaml(os.path.join(os.path.dirname(__file__), "config.yaml"))
+        config.save_as_yaml(
+            os.path.join(os.path.dirname(__file__), "config.yaml")
+        )
 
         print("Configuration file saved as config.yaml")
 
@@ -171,7 +174,10 @@ if __name__ == "__main__":
         description="Generate training config for Nanotron"
     )
     parser.add_argument(
-        "--hf-url", type=str, required=True, help="The Hugging Face URL for the dataset"
+        "--hf-url",
+        type=str,
+        required=True,
+        help="The Hugging Face URL for the dataset",
     )
 
     args = parser.parse_args()
@@ -0,0 +1,220 @@
+"""Random rows of a miner's dataset without downloading all of it.
+
+Datasets pushed to the Hub with `push_to_hub` are stored as Parquet files. Their
+footers give the number of rows of every row group, so after reading the footers the
+sampler picks row indices over the whole split and reads only the row groups holding
+them, restricted to the columns it needs, with ranged reads. Datasets in formats
+without random access are sampled with a reservoir over a streamed pass instead.
+
+A local directory laid out like the Hub (`<hub_dir>/<user>/<dataset>/...`) can stand
+in for it, e.g. to test the validator against fixture datasets.
+"""
+
+import logging
+import os
+import random
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence
+
+import fsspec
+import pyarrow.parquet as pq
+from datasets import load_dataset
+from huggingface_hub import HfFileSystem
+
+from finest_common.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SAMPLED_BYTES = REGISTRY.counter(
+    "validator_dataset_sample_bytes_total",
+    "Bytes read from the miner datasets to sample their rows, by method",
+)
+
+
+class CountingFile:
+    """File object wrapper counting the bytes read through it."""
+
+    def __init__(self, file):
+        self.file = file
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self.file.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    def close(self):
+        self.file.close()
+
+
+class DatasetSampler:
+    """
+    Args:
+        repo_id (str): Dataset repository, e.g. "user/dataset".
+        split (str): Split to sample from.
+        hub_dir (str): Local directory standing in for the Hub, None for the Hub.
+        token (str): Hub token, defaults to the HF_TOKEN environment variable.
+    """
+
+    def __init__(
+        self,
+        repo_id: str,
+        split: str = "train",
+        hub_dir: Optional[str] = None,
+        token: Optional[str] = None,
+    ):
+        self.repo_id = repo_id
+        self.split = split
+        self.hub_dir = hub_dir
+        if hub_dir:
+            self.fs = fsspec.filesystem("file")
+            self.root = os.path.join(os.path.abspath(hub_dir), repo_id)
+        else:
+            self.fs = HfFileSystem(token=token or os.getenv("HF_TOKEN"))
+            self.root = f"datasets/{repo_id}"
+        self.bytes_read = 0
+
+    def parquet_files(self) -> List[str]:
+        """Parquet files of the split, falling back to every Parquet file of the repo."""
+        files = sorted(
+            path
+            for path in self.fs.glob(f"{self.root}/**/*.parquet")
+            if not path.endswith("/")
+        )
+        in_split = [
+            path
+            for path in files
+            if os.path.basename(path).startswith(f"{self.split}-")
+            or os.path.basename(path).startswith(f"{self.split}.")
+            or f"/{self.split}/" in path
+        ]
+        return in_split or files
+
+    def sample(
+        self, num_samples: int, columns: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """
+        Returns `num_samples` rows picked uniformly without replacement, or every row
+        if the split is smaller.
+
+        Args:
+            num_samples (int): Number of rows.
+            columns (list): Columns to read, None for all of them.
+        """
+        files = self.parquet_files()
+        if files:
+            try:
+                return self.sample_parquet(files, num_samples, columns)
+            except Exception as e:
+                logger.warning(
+                    f"Unable to sample the Parquet files of {self.repo_id} ({e}), streaming it instead"
+                )
+        return self.sample_stream(num_samples, columns)
+
+    def _open(self, path: str) -> CountingFile:
+        # No read-ahead: the footer and every column chunk are read with exact ranges.
+        return CountingFile(self.fs.open(path, "rb", cache_type="none"))
+
+    def sample_parquet(
+        self,
+        files: List[str],
+        num_samples: int,
+        columns: Optional[Sequence[str]] = None,
+    ) -> List[dict]:
+        handles = [self._open(path) for path in files]
+        try:
+            parquet_files = [
+                pq.ParquetFile(handle, pre_buffer=True) for handle in handles
+            ]
+            # (file, row group, number of rows), in dataset order.
+            row_groups = [
+                (
+                    file_index,
+                    group,
+                    parquet_file.metadata.row_group(group).num_rows,
+                )
+                for file_index, parquet_file in enumerate(parquet_files)
+                for group in range(parquet_file.metadata.num_row_groups)
+            ]
+            total_rows = sum(rows for _, _, rows in row_groups)
+            indices = random.sample(
+                range(total_rows), min(num_samples, total_rows)
+            )
+
+            # Sampled rows of each row group, as offsets within the group.
+            wanted: Dict[int, List[int]] = {}
+            starts = []
+            start = 0
+            for _, _, rows in row_groups:
+                starts.append(start)
+                start += rows
+            for index in indices:
+                group_index = bisect_right(starts, index) - 1
+                wanted.setdefault(group_index, []).append(
+                    index - starts[group_index]
+                )
+
+            rows_by_index = {}
+            for group_index, offsets in wanted.items():
+                file_index, group, _ = row_groups[group_index]
+                parquet_file = parquet_files[file_index]
+                names = parquet_file.schema_arrow.names
+                selected = (
+                    [name for name in columns if name in names]
+                    if columns
+                    else None
+                )
+                table = parquet_file.read_row_group(group, columns=selected)
+                for offset, row in zip(
+                    offsets, table.take(offsets).to_pylist()
+                ):
+                    rows_by_index[starts[group_index] + offset] = row
+        finally:
+            for handle in handles:
+                handle.close()
+            read = sum(handle.bytes_read for handle in handles)
+            self.bytes_read += read
+            SAMPLED_BYTES.inc(read, method="parquet")
+
+        logger.info(
+            f"Sampled {len(indices)} of {total_rows} rows from {len(files)} Parquet file(s) "
+            f"of {self.repo_id}, reading {len(wanted)} row group(s) and {read / 1e6:.2f} MB"
+        )
+        return [rows_by_index[index] for index in indices]
+
+    def sample_stream(
+        self, num_samples: int, columns: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """Reservoir sample over one streamed pass of the split."""
+        path = self.root if self.hub_dir else self.repo_id
+        dataset = load_dataset(path, split=self.split, streaming=True)
+        reservoir = []
+        for seen, row in enumerate(dataset):
+            if columns:
+                row = {name: row[name] for name in columns if name in row}
+            if seen < num_samples:
+                reservoir.append(row)
+            else:
+                slot = random.randrange(seen + 1)
+                if slot < num_samples:
+                    reservoir[slot] = row
+        logger.info(
+            f"Sampled {len(reservoir)} rows of {self.repo_id} from a streamed pass"
+        )
+        return reservoir
@@ -148,7 +148,9 @@ def parse_log_output(log_output: str) -> list:
     Returns:
         list: Extracted metrics, values, and stderr.
     """
-    pattern = r"\|\s*(truthfulqa_mc2)\s*\|(\d\.\d{3,4})\|\s*±\s*\|(\d\.\d{3,4})\|"
+    pattern = (
+        r"\|\s*(truthfulqa_mc2)\s*\|(\d\.\d{3,4})\|\s*±\s*\|(\d\.\d{3,4})\|"
+    )
     try:
         matches = re.findall(pattern, log_output)
         return matches
@@ -158,7 +160,6 @@ def parse_log_output(log_output: str) -> list:
 
 
 if __name__ == "__main__":
-
     results = run_lighteval()
 
     print(f"Results: {results}")
@@ -1,8 +1,9 @@
+import os
+import socket
 import time
 import redis
 import json
 import requests
-import os
 import sys
 import numpy as np
 import logging
@@ -13,6 +14,19 @@ from config import generate_training_config
 from train import start_training_and_kill
 from evaluate import run_lighteval
 from calculate import calculate_score
+from finest_common.api_client import get_client
+from finest_common.commit_queue import CommitQueue, LeaseKeeper
+from finest_common.score_store import DEFAULT_SCORE_DB, ScoreStore
+from finest_common.heartbeat import Heartbeat
+from finest_common.metrics import (
+    PHASE_BUCKETS,
+    REGISTRY,
+    SCORE_BUCKETS,
+    latency_family,
+    publish_metrics,
+)
+from finest_common import state_backend
+from finest_common import tracing
 
 from colorama import init, Fore
 
@@ -42,7 +56,9 @@ logging.basicConfig(
     level=logging.INFO,
     handlers=[
         logging.StreamHandler(),  # Outputs to the console
-        logging.FileHandler("commit_processing.log", mode="w"),  # Logs to a file
+        logging.FileHandler(
+            "commit_processing.log", mode="w"
+        ),  # Logs to a file
     ],
 )
 
@@ -52,163 +68,411 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(
     ColoredFormatter("%(asctime)s - %(levelname)s - %(message)s")
 )
-logger.handlers[0] = (
-    console_handler  # Replace the default stream handler with our colored one
+logger.handlers[
+    0
+] = console_handler  # Replace the default stream handler with our colored one
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "validator_commit_phase_seconds",
+    "Duration of each phase of a commit evaluation",
+    buckets=PHASE_BUCKETS,
+)
+COMMITS_EVALUATED = REGISTRY.counter(
+    "validator_commits_evaluated_total",
+    "Commits evaluated by this worker, by result",
+)
+EVALUATION_SCORES = REGISTRY.histogram(
+    "validator_evaluation_score",
+    "Distribution of the scores given by the evaluations",
+    buckets=SCORE_BUCKETS,
+)
+UPDATED_SCORES = REGISTRY.histogram(
+    "validator_updated_score",
+    "Distribution of the UID scores after an evaluation is averaged in",
+    buckets=SCORE_BUCKETS,
 )
 
 
-def get_world_size():
+def get_args():
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--world_size", type=int, default=1, help="The number of GPUs to use"
     )
-    args = parser.parse_args()
-    return args.world_size
+    parser.add_argument(
+        "--worker_id",
+        type=str,
+        default=f"{socket.gethostname()}:{os.getenv('CUDA_VISIBLE_DEVICES', 'all')}",
+        help="Unique name of this worker; a restarted worker resumes the commits leased under its name",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=None,
+        help="Queue and state backend: redis://host:port/db, unix:///path/redis.sock or "
+        "sqlite:///path/state.db; defaults to the Redis at --redis_host:--redis_port",
+    )
+    parser.add_argument(
+        "--redis_host",
+        type=str,
+        default="localhost",
+        help="Host of the shared Redis",
+    )
+    parser.add_argument(
+        "--redis_port", type=int, default=6379, help="Port of the shared Redis"
+    )
+    parser.add_argument(
+        "--visibility_timeout",
+        type=float,
+        default=600.0,
+        help="Seconds before the commit of an unresponsive worker is handed to another one",
+    )
+    parser.add_argument(
+        "--max_deliveries",
+        type=int,
+        default=3,
+        help="Attempts after which a failing commit is moved to the dead-letter list",
+    )
+    parser.add_argument(
+        "--evaluation_timeout",
+        type=float,
+        default=6 * 3600.0,
+        help="Seconds an evaluation may take before the supervisor considers the worker stuck",
+    )
+    parser.add_argument(
+        "--score_db",
+        type=str,
+        default=DEFAULT_SCORE_DB,
+        help="SQLite file of the local score store, shared by the validator processes",
+    )
+    parser.add_argument(
+        "--hub_dir",
+        type=str,
+        default=None,
+        help="Local directory laid out like the Hugging Face Hub (<hub_dir>/<user>/<dataset>) "
+        "to read the miner datasets from instead of the Hub, e.g. for tests",
+    )
+    parser.add_argument(
+        "--scan_workers",
+        type=int,
+        default=1,
+        help="Processes decompressing a WARC file when it has to be scanned whole, "
+        "at most one per core, 1 to stream it on one core",
+    )
+    parser.add_argument(
+        "--similarity_workers",
+        type=int,
+        default=1,
+        help="Processes computing the word-match similarity of the samples",
+    )
+    parser.add_argument(
+        "--metrics_interval",
+        type=float,
+        default=15.0,
+        help="Seconds between two publications of the worker metrics, 0 to disable them",
+    )
+    parser.add_argument(
+        "--trace_file",
+        type=str,
+        default=tracing.DEFAULT_TRACE_FILE,
+        help="File the commit traces are appended to, in the OTLP/JSON layout; empty to disable tracing",
+    )
+    return parser.parse_args()
 
 
-def process_commits(redis_queue: redis.Redis, world_size: int):
+def apply_score(
+    redis_queue: redis.Redis,
+    uid: int,
+    score: float,
+    report_data: dict,
+    max_attempts: int = 5,
+):
     """
-    Asynchronous task to handle commits from the queue with logging.
+    Folds an evaluation score into the score of a UID and queues its report,
+    atomically.
+
+    The score is read under WATCH and the report push and score update are written in
+    one MULTI/EXEC transaction, so a score written in between (the decay of
+    fetch_commit, another worker) aborts it and the update is redone on the fresh
+    score, and the report is never queued without the score being stored.
+
+    Returns:
+        tuple: (previous score, updated score).
     """
-    redis_queue.delete("commit_queue")
-    redis_queue.delete("report_score")
-    redis_queue.delete("scores")
+    with redis_queue.pipeline() as transaction:
+        for _ in range(max_attempts):
+            try:
+                transaction.watch("scores")
+                raw_score = redis_queue.hget("scores", uid)
+                current_score = json.loads(raw_score) if raw_score else 0
+                updated_score = current_score * 0.8 + score * 0.2
+                transaction.multi()
+                transaction.rpush("report_score", json.dumps(report_data))
+                transaction.hset("scores", int(uid), json.dumps(updated_score))
+                transaction.execute()
+                return current_score, updated_score
+            except redis.WatchError:
+                logging.warning(
+                    f"Score of UID {uid} changed during the update, retrying."
+                )
+    raise RuntimeError(
+        f"Score of UID {uid} kept changing, gave up after {max_attempts} attempts"
+    )
 
-    while True:
-        try:
-            result = redis_queue.blpop("commit_queue", timeout=1)
-            if result:
-                start_time = time.time()
-                commit_data = json.loads(result[1].decode())
-                uid = commit_data["uid"]
-                current_commit = commit_data["current_commit"]
-                commit_block = commit_data["commit_block"]
-                logging.info(f"Processing commit {current_commit} for UID {uid}")
-
-                max_retries = 5
-                retry_count = 0
-                warc_files = None
-                request_block = None
-                while retry_count < max_retries:
-                    try:
-                        response = requests.post(
-                            f"{os.getenv('API_URL')}/subnets/check-task/",
-                            json={"uid": int(uid)},
-                        )
-                        if response.status_code == 200:
-                            data = response.json()
-                            task_id = data.get("task_id")
-                            warc_files = data.get("warc_files")
-                            request_block = data.get("request_block")
-                            break
-                        elif response.status_code == 404:
-                            break
-                        else:
-                            logging.error(
-                                f"Unable to retrieve warc files, retrying in 10 seconds {response.status_code}",
-                                exc_info=True,
-                            )
-                            time.sleep(10)
-                            retry_count += 1
-                    except Exception as e:
-                        logging.error(
-                            f"Unable to retrieve warc files, retrying in 10 seconds {e}",
-                            exc_info=True,
-                        )
-                        time.sleep(10)
-                        retry_count += 1
 
-                if not warc_files or not request_block:
-                    logging.error(
-                        f"Cannot find the latest task record for Miner-{uid}, skipping this commit..."
-                    )
-                    continue
+def evaluate_commit(
+    commit_data: dict,
+    redis_queue: redis.Redis,
+    score_store: ScoreStore,
+    api_client,
+    world_size: int,
+    hub_dir: str = None,
+    scan_workers: int = 1,
+    similarity_workers: int = 1,
+):
+    """
+    Runs the similarity check, training and evaluation for one commit, and stores the
+    updated score.
+    """
+    start_time = time.time()
+    uid = commit_data["uid"]
+    current_commit = commit_data["current_commit"]
+    commit_block = commit_data["commit_block"]
 
-                logging.info(
-                    f"API response received, warc_files: {warc_files}, request_block: {request_block}"
-                )
+    task_id = None
+    warc_files = None
+    request_block = None
+    try:
+        with tracing.span("check_task"), PHASE_SECONDS.time(
+            phase="check_task"
+        ):
+            response = api_client.check_task(uid)
+        if response.status_code == 200:
+            data = response.json()
+            task_id = data.get("task_id")
+            warc_files = data.get("warc_files")
+            request_block = data.get("request_block")
+        elif response.status_code != 404:
+            logging.error(
+                f"Unable to retrieve warc files: {response.status_code}"
+            )
+    except requests.RequestException as e:
+        logging.error(f"Unable to retrieve warc files: {e}", exc_info=True)
 
-                # Data processing
-                logging.info("Initiating similarity check process")
-                data_processor = DataProcessor(warc_files, current_commit)
+    if not warc_files or not request_block:
+        logging.error(
+            f"Cannot find the latest task record for Miner-{uid}, skipping this commit..."
+        )
+        COMMITS_EVALUATED.inc(result="no_task")
+        return
 
-                sample_similarities = data_processor.run()
+    logging.info(
+        f"API response received, warc_files: {warc_files}, request_block: {request_block}"
+    )
 
-                logging.info(
-                    f"Data processing completed with {len(sample_similarities)} similarities found. 📊"
-                )
+    # Data processing
+    logging.info("Initiating similarity check process")
+    data_processor = DataProcessor(
+        warc_files,
+        current_commit,
+        hub_dir=hub_dir,
+        scan_workers=scan_workers,
+        similarity_workers=similarity_workers,
+    )
+
+    sample_similarities = data_processor.run()
+
+    logging.info(
+        f"Data processing completed with {len(sample_similarities)} similarities found. 📊"
+    )
+
+    elapsed_time = (commit_block - request_block) * 12
+    # Training phase
+    if not generate_training_config(current_commit):
+        COMMITS_EVALUATED.inc(result="invalid_config")
+    else:
+        with tracing.span("training"), PHASE_SECONDS.time(phase="training"):
+            training_success = start_training_and_kill(
+                "config.yaml", world_size
+            )
+        logging.info(f"Training success: {training_success}")
+        if not training_success:
+            COMMITS_EVALUATED.inc(result="training_failed")
+        else:
+            # Evaluation phase
+            with tracing.span("evaluation"), PHASE_SECONDS.time(
+                phase="evaluation"
+            ):
+                matches = run_lighteval(world_size)
+
+            values, stderrs = zip(
+                *[
+                    (float(match[1]), float(match[2]))
+                    for match in matches
+                    if match[0] == "truthfulqa_mc2"
+                ]
+            )
+            if values and stderrs:
+                mean_value = np.mean(values)
+                mean_stderr = np.mean(stderrs)
+            else:
+                mean_value = 0.0
+                mean_stderr = 0.0
+
+            # Score calculation
+            score = calculate_score(
+                elapsed_time, mean_value, mean_stderr, sample_similarities
+            )
+            report_data = {
+                "task_id": task_id,
+                "score": score,
+                "queued_at": time.time(),
+                "trace": commit_data.get("trace"),
+            }
+            current_score, updated_score = apply_score(
+                redis_queue, uid, score, report_data
+            )
+            logging.info(f"Previous Score: {current_score}")
+            logging.info(f"New Score: {score}")
+            logging.info(f"Calculated score for UID {uid}: {updated_score}")
+            score_store.record({uid: updated_score}, source="evaluation")
+            COMMITS_EVALUATED.inc(result="scored")
+            EVALUATION_SCORES.observe(score)
+            UPDATED_SCORES.observe(updated_score)
+    logging.info(f"Total time taken: {time.time() - start_time}")
+
+
+def process_commits(redis_queue: redis.Redis, args: argparse.Namespace):
+    """
+    Leases commits from the queue and evaluates them.
 
-                elapsed_time = (commit_block - request_block) * 12
-                # Training phase
-                if generate_training_config(current_commit):
-                    training_success = start_training_and_kill(
-                        "config.yaml", world_size
+    Any number of workers can share the queue. A commit is acked once evaluated and
+    given back to the queue if the evaluation fails; if this worker dies, the lease
+    expires and another worker (or this one, restarted) picks the commit up.
+    """
+    commit_queue = CommitQueue(redis_queue, max_deliveries=args.max_deliveries)
+    api_client = get_client()
+    score_store = ScoreStore(args.score_db)
+    worker = args.worker_id
+    heartbeat = Heartbeat(redis_queue, f"process_commits:{worker}")
+    REGISTRY.add_collector(
+        lambda: [
+            latency_family(
+                "validator_api_request_seconds",
+                "Latency of the task API requests, by endpoint",
+                "path",
+                api_client.latencies,
+            )
+        ]
+    )
+
+    resumed = commit_queue.release_worker(worker)
+    if resumed:
+        logging.info(
+            f"Resuming {resumed} commit(s) leased by {worker} before the restart"
+        )
+
+    while True:
+        try:
+            commit_queue.requeue_expired()
+            commit_data = commit_queue.lease(worker, args.visibility_timeout)
+            if commit_data:
+                uid = commit_data["uid"]
+                trace = commit_data.get("trace")
+                # Redeliveries waited for a lease to expire, which shows as a gap.
+                if trace and commit_data["deliveries"] == 1:
+                    tracing.record(
+                        "commit_queue.wait",
+                        trace,
+                        trace["enqueued_at"],
+                        worker=worker,
                     )
-                    logging.info(f"Training success: {training_success}")
-                    if training_success:
-                        # Evaluation phase
-                        matches = run_lighteval(world_size)
-
-                        values, stderrs = zip(
-                            *[
-                                (float(match[1]), float(match[2]))
-                                for match in matches
-                                if match[0] == "truthfulqa_mc2"
-                            ]
-                        )
-                        if values and stderrs:
-                            mean_value = np.mean(values)
-                            mean_stderr = np.mean(stderrs)
-                        else:
-                            mean_value = 0.0
-                            mean_stderr = 0.0
-
-                        # Score calculation
-                        score = calculate_score(
-                            elapsed_time, mean_value, mean_stderr, sample_similarities
+                queue_stats = commit_queue.stats()
+                logging.info(
+                    f"Processing commit {commit_data['current_commit']} for UID {uid} "
+                    f"(attempt {commit_data['deliveries']}, {queue_stats['depth']} pending, "
+                    f"{queue_stats['in_flight']} in flight, {queue_stats['coalesced']} coalesced so far)"
+                )
+                heartbeat.beat(
+                    f"evaluating commit {commit_data['current_commit']} for UID {uid}",
+                    timeout=args.evaluation_timeout,
+                )
+                try:
+                    with LeaseKeeper(
+                        commit_queue, uid, worker, args.visibility_timeout
+                    ), tracing.span(
+                        "process_commits.evaluate",
+                        trace,
+                        uid=int(uid),
+                        commit=commit_data["current_commit"],
+                        worker=worker,
+                        deliveries=commit_data["deliveries"],
+                    ):
+                        evaluate_commit(
+                            commit_data,
+                            redis_queue,
+                            score_store,
+                            api_client,
+                            args.world_size,
+                            hub_dir=args.hub_dir,
+                            scan_workers=args.scan_workers,
+                            similarity_workers=args.similarity_workers,
                         )
-                        raw_score = redis_queue.hget("scores", uid)
-                        current_score = json.loads(raw_score) if raw_score else 0
-                        report_data = {"task_id": task_id, "score": score}
-                        logging.info(f"Previous Score: {current_score}")
-                        logging.info(f"New Score: {score}")
-                        updated_score = current_score * 0.8 + score * 0.2
-                        logging.info(f"Calculated score for UID {uid}: {updated_score}")
-                        redis_queue.rpush("report_score", json.dumps(report_data))
-                        redis_queue.hset("scores", int(uid), json.dumps(updated_score))
-                logging.info(f"Total time taken: {time.time() - start_time}")
+                except Exception as e:
+                    logging.warning(
+                        f"Evaluation of the commit for UID {uid} failed, returning it to the queue: {e}",
+                        exc_info=True,
+                    )
+                    commit_queue.nack(uid, worker, reason=str(e))
+                    COMMITS_EVALUATED.inc(result="error")
+                    time.sleep(10)
+                    continue
+                commit_queue.ack(uid, worker)
             else:
+                heartbeat.beat("waiting for commits")
                 print(f"No commit data found in commit queue...")
                 time.sleep(10)
         except Exception as e:
-            logging.warning(f"Unable to process commit now, retrying in 10 seconds {e}")
+            logging.warning(
+                f"Unable to process commit now, retrying in 10 seconds {e}"
+            )
             time.sleep(10)
 
 
 def main():
     try:
         try:
-            redis_queue = redis.Redis(host="localhost", port=6379, db=0)
+            args = get_args()
+            backend = (
+                args.backend
+                or f"redis://{args.redis_host}:{args.redis_port}/0"
+            )
+            redis_queue = state_backend.connect(backend)
             if redis_queue.ping():
-                logging.info("🟢 Successfully connected to Redis.")
+                logging.info(f"🟢 Successfully connected to {backend}.")
             else:
-                logging.error("🔴 Failed to connect to Redis.")
+                logging.error(f"🔴 Failed to connect to {backend}.")
                 return
         except redis.ConnectionError as e:
             logging.error(f"🔴 Redis connection error: {e}")
             return
         except Exception as e:
-            logging.error(f"🔴 An unexpected error occurred while connecting to Redis: {e}")
+            logging.error(
+                f"🔴 An unexpected error occurred while connecting to the backend: {e}"
+            )
             return
 
         logging.info("Starting process commits 🚀")
-        world_size = get_world_size()
-        process_commits(redis_queue, world_size)
+        publish_metrics(
+            redis_queue,
+            f"process_commits:{args.worker_id}",
+            args.metrics_interval,
+        )
+        tracing.configure(args.trace_file, f"process_commits:{args.worker_id}")
+        process_commits(redis_queue, args)
 
     except KeyboardInterrupt:
         print("🔴 Process-commit Process interrupted by user.")
 
 
 if __name__ == "__main__":
-
     main()
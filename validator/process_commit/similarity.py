@@ -0,0 +1,228 @@
+"""Word-match similarity between sampled documents and their source records.
+
+The score of a sample is the share of its words, stop words and non-alphabetic
+tokens left out, that also appear in the source record, counted as multisets.
+
+`words` keeps the alphabetic tokens `nltk.word_tokenize` produces from the
+lowercased text. Three passes mark the splits of the Treebank tokenizer that a
+single regex can't see: the commas, colons, "--" and ".." it pads (pairing the
+runs the same way), the words it splits ("cannot", "gonna", "wanna", "gotta",
+"gimme", "lemme", "d'ye", "more'n") and the "'tis" and "'twas" after them.
+`WORD_RE` then takes the tokens ending at a split character, a contraction
+("n't", "'s", ...), a closing quote or a sentence-final period, and drops those
+glued to digits, hyphens, slashes or inner periods ("e-mail", "u.s.", "mp3").
+`tests/test_similarity.py` checks it against the Treebank tokenizer on a fixed
+corpus.
+
+Before that, `PERIOD_RE` marks the periods Punkt doesn't end a sentence at, so
+the word before them is dropped as nltk does ("mr. smith" gives "smith"). In
+lowercased text Punkt ends a sentence at a known abbreviation only if the next
+token has a sentence end inside it ('mr. hyde."'), and at an initial unless the
+next token is a lowercase word or a ";:,.!?". Only the common abbreviations of
+Punkt's English model are known here: after a rarer one ("fig.", "approx.") the
+word is kept where nltk drops it. The tests check both against Punkt itself.
+"""
+
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, Tuple
+
+# Words of the NLTK English stop word list. Its entries with an apostrophe
+# ("don't", "you've", ...) are left out, they can't be a word.
+STOP_WORDS = frozenset(
+    """
+    i me my myself we our ours ourselves you your yours yourself yourselves he
+    him his himself she her hers herself it its itself they them their theirs
+    themselves what which who whom this that these those am is are was were be
+    been being have has had having do does did doing a an the and but if or
+    because as until while of at by for with about against between into through
+    during before after above below to from up down in out on off over under
+    again further then once here there when where why how all any both each few
+    more most other some such no nor not only own same so than too very s t can
+    will just don should now d ll m o re ve y ain aren couldn didn doesn hadn
+    hasn haven isn ma mightn mustn needn shan shouldn wasn weren won wouldn
+    """.split()
+)
+
+# Common abbreviations of Punkt's English model, without their period.
+ABBREVIATIONS = frozenset(
+    """
+    mr mrs ms dr jr st inc co corp ltd vs gen gov sen rep col lt jan feb aug
+    sept oct nov dec
+    """.split()
+)
+
+# Marks inserted by the first passes: a split the tokenizer pads with spaces,
+# the start and end of a word it splits off, and a period inside a sentence.
+_PAD, _END, _START, _INNER = "\x01", "\x02", "\x03", "\x04"
+# The marks found in a text, replaced by a control character that isn't one.
+MARK_RE = re.compile(r"[\x01-\x04]")
+# Characters the Treebank tokenizer always splits off a word.
+_SPLIT = r"\s;@#$%&?!()\[\]{}<>\"`*«»“”‘’„\u2012-\u2015\x01"
+# A period ending a sentence, possibly followed by closing brackets and quotes.
+_PERIOD = r"\.(?=[\])}>\"'»”’]*(?:\s|$))"
+# What may end a word: a contraction and closing quotes, then a split or the
+# period ending a sentence. A quote after "'s", "'m" or "'d" is only split off
+# before a space or the punctuation padded before quotes, not before "--".
+_WORD_END = (
+    r"(?:(?:n't|'(?:re|ve|ll))'?"
+    r"|'[smd](?:'(?=[ ;@#$%&\u2012-\u2015?!«“‘„`]|\x01(?!--)"
+    rf"|{_PERIOD}))?"
+    r"|')?"
+    rf"(?:{_PERIOD}|(?=[{_SPLIT}\x02]|$|''))"
+)
+
+# Commas and colons not followed by a digit, paired as the tokenizer pads them,
+# "--" and runs of periods.
+PAD_RE = re.compile(r"(?=[:,.-])(?:([:,])(?:([:,])|(?!\d))|(--|\.{2,}))")
+CONTRACTION_RE = re.compile(
+    r"\b(?=[cdglmw])"
+    r"(?:(?:(can)(not)|(gim)(me)|(gon)(na)|(got)(ta)|(lem)(me))\b"
+    rf"|(wan)(na)(?={_WORD_END})"
+    # "'ye" and "'n" aren't words, only the part before them is kept.
+    r"|(d)'ye\b|(more)'n\b)"
+)
+_LONGEST_ABBREVIATION = max(map(len, ABBREVIATIONS))
+# A period after a letter, followed by closing brackets and quotes and another
+# token, where Punkt may find an abbreviation or an initial. Its literal start
+# keeps the scan fast.
+PERIOD_RE = re.compile(r"\.(?<=[^\W\d]\.)(?=([\])}>\"'»”’]*)\s+(\S+))")
+# The Punkt token ending at that period, if short enough to be one of them.
+# Punkt tokens start after a space or the punctuation it always splits off, or
+# after "`&#,-" split off as a token of their own. "x-mr." is an abbreviation
+# too, by its last part, but "x-j." isn't an initial.
+TOKEN_RE = re.compile(
+    r"(?:^|[\s()\";{}\[\]*:@]|(?:^|\s)[`&#,-]|(-))"
+    rf"([^\W\d]{{1,{_LONGEST_ABBREVIATION}}})$"
+)
+# Punctuation Punkt always splits off a word, and what it takes for a token
+# that can't start a sentence.
+_PUNKT_NON_WORD = ")\";}]*:@'({[‘’“”«»?!"
+_PUNKT_PUNCTUATION = ";:,.!?"
+# A period, "?" or "!" ending a Punkt token inside a longer run of characters.
+INNER_END_RE = re.compile(
+    rf"([^{re.escape(_PUNKT_NON_WORD)}]*?)([.?!])"
+    rf"(?=[{re.escape(_PUNKT_NON_WORD)}])"
+)
+NUMBER_RE = re.compile(r"-?[.,]?\d[\d,.-]*")
+# "'tis" and "'twas" split after a split word, elsewhere the quote already is.
+TIS_RE = re.compile(r"(?<=\x02)'t(?:(is)\b(?:'t(was)\b)?|(was)\b)")
+WORD_RE = re.compile(
+    # Starts a token: after a split character or "''", or after an opening
+    # quote that doesn't start a contraction.
+    rf"(?:(?<![^{_SPLIT}\x03])|(?<='')"
+    r"|(?<=(?<![\w\x02])')(?!(?:re|ve|ll|m|t|s|d|n)\b))"
+    # The shortest run of letters, so that "don't" gives "do".
+    rf"([^\W\d_]+?){_WORD_END}"
+)
+
+
+def _split_words(match: re.Match) -> str:
+    return "".join(f"{_START}{word}{_END}" for word in match.groups() if word)
+
+
+def _ends_inside(token: str) -> bool:
+    """Whether Punkt ends a sentence inside `token`, before its last part."""
+    for match in INNER_END_RE.finditer(token):
+        word, end = match.groups()
+        if end != ".":
+            return True
+        if word.endswith("."):
+            # An ellipsis.
+            continue
+        if word.rsplit("-", 1)[-1] in ABBREVIATIONS:
+            continue
+        if (
+            (len(word) == 1 and word.isalpha()) or NUMBER_RE.fullmatch(word)
+        ) and token[match.end()] in _PUNKT_PUNCTUATION:
+            continue
+        return True
+    return False
+
+
+def _mark_inner_period(match: re.Match) -> str:
+    period = match.start()
+    token = TOKEN_RE.search(
+        match.string, max(0, period - _LONGEST_ABBREVIATION - 2), period
+    )
+    if token is None:
+        return "."
+    hyphen, word = token.groups()
+    closing, next_token = match.groups()
+    if word in ABBREVIATIONS:
+        # Punkt only sees the next token without a closing bracket or quote in
+        # between, and ends a sentence here if it finds one ending inside it.
+        inner = bool(closing) or not _ends_inside(next_token)
+    elif len(word) == 1 and not hyphen:
+        # An initial ends a sentence unless Punkt's orthographic heuristic says
+        # the next token doesn't start one: a lowercase word or a lone ";:,.!?".
+        # Closing brackets and quotes are neither, but ">" isn't split off.
+        if closing:
+            inner = closing[0] == ">"
+        else:
+            inner = (
+                next_token[0].islower()
+                or next_token[0] in ";:,"
+                or (
+                    next_token[0] in ".!?"
+                    and next_token[1:2] in ("", *_PUNKT_NON_WORD)
+                )
+            ) and not _ends_inside(next_token)
+    else:
+        return "."
+    return _INNER if inner else "."
+
+
+def _split_tis(match: re.Match) -> str:
+    return "".join(
+        f"'t{_START}{word}{_END}" for word in match.groups() if word
+    )
+
+
+def words(text: str) -> List[str]:
+    """Lowercased alphabetic words of a text, as `nltk.word_tokenize` has."""
+    text = MARK_RE.sub("\x00", text.lower())
+    text = PERIOD_RE.sub(_mark_inner_period, text)
+    text = PAD_RE.sub(rf"{_PAD}\1\3{_PAD}\2", text)
+    text = CONTRACTION_RE.sub(_split_words, text)
+    text = TIS_RE.sub(_split_tis, text)
+    # Letters include numeric characters such as "½", which aren't alphabetic.
+    return [word for word in WORD_RE.findall(text) if word.isalpha()]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphabetic words of a text, stop words left out."""
+    return [word for word in words(text) if word not in STOP_WORDS]
+
+
+def word_match_similarity(original_text: str, refined_text: str) -> float:
+    """Percentage of the words of `refined_text` found in `original_text`."""
+    refined_words = Counter(tokenize(refined_text))
+    total = sum(refined_words.values())
+    if not total:
+        return 0
+    original_words = Counter(tokenize(original_text))
+    matching_words = sum((original_words & refined_words).values())
+    return (matching_words / total) * 100
+
+
+def _similarity(pair: Tuple[str, str]) -> float:
+    return word_match_similarity(*pair)
+
+
+def batch_similarity(
+    pairs: Sequence[Tuple[str, str]], workers: int = 1
+) -> List[float]:
+    """
+    Similarities of (original text, refined text) pairs, in order.
+
+    Args:
+        pairs (list): (original_text, refined_text) tuples.
+        workers (int): Processes sharing the pairs, 1 to score them in this
+            process.
+    """
+    if workers <= 1 or len(pairs) <= 1:
+        return [_similarity(pair) for pair in pairs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(pairs))) as executor:
+        return list(executor.map(_similarity, pairs))
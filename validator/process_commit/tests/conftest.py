@@ -0,0 +1,99 @@
+import io
+import random
+import re
+
+import pytest
+from warcio.archiveiterator import ArchiveIterator
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, size=None):
+        return self.stream.read(-1 if size is None else size)
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    """S3 client serving `objects` (key -> bytes), with ranged GETs."""
+
+    # pylint: disable=invalid-name,unused-argument
+
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[Key]
+        if Range is not None:
+            start, end = map(
+                int, re.fullmatch(r"bytes=(\d+)-(\d+)", Range).groups()
+            )
+            self.ranges.append((Key, start, end))
+            data = data[start : end + 1]
+        return {"Body": FakeBody(data), "ContentLength": len(data)}
+
+
+@pytest.fixture(name="s3")
+def fixture_s3():
+    return FakeS3()
+
+
+def write_warc(path, texts, seed=0):
+    """
+    Writes one gzipped response record per text, with random (incompressible) padding
+    so the file spans many blocks.
+
+    Returns:
+        list: (WARC-Record-ID, offset, length, text) of each record, with the offsets
+        and lengths the miner records.
+    """
+    rng = random.Random(seed)
+    with open(path, "wb") as output:
+        writer = WARCWriter(output, gzip=True)
+        for index, text in enumerate(texts):
+            padding = rng.randbytes(rng.randint(0, 4096)).hex()
+            payload = f"{text}<!-- {padding} -->".encode()
+            writer.write_record(
+                writer.create_warc_record(
+                    f"https://example.com/{index}",
+                    "response",
+                    payload=io.BytesIO(payload),
+                    http_headers=StatusAndHeaders(
+                        "200 OK",
+                        [("Content-Type", "text/html")],
+                        protocol="HTTP/1.1",
+                    ),
+                )
+            )
+    records = []
+    with open(path, "rb") as file:
+        iterator = ArchiveIterator(file)
+        for record in iterator:
+            content = record.content_stream().read().decode()
+            records.append(
+                (
+                    record.rec_headers.get_header("WARC-Record-ID"),
+                    iterator.get_record_offset(),
+                    iterator.get_record_length(),
+                    content,
+                )
+            )
+    return records
+
+
+@pytest.fixture(name="warc")
+def fixture_warc(tmp_path):
+    """Writes a .warc.gz of `count` records to the temporary directory."""
+
+    def make(count, name="crawl.warc.gz", seed=0):
+        path = str(tmp_path / name)
+        texts = [f"<p>record {index} of {name}</p>" for index in range(count)]
+        return path, write_warc(path, texts, seed)
+
+    return make
@@ -0,0 +1,144 @@
+import pytest
+
+from check_similarity import MAX_RECORD_LENGTH, DataProcessor
+
+CRAWL = "crawl-data/CC-MAIN-2024-51/segments/0/warc/crawl.warc.gz"
+OTHER = "crawl-data/CC-MAIN-2024-51/segments/0/warc/other.warc.gz"
+
+
+@pytest.fixture(name="crawl")
+def fixture_crawl(warc, s3):
+    """Records of a WARC file of the task, served by the fake S3."""
+    path, records = warc(20)
+    with open(path, "rb") as file:
+        s3.objects[CRAWL] = file.read()
+    return records
+
+
+@pytest.fixture(name="processor")
+def fixture_processor(s3):
+    processor = DataProcessor([CRAWL, OTHER], "miner/dataset")
+    processor.s3 = s3
+    return processor
+
+
+def sample(record, warc_path=CRAWL, **metadata):
+    warc_id, offset, length, text = record
+    return {
+        "id": warc_id,
+        "text": text,
+        "metadata": {
+            "warc_path": warc_path,
+            "warc_offset": offset,
+            "warc_length": length,
+            **metadata,
+        },
+    }
+
+
+def test_record_location(processor, crawl):
+    _, offset, length, _ = crawl[3]
+    assert processor.record_location(sample(crawl[3])) == (
+        CRAWL,
+        offset,
+        length,
+    )
+    # Parquet may hand back the offsets as strings.
+    located = sample(crawl[3], warc_offset=str(offset))
+    assert processor.record_location(located) == (CRAWL, offset, length)
+
+
+@pytest.mark.parametrize("metadata", [None, {}])
+def test_record_location_without_metadata(processor, crawl, metadata):
+    located = sample(crawl[3])
+    located["metadata"] = metadata
+    assert processor.record_location(located) is None
+
+
+@pytest.mark.parametrize(
+    "key, value",
+    [
+        ("warc_length", None),
+        ("warc_path", "not/a/task/file.warc.gz"),
+        ("warc_offset", -1),
+        ("warc_offset", "x"),
+        ("warc_length", 0),
+        ("warc_length", MAX_RECORD_LENGTH + 1),
+    ],
+)
+def test_record_location_rejects_bad_metadata(processor, crawl, key, value):
+    located = sample(crawl[3])
+    if value is None:
+        del located["metadata"][key]
+    else:
+        located["metadata"][key] = value
+    assert processor.record_location(located) is None
+
+
+def test_fetch_record_reads_one_member(processor, crawl, s3):
+    warc_id, offset, length, text = crawl[5]
+    assert processor.fetch_record(warc_id, CRAWL, offset, length) == text
+    assert s3.ranges == [(CRAWL, offset, offset + length - 1)]
+
+
+def test_fetch_record_checks_the_record_id(processor, crawl):
+    _, offset, length, _ = crawl[5]
+    warc_id = crawl[6][0]
+    assert processor.fetch_record(warc_id, CRAWL, offset, length) is None
+
+
+def test_fetch_indexed_records(processor, crawl, s3):
+    samples = [
+        sample(crawl[0]),
+        sample(crawl[7]),
+        # Points at another record of the file.
+        sample(crawl[9], warc_offset=crawl[10][1], warc_length=crawl[10][2]),
+        # The file is missing from the bucket, the read fails.
+        sample(crawl[11], warc_path=OTHER),
+        {"id": crawl[12][0], "text": crawl[12][3], "metadata": {}},
+    ]
+    found_texts, unresolved = processor.fetch_indexed_records(samples)
+    assert sorted(found_texts, key=lambda found: found["id"]) == sorted(
+        [
+            {"id": crawl[0][0], "text": crawl[0][3]},
+            {"id": crawl[7][0], "text": crawl[7][3]},
+        ],
+        key=lambda found: found["id"],
+    )
+    assert unresolved == {crawl[9][0], crawl[11][0], crawl[12][0]}
+    # One ranged read per located sample, none of the whole file.
+    assert len(s3.ranges) == 3
+
+
+def test_unresolved_records_are_found_by_the_full_scan(processor, crawl):
+    processor.warc_files = [CRAWL]
+    samples = [sample(crawl[2]), {"id": crawl[4][0], "metadata": None}]
+    _, unresolved = processor.fetch_indexed_records(samples)
+    assert unresolved == {crawl[4][0]}
+    assert processor.process_all_warc_files(unresolved) == [
+        {"id": crawl[4][0], "text": crawl[4][3]}
+    ]
+
+
+def test_full_scan_stops_once_every_record_is_found(processor, crawl, s3):
+    processor.warc_files = [CRAWL]
+    bytes_read = []
+    serve = s3.get_object
+
+    def get_object(**kwargs):
+        response = serve(**kwargs)
+        body = response["Body"]
+        read = body.read
+
+        def counted(size=None):
+            data = read(size)
+            bytes_read.append(len(data))
+            return data
+
+        body.read = counted
+        return response
+
+    s3.get_object = get_object
+    found = processor.process_all_warc_files({crawl[1][0]})
+    assert found == [{"id": crawl[1][0], "text": crawl[1][3]}]
+    assert sum(bytes_read) < len(s3.objects[CRAWL])
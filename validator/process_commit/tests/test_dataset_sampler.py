@@ -0,0 +1,109 @@
+import json
+import os
+import random
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from dataset_sampler import DatasetSampler
+
+REPO = "miner/dataset"
+
+
+def rows(start, count):
+    return [
+        {
+            "id": f"<urn:uuid:{index}>",
+            # Incompressible, so the files are much larger than their footers.
+            "text": random.Random(index).randbytes(1000).hex(),
+            "metadata": {"url": f"https://example.com/{index}"},
+        }
+        for index in range(start, start + count)
+    ]
+
+
+def write_parquet(path, table_rows, row_group_size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(
+        pa.Table.from_pylist(table_rows), path, row_group_size=row_group_size
+    )
+
+
+@pytest.fixture(name="hub_dir")
+def fixture_hub_dir(tmp_path):
+    """Two train files of 10 row groups each and a test file."""
+    data = tmp_path / REPO / "data"
+    write_parquet(str(data / "train-00000-of-00002.parquet"), rows(0, 500), 50)
+    write_parquet(
+        str(data / "train-00001-of-00002.parquet"), rows(500, 500), 50
+    )
+    write_parquet(
+        str(data / "test-00000-of-00001.parquet"), rows(5000, 50), 50
+    )
+    return str(tmp_path)
+
+
+def ids(samples):
+    return [int(sample["id"][len("<urn:uuid:") : -1]) for sample in samples]
+
+
+def test_parquet_files_of_the_split(hub_dir):
+    files = DatasetSampler(REPO, hub_dir=hub_dir).parquet_files()
+    assert [os.path.basename(path) for path in files] == [
+        "train-00000-of-00002.parquet",
+        "train-00001-of-00002.parquet",
+    ]
+    files = DatasetSampler(REPO, split="test", hub_dir=hub_dir).parquet_files()
+    assert [os.path.basename(path) for path in files] == [
+        "test-00000-of-00001.parquet"
+    ]
+
+
+def test_sample_returns_whole_rows(hub_dir):
+    random.seed(0)
+    samples = DatasetSampler(REPO, hub_dir=hub_dir).sample(30)
+    assert len(samples) == 30
+    assert len(set(ids(samples))) == 30
+    expected = {row["id"]: row for row in rows(0, 1000)}
+    for sample in samples:
+        assert sample == expected[sample["id"]]
+
+
+def test_sample_covers_every_file_and_row_group(hub_dir):
+    random.seed(0)
+    sampler = DatasetSampler(REPO, hub_dir=hub_dir)
+    seen = set()
+    for _ in range(20):
+        seen.update(index // 50 for index in ids(sampler.sample(10)))
+    assert seen == set(range(20))
+
+
+def test_sample_reads_only_the_columns_and_row_groups_needed(hub_dir):
+    random.seed(0)
+    sampler = DatasetSampler(REPO, hub_dir=hub_dir)
+    samples = sampler.sample(3, columns=["id", "text", "missing"])
+    assert all(set(sample) == {"id", "text"} for sample in samples)
+    train_bytes = sum(
+        os.path.getsize(path) for path in sampler.parquet_files()
+    )
+    assert 0 < sampler.bytes_read < train_bytes / 2
+
+
+def test_sample_small_split_returns_every_row(hub_dir):
+    samples = DatasetSampler(REPO, split="test", hub_dir=hub_dir).sample(100)
+    assert sorted(ids(samples)) == list(range(5000, 5050))
+
+
+def test_sample_without_parquet_files_streams_the_split(tmp_path):
+    data = tmp_path / REPO / "data"
+    os.makedirs(data)
+    with open(data / "train.jsonl", "w", encoding="utf-8") as file:
+        for row in rows(0, 40):
+            file.write(json.dumps(row) + "\n")
+    random.seed(0)
+    sampler = DatasetSampler(REPO, hub_dir=str(tmp_path))
+    samples = sampler.sample(10, columns=["id", "text"])
+    assert len(samples) == 10
+    assert len(set(ids(samples))) == 10
+    assert all(set(sample) == {"id", "text"} for sample in samples)
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+from nltk.tokenize import NLTKWordTokenizer
+from nltk.tokenize.punkt import PunktParameters, PunktSentenceTokenizer
+
+from similarity import (
+    ABBREVIATIONS,
+    STOP_WORDS,
+    batch_similarity,
+    tokenize,
+    word_match_similarity,
+    words,
+)
+
+CORPUS = os.path.join(
+    os.path.dirname(__file__), "data", "tokenizer_corpus.txt"
+)
+
+
+def corpus_lines():
+    with open(CORPUS, encoding="utf-8") as corpus:
+        return [line.rstrip("\n") for line in corpus if line.strip()]
+
+
+def treebank_words(sentence):
+    """Alphabetic words of the Treebank tokenizer of `nltk.word_tokenize`."""
+    tokens = NLTKWordTokenizer().tokenize(sentence.lower())
+    return [token for token in tokens if token.isalpha()]
+
+
+def punkt_words(text, abbreviations=ABBREVIATIONS):
+    """
+    Alphabetic words of `nltk.word_tokenize`, with a Punkt model knowing only
+    `abbreviations` in place of the English one.
+    """
+    parameters = PunktParameters()
+    parameters.abbrev_types = set(abbreviations)
+    sentences = PunktSentenceTokenizer(parameters).tokenize(text.lower())
+    return [
+        word for sentence in sentences for word in treebank_words(sentence)
+    ]
+
+
+@pytest.mark.parametrize("sentence", corpus_lines())
+def test_words_match_treebank_tokenizer(sentence):
+    assert words(sentence) == treebank_words(sentence)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        " ".join(corpus_lines()),
+        "Mr. Smith met Dr. Jones at St. Mary's on Jan. 5. They left.",
+        "J. R. R. Tolkien wrote it. The end.",
+        "He works for Acme Co. (and Smith Corp.) in town.",
+        "Call Ms. Lee, Sen. Ford's aide; ex-Gov. Reyes too.",
+        'The initial j. 5 times, j. , then "mr." again.',
+        "A sentence. Another one. Mr.",
+        'Asked Mr. Hyde." Then Dr. (j.) and Jr.) left, with Sept., k.; too.',
+        "The U.S. Co. ex-Mr. x-j. Smith said: Mr. word? Dr. word! J. 5.",
+    ],
+)
+def test_words_match_punkt(text):
+    assert words(text) == punkt_words(text)
+
+
+def test_unknown_abbreviation_differs_from_punkt():
+    # Punkt's English model knows more abbreviations than ABBREVIATIONS: after
+    # one of them the word is kept, where nltk drops it.
+    text = "See Fig. 3 and Approx. five more."
+    assert words(text) == ["see", "fig", "and", "approx", "five", "more"]
+    assert punkt_words(text, ABBREVIATIONS | {"fig", "approx"}) == [
+        "see",
+        "and",
+        "five",
+        "more",
+    ]
+
+
+def test_words_match_word_tokenize():
+    nltk = pytest.importorskip("nltk")
+    text = " ".join(corpus_lines())
+    try:
+        tokens = nltk.word_tokenize(text.lower())
+    except LookupError:
+        pytest.skip("NLTK punkt data not installed")
+    expected = [token for token in tokens if token.isalpha()]
+    assert words(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("cannot", ["can", "not"]),
+        (
+            "gonna wanna gotta lemme gimme",
+            ["gon", "na", "wan", "na", "got", "ta", "lem", "me", "gim", "me"],
+        ),
+        ("''quoted''", ["quoted"]),
+        ("abc,5 abc, 5", ["abc"]),
+        ("don't it's we'll", ["do", "it", "we"]),
+        ("e-mail u.s. mp3 x²", []),
+        ("end of a sentence. next", ["end", "of", "a", "sentence", "next"]),
+        ("mr. smith and j. doe", ["smith", "and", "doe"]),
+        ("control\x01characters\x02", []),
+    ],
+)
+def test_words(text, expected):
+    assert words(text) == expected
+
+
+def test_stop_words_match_nltk():
+    stopwords = pytest.importorskip("nltk.corpus").stopwords
+    try:
+        english = stopwords.words("english")
+    except LookupError:
+        pytest.skip("NLTK stopwords data not installed")
+    assert STOP_WORDS == {word for word in english if word.isalpha()}
+
+
+def test_tokenize_drops_stop_words():
+    assert tokenize("I cannot see the dog's bone") == ["see", "dog", "bone"]
+
+
+def test_word_match_similarity():
+    assert word_match_similarity("red green blue", "red blue") == 100
+    assert word_match_similarity("red green", "red red blue yellow") == 25
+    assert word_match_similarity("anything", "the a of") == 0
+
+
+def test_batch_similarity_keeps_order():
+    pairs = [("red green", "red"), ("red", "green"), ("blue", "blue blue")]
+    assert batch_similarity(pairs) == [100, 0, 50]
+    assert batch_similarity(pairs, workers=2) == [100, 0, 50]
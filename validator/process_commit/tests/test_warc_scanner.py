@@ -0,0 +1,167 @@
+import gzip
+import io
+import pickle
+
+import pytest
+from botocore.exceptions import ClientError
+from warcio.statusandheaders import StatusAndHeaders
+from warcio.warcwriter import WARCWriter
+
+import warc_scanner
+from warc_scanner import (
+    GZIP_MAGIC,
+    LocalSource,
+    S3Source,
+    WarcScanner,
+    worker_count,
+)
+
+
+@pytest.fixture(name="small_blocks", autouse=True)
+def fixture_small_blocks(monkeypatch):
+    """Blocks and ranges of a few hundred bytes, so small files span many."""
+    monkeypatch.setattr(warc_scanner, "BLOCK_SIZE", 1024)
+    monkeypatch.setattr(warc_scanner, "INFLATE_SIZE", 256)
+    monkeypatch.setattr(warc_scanner, "MIN_RANGE_SIZE", 1)
+
+
+def headers(records):
+    return [
+        (warc_id, offset, length) for warc_id, offset, length, _ in records
+    ]
+
+
+def scanned(records):
+    return [
+        (record["id"], record["offset"], record["length"])
+        for record in records
+        if record["type"] == "response"
+    ]
+
+
+def texts(found_texts):
+    return sorted((found["id"], found["text"]) for found in found_texts)
+
+
+def write_stored_warc(path, payloads):
+    """
+    Writes one uncompressed-deflate gzip member per record, so the payloads, gzip
+    magic bytes included, appear as they are in the file.
+    """
+    with open(path, "wb") as output:
+        for index, payload in enumerate(payloads):
+            record = io.BytesIO()
+            writer = WARCWriter(record, gzip=False)
+            writer.write_record(
+                writer.create_warc_record(
+                    f"https://example.com/{index}",
+                    "response",
+                    payload=io.BytesIO(payload),
+                    http_headers=StatusAndHeaders(
+                        "200 OK",
+                        [("Content-Type", "text/html")],
+                        protocol="HTTP/1.1",
+                    ),
+                )
+            )
+            output.write(gzip.compress(record.getvalue(), compresslevel=0))
+
+
+@pytest.mark.parametrize("ranges_per_worker", [1, 2, 7, 64])
+def test_scan_finds_every_record(warc, ranges_per_worker):
+    path, records = warc(30)
+    wanted = [records[0], records[13], records[29]]
+    scanner = WarcScanner(1, ranges_per_worker=ranges_per_worker)
+    assert len(scanner.ranges(LocalSource(path).size())) == ranges_per_worker
+
+    found, found_texts = scanner.scan(
+        LocalSource(path), [record[0] for record in wanted]
+    )
+    assert scanned(found) == headers(records)
+    assert texts(found_texts) == sorted(
+        (warc_id, text) for warc_id, _, _, text in wanted
+    )
+    assert scanner.file_bytes == LocalSource(path).size()
+    assert scanner.bytes_read >= scanner.file_bytes
+
+
+def test_ranges_cover_the_file():
+    scanner = WarcScanner(1, ranges_per_worker=7)
+    ranges = scanner.ranges(1000)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1000
+    assert all(
+        end == start for (_, end), (start, _) in zip(ranges, ranges[1:])
+    )
+    assert len(scanner.ranges(3)) == 3
+
+
+def test_ranges_are_no_smaller_than_the_minimum(monkeypatch):
+    monkeypatch.setattr(warc_scanner, "MIN_RANGE_SIZE", 100)
+    assert len(WarcScanner(1, ranges_per_worker=64).ranges(1000)) == 10
+    assert WarcScanner(1, ranges_per_worker=64).ranges(50) == [(0, 50)]
+
+
+def test_gzip_magic_inside_a_record_is_skipped(tmp_path):
+    path = str(tmp_path / "stored.warc.gz")
+    decoys = [
+        GZIP_MAGIC + b"not a member",
+        gzip.compress(b"a complete member that is not a WARC record"),
+    ]
+    write_stored_warc(
+        path,
+        [b"<p>%d</p>" % index + decoys[index % 2] * 20 for index in range(20)],
+    )
+    with open(path, "rb") as file:
+        assert file.read().count(GZIP_MAGIC) > 20 * 20
+
+    serial, _ = WarcScanner(1, ranges_per_worker=1).scan(LocalSource(path))
+    assert len(serial) == 20
+    for ranges_per_worker in (3, 16, 100):
+        scanner = WarcScanner(1, ranges_per_worker=ranges_per_worker)
+        assert scanner.scan(LocalSource(path))[0] == serial
+
+
+def test_scan_with_worker_processes(warc, monkeypatch):
+    monkeypatch.setattr(warc_scanner.os, "cpu_count", lambda: 2)
+    path, records = warc(30)
+    scanner = WarcScanner(2, ranges_per_worker=3)
+    assert scanner.workers == 2
+    found, found_texts = scanner.scan(LocalSource(path), [records[17][0]])
+    assert scanned(found) == headers(records)
+    assert texts(found_texts) == [(records[17][0], records[17][3])]
+
+
+def test_worker_count(monkeypatch):
+    monkeypatch.setattr(warc_scanner.os, "cpu_count", lambda: 4)
+    assert worker_count() == 4
+    assert worker_count(0) == 4
+    assert worker_count(2) == 2
+    assert worker_count(16) == 4
+    monkeypatch.setattr(warc_scanner.os, "cpu_count", lambda: None)
+    assert worker_count() == 1
+
+
+def test_local_source_pickles_without_its_file(warc):
+    path, _ = warc(2)
+    source = LocalSource(path)
+    assert source.read(0, 4) == b"\x1f\x8b\x08\x00"
+    copy = pickle.loads(pickle.dumps(source))
+    assert copy.read(0, 4) == b"\x1f\x8b\x08\x00"
+    source.close()
+    copy.close()
+
+
+class FakeS3Client:
+    # pylint: disable=invalid-name,unused-argument
+
+    exceptions = type("exceptions", (), {"ClientError": ClientError})
+
+    def get_object(self, Bucket, Key, Range):
+        raise ClientError({"Error": {"Code": "InvalidRange"}}, "GetObject")
+
+
+def test_s3_source_reads_past_the_end_as_empty(monkeypatch):
+    source = S3Source("commoncrawl", "crawl.warc.gz")
+    monkeypatch.setattr(source, "_client", FakeS3Client())
+    assert source.read(100, 10) == b""
+    assert pickle.loads(pickle.dumps(source)).__dict__["_client"] is None
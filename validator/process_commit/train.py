@@ -69,12 +69,17 @@ def get_dataloader_from_data_stage(
     ), "num_remaining_train_steps should be greater than 0"
 
     # First, we need to know which ranks to feed the dataloader to
-    input_pp_rank, output_pp_rank = get_input_output_pp_ranks(model=trainer.model)
+    input_pp_rank, output_pp_rank = get_input_output_pp_ranks(
+        model=trainer.model
+    )
 
     # Case 1: Dummy data generator
     if data.dataset is None:
         log_rank(
-            "Using dummy data generator", logger=logger, level=logging.INFO, rank=0
+            "Using dummy data generator",
+            logger=logger,
+            level=logging.INFO,
+            rank=0,
         )
         dataloader = dummy_infinite_data_generator(
             micro_batch_size=trainer.micro_batch_size,
@@ -88,7 +93,12 @@ def get_dataloader_from_data_stage(
 
     # Case 2: HuggingFace datasets
     elif isinstance(data.dataset, PretrainDatasetsArgs):
-        log_rank("Using `datasets` library", logger=logger, level=logging.INFO, rank=0)
+        log_rank(
+            "Using `datasets` library",
+            logger=logger,
+            level=logging.INFO,
+            rank=0,
+        )
         tokenizer_path = trainer.config.tokenizer.tokenizer_name_or_path
         log_rank(
             f"Loading tokenizer from {tokenizer_path} and transformers/hf_hub versions {tf_version, hf_hub_version}",
@@ -143,7 +153,9 @@ def get_dataloader_from_data_stage(
             )
 
             # Check if we have enough samples for train_steps
-            total_tokens_dataset = len(dataloader.dataset) * trainer.sequence_length
+            total_tokens_dataset = (
+                len(dataloader.dataset) * trainer.sequence_length
+            )
             num_tokens_needed_for_training = (
                 num_remaining_train_steps
                 * trainer.global_batch_size
@@ -205,15 +217,19 @@ def get_dataloader(trainer: DistributedTrainer) -> Dict[str, DataLoader]:
         # NOTE: we only create the dataloader for the first stage,
         # then we lazy initialize the dataloader for the other stages
         stage = cast(DatasetStageArgs, stage)
-        consumed_train_samples = get_consumed_train_samples_of_a_data_stage_from_ckp(
-            stage, trainer.metadata
+        consumed_train_samples = (
+            get_consumed_train_samples_of_a_data_stage_from_ckp(
+                stage, trainer.metadata
+            )
         )
         assert (
             consumed_train_samples is not None
         ), f"Cannot find consumed_train_samples for stage {stage.start_training_step} in the checkpoint"
 
-        num_remaining_train_steps = compute_remain_train_steps_of_a_data_stage_from_ckp(
-            stage, trainer.config, trainer.metadata
+        num_remaining_train_steps = (
+            compute_remain_train_steps_of_a_data_stage_from_ckp(
+                stage, trainer.config, trainer.metadata
+            )
         )
         log_rank(
             f"[Training Plan] Stage {stage.name} has {num_remaining_train_steps} remaining training steps and has consumed {consumed_train_samples} samples",
@@ -252,7 +268,9 @@ def train_process(config_file: str, world_size: int):
     os.environ["MASTER_PORT"] = "29500"
     os.environ["WORLD_SIZE"] = str(os.environ.get("WORLD_SIZE", world_size))
     os.environ["RANK"] = str(os.environ.get("RANK", 0))
-    os.environ["LOCAL_RANK"] = str(os.environ.get("LOCAL_RANK", os.environ["RANK"]))
+    os.environ["LOCAL_RANK"] = str(
+        os.environ.get("LOCAL_RANK", os.environ["RANK"])
+    )
     # Load trainer and data
     trainer = DistributedTrainer(config_file)
     dataloader = get_dataloader(trainer)
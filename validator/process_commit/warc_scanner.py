@@ -0,0 +1,305 @@
+"""Parallel scan of gzipped WARC files.
+
+CommonCrawl `.warc.gz` files are concatenations of independent gzip members, one
+per record. The scanner cuts a file into byte ranges and hands them to a process
+pool. Each worker finds the first member starting in its range and inflates and
+parses the members from there until the next range starts. The member that
+crosses the end of a range belongs to the range it starts in. A worker only reads
+its own ranges, from a local file or with ranged S3 reads, so decompression,
+which `ArchiveIterator` does on one core, scales with the number of workers.
+
+A range's first member is found by looking for the gzip magic bytes. A match
+counts only if it inflates to a complete member whose content starts like a WARC
+record, so compressed bytes that happen to look like a gzip header are skipped.
+"""
+
+import logging
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from warcio.archiveiterator import ArchiveIterator
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b\x08"
+# Bytes read at once from the source and handed at once to the decompressor.
+BLOCK_SIZE = 4 * 1024 * 1024
+INFLATE_SIZE = 64 * 1024
+# Compressed size past which a candidate member is not taken for a record.
+MAX_MEMBER_SIZE = 64 * 1024 * 1024
+# Ranges are no smaller than this, so small files aren't split in tiny pieces.
+MIN_RANGE_SIZE = 8 * 1024 * 1024
+
+
+class LocalSource:
+    """WARC file on the local disk."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __getstate__(self):
+        return {"path": self.path, "_file": None}
+
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def read(self, offset: int, size: int) -> bytes:
+        if self._file is None:
+            self._file = open(self.path, "rb")
+        self._file.seek(offset)
+        return self._file.read(size)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __str__(self):
+        return self.path
+
+
+class S3Source:
+    """WARC file in S3, read with ranged GETs."""
+
+    def __init__(self, bucket: str, key: str, region_name: str = "us-west-1"):
+        self.bucket = bucket
+        self.key = key
+        self.region_name = region_name
+        self._client = None
+
+    def __getstate__(self):
+        # boto3 clients can't be pickled, each worker process creates its own.
+        return {**self.__dict__, "_client": None}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", region_name=self.region_name)
+        return self._client
+
+    def size(self) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self.key)[
+            "ContentLength"
+        ]
+
+    def read(self, offset: int, size: int) -> bytes:
+        try:
+            response = self.client.get_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Range=f"bytes={offset}-{offset + size - 1}",
+            )
+        except self.client.exceptions.ClientError as e:
+            # Reading past the end of the object.
+            if e.response.get("Error", {}).get("Code") == "InvalidRange":
+                return b""
+            raise
+        return response["Body"].read()
+
+    def close(self):
+        pass
+
+    def __str__(self):
+        return f"s3://{self.bucket}/{self.key}"
+
+
+class _Window:
+    """Block of a source kept in memory, read again only when a read leaves it."""
+
+    def __init__(self, source):
+        self.source = source
+        self.start = 0
+        self.data = b""
+        self.at_eof = False
+        self.bytes_read = 0
+
+    def get(self, offset: int, size: int) -> bytes:
+        end = self.start + len(self.data)
+        inside = offset + size <= end or (self.at_eof and offset <= end)
+        if not (self.start <= offset and inside):
+            self.start = offset
+            self.data = self.source.read(offset, max(size, BLOCK_SIZE))
+            self.at_eof = len(self.data) < max(size, BLOCK_SIZE)
+            self.bytes_read += len(self.data)
+        return self.data[offset - self.start : offset - self.start + size]
+
+
+def _inflate_member(
+    window: _Window, offset: int
+) -> Optional[Tuple[bytes, int]]:
+    """
+    Inflates the gzip member at `offset`.
+
+    Returns:
+        tuple: Uncompressed content and compressed length of the member, or None if
+        there is no complete member at `offset`.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    parts = []
+    position = offset
+    while not decompressor.eof:
+        block = window.get(position, INFLATE_SIZE)
+        if not block or position - offset > MAX_MEMBER_SIZE:
+            return None
+        try:
+            parts.append(decompressor.decompress(block))
+        except zlib.error:
+            return None
+        position += len(block)
+    return b"".join(parts), position - len(decompressor.unused_data) - offset
+
+
+def _is_record_start(window: _Window, offset: int) -> bool:
+    member = _inflate_member(window, offset)
+    return member is not None and member[0].startswith(b"WARC/")
+
+
+def _first_member(window: _Window, start: int, end: int) -> Optional[int]:
+    """Offset of the first gzip member starting in [start, end), None if there is none."""
+    if start == 0:
+        return 0
+    position = start
+    while position < end:
+        # Overlap the blocks so a magic number split between two is still found.
+        block = window.get(position, BLOCK_SIZE + len(GZIP_MAGIC) - 1)
+        if not block:
+            return None
+        index = block.find(GZIP_MAGIC)
+        while index != -1 and position + index < end:
+            if _is_record_start(window, position + index):
+                return position + index
+            index = block.find(GZIP_MAGIC, index + 1)
+        position += BLOCK_SIZE
+    return None
+
+
+def _record_headers(content: bytes) -> Dict[str, str]:
+    """WARC headers of an uncompressed record."""
+    head = content.split(b"\r\n\r\n", 1)[0].decode("utf-8", errors="replace")
+    headers = {}
+    for line in head.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return headers
+
+
+def _scan_range(source, start: int, end: int, ids_to_find: frozenset):
+    """
+    Parses the members starting in [start, end) of a source.
+
+    Returns:
+        tuple: Headers of the records ({"id", "type", "offset", "length"}, in file
+        order), texts of the records of `ids_to_find` and bytes read.
+    """
+    window = _Window(source)
+    records = []
+    found_texts = []
+    try:
+        position = _first_member(window, start, end)
+        while position is not None and position < end:
+            member = _inflate_member(window, position)
+            if member is None:
+                break
+            content, length = member
+            headers = _record_headers(content)
+            warc_id = headers.get("WARC-Record-ID")
+            records.append(
+                {
+                    "id": warc_id,
+                    "type": headers.get("WARC-Type"),
+                    "offset": position,
+                    "length": length,
+                }
+            )
+            if warc_id in ids_to_find:
+                for record in ArchiveIterator(BytesIO(content)):
+                    text = (
+                        record.content_stream()
+                        .read()
+                        .decode("utf-8", errors="ignore")
+                    )
+                    found_texts.append({"id": warc_id, "text": text})
+                    break
+            position += length
+    finally:
+        source.close()
+    return records, found_texts, window.bytes_read
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    """Processes to scan with: `workers`, all the cores by default, capped at the cores."""
+    cpus = os.cpu_count() or 1
+    return max(1, min(workers or cpus, cpus))
+
+
+class WarcScanner:
+    """
+    Args:
+        workers (int): Processes decompressing and parsing the file, at most one per
+            core. With one, the file is scanned in this process without a pool.
+        ranges_per_worker (int): Byte ranges per worker, more balance the load better.
+    """
+
+    def __init__(
+        self, workers: Optional[int] = None, ranges_per_worker: int = 4
+    ):
+        self.workers = worker_count(workers)
+        self.ranges_per_worker = ranges_per_worker
+        self.bytes_read = 0
+        self.file_bytes = 0
+
+    def ranges(self, size: int) -> List[Tuple[int, int]]:
+        count = max(
+            1,
+            min(self.workers * self.ranges_per_worker, size // MIN_RANGE_SIZE),
+        )
+        bounds = [size * i // count for i in range(count + 1)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def scan(self, source, ids_to_find: Iterable[str] = ()):
+        """
+        Args:
+            source: LocalSource or S3Source of the WARC file.
+            ids_to_find (iterable): WARC-Record-IDs of the records to return the text of.
+
+        Returns:
+            tuple: Headers of every record of the file, in file order, and texts of the
+            records of `ids_to_find` as {"id", "text"} dicts.
+        """
+        ids_to_find = frozenset(ids_to_find)
+        size = source.size()
+        self.file_bytes += size
+        ranges = self.ranges(size)
+        records = []
+        found_texts = []
+        if self.workers == 1 or len(ranges) == 1:
+            results = [
+                _scan_range(source, start, end, ids_to_find)
+                for start, end in ranges
+            ]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(
+                    executor.map(
+                        _scan_range,
+                        [source] * len(ranges),
+                        [start for start, _ in ranges],
+                        [end for _, end in ranges],
+                        [ids_to_find] * len(ranges),
+                    )
+                )
+        for range_records, range_texts, bytes_read in results:
+            records.extend(range_records)
+            found_texts.extend(range_texts)
+            self.bytes_read += bytes_read
+        logger.info(
+            f"Scanned {len(records)} records of {source} in {len(ranges)} range(s) "
+            f"with {self.workers} worker(s)"
+        )
+        return records, found_texts
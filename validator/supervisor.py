@@ -0,0 +1,399 @@
+"""Supervisor of the validator processes.
+
+Starts every component in its own virtual environment, blocks until one of them
+exits, a restart is due or the liveness check runs, and restarts failed components
+with exponential backoff while the others keep running. A component whose heartbeat
+in the state backend has expired is considered stuck and restarted too. The state of
+every component is served as JSON over HTTP, and the metrics the components publish
+to the state backend (see `metrics`) in the Prometheus format.
+"""
+
+import json
+import queue
+import signal
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import psutil
+
+from finest_common import metrics
+
+# Seconds after which the metrics of a process that stopped publishing are dropped.
+METRICS_MAX_AGE = 120.0
+
+
+def terminate_process(pid: int, name: str, timeout: float = 15):
+    """Terminates a process and its children, killing whatever outlives `timeout`."""
+    try:
+        parent = psutil.Process(pid)
+        processes = parent.children(recursive=True) + [parent]
+    except psutil.NoSuchProcess:
+        return
+    for process in processes:
+        try:
+            process.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+    print(f"✅ {name} (PID: {pid}) terminated successfully.")
+
+
+class Component:
+    """
+    One supervised process.
+
+    Args:
+        name (str): Name shown in logs and on the status endpoint.
+        command (list): Command line of the process.
+        cwd (str): Working directory of the process.
+        heartbeats (list): Heartbeats the process sends, one per component it runs;
+            defaults to `name`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        command: List[str],
+        cwd: str,
+        heartbeats: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.heartbeat_keys = {
+            heartbeat: f"heartbeat:{heartbeat}"
+            for heartbeat in heartbeats or [name]
+        }
+
+        self.process: Optional[subprocess.Popen] = None
+        self.state = "stopped"
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+        self.failures = 0
+        self.last_exit_code: Optional[int] = None
+        self.last_exit_at: Optional[float] = None
+        self.restart_at: Optional[float] = None
+        self.heartbeats: Dict[str, Dict[str, str]] = {}
+
+    def status(self, now: float) -> dict:
+        running = self.state == "running"
+        status = {
+            "state": self.state,
+            "pid": self.process.pid if running else None,
+            "uptime": round(now - self.started_at, 1) if running else 0.0,
+            "restarts": self.restarts,
+            "last_exit_code": self.last_exit_code,
+            "last_exit_at": self.last_exit_at,
+            "restart_in": (
+                round(max(self.restart_at - now, 0.0), 1)
+                if self.restart_at is not None
+                else None
+            ),
+            "activities": {},
+        }
+        for heartbeat in self.heartbeat_keys:
+            data = self.heartbeats.get(heartbeat)
+            if data is None:
+                status["activities"][heartbeat] = None
+                continue
+            status["activities"][heartbeat] = {
+                "activity": data["activity"],
+                "activity_for": round(now - float(data["activity_since"]), 1),
+                "heartbeat_age": round(now - float(data["updated_at"]), 1),
+            }
+        return status
+
+
+class Supervisor:
+    """
+    Args:
+        components (list): Components to run.
+        store: State backend the heartbeats are read from (see `state_backend`).
+        backoff (float): Seconds before the first restart of a failed component,
+            doubled on every consecutive failure.
+        max_backoff (float): Upper bound of the restart delay.
+        stable_after (float): Seconds of uptime after which a component's failure
+            count is reset.
+        liveness_interval (float): Seconds between two heartbeat checks.
+        startup_grace (float): Seconds a started component has to write its first
+            heartbeat.
+    """
+
+    def __init__(
+        self,
+        components: List[Component],
+        store,
+        backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        stable_after: float = 600.0,
+        liveness_interval: float = 30.0,
+        startup_grace: float = 300.0,
+    ):
+        self.components = components
+        self.store = store
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self.liveness_interval = liveness_interval
+        self.startup_grace = startup_grace
+
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        # Exit notifications from the waiter threads and the stop request.
+        self.events = queue.Queue()
+        self.next_liveness_check = time.monotonic() + liveness_interval
+
+        self.registry = metrics.Registry()
+        self._component_up = self.registry.gauge(
+            "validator_component_up",
+            "Whether the supervised process is running",
+        )
+        self._component_restarts = self.registry.counter(
+            "validator_component_restarts_total",
+            "Restarts of the supervised process",
+        )
+        self._component_uptime = self.registry.gauge(
+            "validator_component_uptime_seconds",
+            "Seconds since the process was started",
+        )
+        self._heartbeat_age = self.registry.gauge(
+            "validator_heartbeat_age_seconds",
+            "Seconds since the last heartbeat, as of the last liveness check",
+        )
+        self.registry.add_collector(self._collect)
+
+    def start(self, component: Component):
+        try:
+            self.store.delete(*component.heartbeat_keys.values())
+        except Exception as e:
+            print(
+                f"⚠️ Unable to clear the heartbeats of {component.name}: {e}"
+            )
+        try:
+            process = subprocess.Popen(component.command, cwd=component.cwd)
+        except OSError as e:
+            print(f"❌ Unable to start {component.name}: {e}")
+            self.schedule_restart(component, None, 0.0)
+            return
+        with self.lock:
+            component.process = process
+            component.state = "running"
+            component.started_at = time.time()
+            component.restart_at = None
+            component.heartbeats = {}
+        threading.Thread(
+            target=self._wait,
+            args=(component, process),
+            name=f"wait-{component.name}",
+            daemon=True,
+        ).start()
+        print(f"🚀 Started {component.name} (PID: {process.pid}).")
+
+    def _wait(self, component: Component, process: subprocess.Popen):
+        process.wait()
+        self.events.put((component, process))
+
+    def schedule_restart(
+        self, component: Component, exit_code: Optional[int], uptime: float
+    ):
+        if uptime >= self.stable_after:
+            component.failures = 0
+        delay = min(self.backoff * 2**component.failures, self.max_backoff)
+        with self.lock:
+            component.failures += 1
+            component.state = "backoff"
+            component.last_exit_code = exit_code
+            component.last_exit_at = time.time()
+            component.restart_at = time.time() + delay
+        print(
+            f"❌ {component.name} exited with code {exit_code} after {uptime:.0f}s, "
+            f"restarting in {delay:.0f}s (failure {component.failures})."
+        )
+
+    def on_exit(self, component: Component, process: subprocess.Popen):
+        if process is not component.process or component.state != "running":
+            return
+        self.schedule_restart(
+            component, process.returncode, time.time() - component.started_at
+        )
+
+    def restart_due(self):
+        now = time.time()
+        for component in self.components:
+            if component.state == "backoff" and component.restart_at <= now:
+                component.restarts += 1
+                self.start(component)
+
+    def check_liveness(self):
+        """Reads the heartbeats and restarts the components whose heartbeat expired."""
+        keys = [
+            (component, heartbeat, key)
+            for component in self.components
+            for heartbeat, key in component.heartbeat_keys.items()
+        ]
+        try:
+            with self.store.pipeline(transaction=False) as pipe:
+                for _, _, key in keys:
+                    pipe.hgetall(key)
+                results = pipe.execute()
+        except Exception as e:
+            print(
+                f"⚠️ Unable to read heartbeats, skipping the liveness check: {e}"
+            )
+            return
+        heartbeats = {component.name: {} for component in self.components}
+        for (component, heartbeat, _), raw in zip(keys, results):
+            if raw:
+                heartbeats[component.name][heartbeat] = {
+                    key.decode(): value.decode() for key, value in raw.items()
+                }
+
+        now = time.time()
+        for component in self.components:
+            with self.lock:
+                component.heartbeats = heartbeats[component.name]
+            missing = [
+                heartbeat
+                for heartbeat in component.heartbeat_keys
+                if heartbeat not in component.heartbeats
+            ]
+            if component.state != "running" or not missing:
+                continue
+            if now - component.started_at < self.startup_grace:
+                continue
+            print(
+                f"💀 {component.name} (PID: {component.process.pid}) stopped sending "
+                f"heartbeats ({', '.join(missing)})."
+            )
+            # The waiter thread reports the exit, which schedules the restart.
+            terminate_process(component.process.pid, component.name)
+
+    def timeout(self) -> float:
+        """Seconds until the next restart or liveness check."""
+        now = time.time()
+        deadline = self.next_liveness_check - time.monotonic()
+        for component in self.components:
+            if component.state == "backoff":
+                deadline = min(deadline, component.restart_at - now)
+        return max(deadline, 0.0)
+
+    def stop(self):
+        """Asks `run` to return; safe to call from a signal handler."""
+        self.events.put(None)
+
+    def run(self):
+        for component in self.components:
+            self.start(component)
+        while True:
+            try:
+                event = self.events.get(timeout=self.timeout())
+            except queue.Empty:
+                event = ()
+            if event is None:
+                return
+            if event:
+                self.on_exit(*event)
+            self.restart_due()
+            if time.monotonic() >= self.next_liveness_check:
+                self.check_liveness()
+                self.next_liveness_check = (
+                    time.monotonic() + self.liveness_interval
+                )
+
+    def shutdown(self):
+        for component in self.components:
+            with self.lock:
+                running = component.state == "running"
+                component.state = "stopped"
+            if running:
+                terminate_process(component.process.pid, component.name)
+
+    def _collect(self):
+        status = self.status()
+        self._heartbeat_age.clear()
+        for name, component in status["components"].items():
+            self._component_up.set(
+                component["state"] == "running", component=name
+            )
+            self._component_restarts.set_total(
+                component["restarts"], component=name
+            )
+            self._component_uptime.set(component["uptime"], component=name)
+            for heartbeat, activity in component["activities"].items():
+                if activity is not None:
+                    self._heartbeat_age.set(
+                        activity["heartbeat_age"],
+                        component=name,
+                        heartbeat=heartbeat,
+                    )
+
+    def metrics(self) -> str:
+        """Metrics of the supervisor and of every process, in the Prometheus text format."""
+        try:
+            published = metrics.read_published(self.store, METRICS_MAX_AGE)
+        except Exception as e:
+            print(f"⚠️ Unable to read the published metrics: {e}")
+            published = {}
+        return metrics.render(
+            self.registry.collect() + metrics.merge(published)
+        )
+
+    def status(self) -> dict:
+        now = time.time()
+        with self.lock:
+            return {
+                "uptime": round(now - self.started_at, 1),
+                "components": {
+                    component.name: component.status(now)
+                    for component in self.components
+                },
+            }
+
+
+def serve_status(
+    supervisor: Supervisor, host: str, port: int
+) -> ThreadingHTTPServer:
+    """
+    Serves `supervisor.status()` as JSON on `/` and `/status`, and
+    `supervisor.metrics()` on `/metrics`, in a background thread.
+    """
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.rstrip("/")
+            if path == "/metrics":
+                body = supervisor.metrics().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path in ("", "/status"):
+                body = json.dumps(supervisor.status()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    threading.Thread(
+        target=server.serve_forever, name="status-server", daemon=True
+    ).start()
+    return server
+
+
+def install_signal_handlers(supervisor: Supervisor):
+    """Stops the supervisor on SIGTERM (e.g. `pm2 stop`) like on Ctrl+C."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: supervisor.stop())